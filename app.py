@@ -1,39 +1,170 @@
-"""Flask application entry point for the Smart Band Edge Service."""
+"""Flask application entry point for the Smart Band Edge Service.
+
+`create_app()` builds the application and runs the one-time startup work;
+`wsgi.py` exposes an instance for external WSGI servers. Running this module
+starts one of the bundled servers:
+
+    python app.py                              # waitress, threaded (default)
+    python app.py --server processes --workers 4 --threads 8   # gunicorn
+    python app.py --server dev                 # Flask debug server with reloader
+"""
+import argparse
+import os
+import signal
+import sys
+from typing import Optional
 
 from flask import Flask
-from pyngrok import ngrok  # 👈 Importa pyngrok
 
-import iam.application.services
-from iam.interfaces.services import iam_api
-from location.interfaces.services import location_api
-from shared.infrastructure.database import init_db
+from shared.infrastructure import config
+from shared.infrastructure.database import db, init_db, register_connection_hooks
 
-app = Flask(__name__)
-app.register_blueprint(iam_api)
-app.register_blueprint(location_api)
+# Listener de tramas binarias por UDP del proceso actual, si se inició
+udp_listener = None
 
-first_request = True
+def create_app() -> Flask:
+    """Build the Flask application.
 
-@app.before_request
-def setup():
-    """Initialize the database and create a test device before the first request."""
-    global first_request
-    if first_request:
-        first_request = False
-        init_db()
-        auth_application_service = iam.application.services.AuthApplicationService()
-        auth_application_service.get_or_create_test_device()
+    Blueprints are imported here rather than at module level so that a
+    pre-forking server master never starts worker threads or opens database
+    connections its children would inherit. The schema migration and the test
+    device are set up once, before the first request is accepted.
 
-@app.route("/")
-def index():
-    return "✅ Smart Band API funcionando. Usa /api/v1/location para enviar datos."
+    Returns:
+        Flask: The configured application.
+    """
+    from iam.application.services import AuthApplicationService
+    from iam.interfaces.services import iam_api
+    from location.interfaces.services import location_api
+    from shared.interfaces.services import metrics_api, register_request_metrics
 
+    app = Flask(__name__)
+    app.register_blueprint(iam_api)
+    app.register_blueprint(location_api)
+    app.register_blueprint(metrics_api)
+    register_connection_hooks(app)
+    register_request_metrics(app)
+
+    @app.route("/")
+    def index():
+        return "✅ Smart Band API funcionando. Usa /api/v1/location para enviar datos."
+
+    init_db()
+    with db.connection_context():
+        AuthApplicationService().get_or_create_test_device()
+    return app
+
+def start_background_services(reuse_port: bool = False) -> None:
+    """Start the UDP frame listener when BINARY_UDP_PORT is configured."""
+    global udp_listener
+    from location.interfaces.udp_listener import start_udp_listener
+    udp_listener = start_udp_listener(reuse_port)
+
+def shutdown() -> None:
+    """Flush pending work before the process exits.
+
+    Stops taking UDP frames, group-commits whatever the write-behind buffer
+    still holds and releases database connections.
+    """
+    from location.infrastructure.repositories.write_behind import close_write_buffer
+    if udp_listener is not None:
+        udp_listener.close()
+    close_write_buffer()
+    if hasattr(db, "close_all"):
+        db.close_all()
+    elif not db.is_closed():
+        db.close()
+
+def serve_dev(host: str, port: int) -> None:
+    """Flask's debug server with the reloader (single process)."""
+    app = create_app()
+    # El recargador arranca un proceso hijo; solo ese atiende peticiones
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_services()
+    app.run(host=host, port=port, debug=True)
+
+def serve_threaded(host: str, port: int, threads: int) -> None:
+    """One process with a pool of `threads` request threads (waitress).
+
+    Falls back to Werkzeug's threaded server when waitress is not installed.
+    """
+    app = create_app()
+    start_background_services()
+    # SIGTERM (kill, systemd, docker stop) sale por el mismo camino que Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        try:
+            from waitress import serve
+        except ImportError:
+            from werkzeug.serving import make_server
+            print("[WARNING] waitress no está instalado; uso el servidor con hilos de Werkzeug.")
+            make_server(host, port, app, threaded=True).serve_forever()
+        else:
+            serve(app, host=host, port=port, threads=threads)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        shutdown()
+
+def serve_processes(host: str, port: int, workers: int, threads: int) -> None:
+    """`workers` pre-forked processes with `threads` request threads each (gunicorn).
+
+    The application is created inside each worker. Every worker opens the UDP
+    listener with SO_REUSEPORT, so the kernel spreads datagrams across them.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class EdgeServiceApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread" if threads > 1 else "sync")
+            self.cfg.set("graceful_timeout", config.SERVER_GRACEFUL_TIMEOUT)
+            self.cfg.set("post_worker_init", lambda worker: start_background_services(reuse_port=True))
+            self.cfg.set("worker_exit", lambda server, worker: shutdown())
+
+        def load(self):
+            return create_app()
+
+    EdgeServiceApplication().run()
+
+def open_ngrok_tunnel(port: int) -> Optional[str]:
+    """Expose the local port through ngrok; pyngrok is only imported when asked for."""
+    try:
+        from pyngrok import ngrok
+    except ImportError:
+        print("[WARNING] pyngrok no está instalado; se omite el túnel.")
+        return None
+    public_url = ngrok.connect(f"127.0.0.1:{port}", bind_tls=True).public_url
+    print(f"🌍 URL pública ngrok: {public_url}")
+    return public_url
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP del Smart Band Edge Service.")
+    parser.add_argument("--server", choices=["threaded", "processes", "dev"], default=config.SERVER_MODE,
+                        help="threaded: un proceso con hilos (waitress); processes: varios procesos "
+                             "(gunicorn); dev: servidor de depuración de Flask con recarga.")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS,
+                        help="Procesos con --server processes.")
+    parser.add_argument("--threads", type=int, default=config.SERVER_THREADS,
+                        help="Hilos de atención por proceso.")
+    parser.add_argument("--ngrok", action="store_true", help="Abre un túnel ngrok HTTPS hacia el servidor.")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     # 🌐 Iniciar túnel ngrok
-    #public_url = ngrok.connect('127.0.0.1:5000', bind_tls=True)  # HTTPS -> Flask
-    #print(f"🌍 URL pública ngrok: {public_url}")
+    if args.ngrok and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        open_ngrok_tunnel(args.port)
 
-    # Ejecutar la app Flask
-    #app.run(port=5000)
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    print(f"🚀 Iniciando servidor '{args.server}' en {args.host}:{args.port}")
+    if args.server == "dev":
+        serve_dev(args.host, args.port)
+    elif args.server == "processes":
+        serve_processes(args.host, args.port, args.workers, args.threads)
+    else:
+        serve_threaded(args.host, args.port, args.threads)
+
+if __name__ == "__main__":
+    main()
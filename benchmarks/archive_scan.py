@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Benchmark full-day scans: SQLite history path vs the columnar archive.
+
+Loads one day of 1 Hz fixes for a device into a scratch database, times
+reading it back through LocationRecordRepository.iter_history, then archives
+the day (plain and zlib-compressed) and times reading the columns back.
+Each scan computes the mean position so the data is actually touched.
+
+    python benchmarks/archive_scan.py --seconds 86400
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeats: int) -> float:
+    """Median wall time of fn in milliseconds."""
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=86400, help="Fixes in the day (1 Hz).")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="archive-bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+    from shared.infrastructure.database import db, init_db
+    from location.application.services.archive_service import ArchiveApplicationService
+    from location.infrastructure.repositories.archive_repository import ArchiveRepository
+    from location.infrastructure.repositories.location_repository import LocationRecordRepository
+
+    try:
+        init_db()
+        day = date(2025, 1, 1)
+        start = datetime.combine(day, datetime.min.time())
+        rng = random.Random(5)
+        lat, lon = -12.05, -77.05
+        rows = []
+        for second in range(args.seconds):
+            lat += rng.gauss(0, 0.00001)
+            lon += rng.gauss(0, 0.00001)
+            rows.append(("bench-collar", lat, lon, str(start + timedelta(seconds=second))))
+        with db.atomic():
+            db.connection().executemany(
+                "INSERT INTO location_records (device_id, latitude, longitude, created_at) VALUES (?, ?, ?, ?)", rows)
+
+        repo = LocationRecordRepository()
+        end = start + timedelta(days=1)
+
+        def sqlite_scan():
+            records = list(repo.iter_history("bench-collar", start, end))
+            return sum(r.latitude for r in records) / len(records), sum(r.longitude for r in records) / len(records)
+
+        results = [("sqlite iter_history", timed(sqlite_scan, args.repeats), os.path.getsize(os.environ["DB_PATH"]))]
+
+        for compress in (False, True):
+            archive_dir = os.path.join(workdir, "archive-zlib" if compress else "archive")
+            service = ArchiveApplicationService(ArchiveRepository(archive_dir, compress))
+            if compress:
+                # Rows were moved out of SQLite by the first run; re-archive from the plain files
+                plain = ArchiveRepository(os.path.join(workdir, "archive"))
+                columns = plain.read("bench-collar", day)
+                service.archive_repo.append("bench-collar", day, columns.id, columns.ts,
+                                            columns.latitude, columns.longitude)
+            else:
+                service.archive_before(day + timedelta(days=1))
+
+            def archive_scan():
+                for _, columns in service.read_range("bench-collar", start, end):
+                    return columns.latitude.mean(), columns.longitude.mean()
+
+            size = os.path.getsize(service.archive_repo.path("bench-collar", day))
+            results.append((f"archive {'zlib' if compress else 'mmap'}", timed(archive_scan, args.repeats), size))
+
+        print(f"{args.seconds} fixes, median of {args.repeats}")
+        print(f"{'path':<22}{'ms':>10}{'bytes':>14}")
+        for name, ms, size in results:
+            print(f"{name:<22}{ms:>10.2f}{size:>14}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
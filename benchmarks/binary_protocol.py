@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Compare the binary frame protocol with the JSON batch endpoint payload.
+
+For each batch size, reports wire bytes per point (body plus the X-API-Key
+header the JSON path needs) and the time to turn a body into
+(device_id, timestamp, latitude, longitude) rows: json.loads + fromisoformat
+for JSON, HMAC check + NumPy delta decoding for binary. Storage is the same
+for both paths and is not timed.
+
+    python benchmarks/binary_protocol.py --sizes 1 10 100 --repeat 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location.interfaces.binary_protocol import decode_frames, encode_frame
+
+DEVICE_ID = "gps-collar-001"
+API_KEY = "test-api-key-123"
+START = datetime(2025, 1, 1)
+
+
+def random_track(size: int, rng: random.Random) -> list[tuple[datetime, float, float]]:
+    lat, lon = -12.05, -77.05
+    points = []
+    for i in range(size):
+        lat += rng.uniform(-2e-4, 2e-4)
+        lon += rng.uniform(-2e-4, 2e-4)
+        points.append((START + timedelta(seconds=10 * i), round(lat, 7), round(lon, 7)))
+    return points
+
+
+def json_body(points) -> bytes:
+    return json.dumps([
+        {"device_id": DEVICE_ID, "latitude": lat, "longitude": lon, "created_at": ts.isoformat()}
+        for ts, lat, lon in points
+    ], separators=(",", ":")).encode()
+
+
+def binary_body(points) -> bytes:
+    epoch = datetime(1970, 1, 1)
+    return encode_frame(DEVICE_ID, API_KEY, int(time.time() * 1000), [
+        (int((ts - epoch).total_seconds() * 1000), lat, lon) for ts, lat, lon in points
+    ])
+
+
+def parse_json(body: bytes) -> list:
+    return [
+        (item["device_id"], datetime.fromisoformat(item["created_at"]), float(item["latitude"]), float(item["longitude"]))
+        for item in json.loads(body)
+    ]
+
+
+def parse_binary(body: bytes) -> list:
+    rows = []
+    for frame in decode_frames(body, lambda device_id: API_KEY):
+        rows.extend((frame.device_id, ts, lat, lon) for ts, lat, lon in zip(frame.timestamps, frame.latitudes, frame.longitudes))
+    return rows
+
+
+def timed(parse, body: bytes, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(body)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    header = len(f"X-API-Key: {API_KEY}\r\n")
+    print(f"{'points':>6} {'json B/pt':>10} {'bin B/pt':>9} {'ratio':>6} {'json us':>9} {'bin us':>8} {'speedup':>8}")
+    for size in args.sizes:
+        points = random_track(size, rng)
+        as_json, as_binary = json_body(points), binary_body(points)
+        assert len(parse_json(as_json)) == len(parse_binary(as_binary)) == size
+        json_bytes = (len(as_json) + header) / size
+        binary_bytes = len(as_binary) / size
+        json_time = timed(parse_json, as_json, args.repeat)
+        binary_time = timed(parse_binary, as_binary, args.repeat)
+        print(f"{size:>6} {json_bytes:>10.1f} {binary_bytes:>9.1f} {json_bytes / binary_bytes:>5.1f}x "
+              f"{json_time * 1e6:>9.1f} {binary_time * 1e6:>8.1f} {json_time / binary_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Synthetic collar fleet: realistic GPS tracks for load tests.
+
+Each collar alternates between resting, grazing and walking bouts, with a
+heading that drifts instead of jumping and a few metres of GPS noise, around
+a shared pasture centre. Tracks are deterministic for a given seed, so two
+load-test runs replay the same fleet.
+
+    python benchmarks/fleet.py --devices 100 --rate 1 --duration 60 > fleet.ndjson
+"""
+import argparse
+import json
+import math
+import random
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator
+
+CENTER = (-12.05, -77.05)
+SPREAD_M = 2000.0
+EARTH_RADIUS_M = 6371008.8
+GPS_NOISE_M = 3.0
+
+# (name, speed range m/s, bout length range s)
+BEHAVIOURS = [
+    ("resting", (0.0, 0.05), (120, 900)),
+    ("grazing", (0.1, 0.6), (60, 600)),
+    ("walking", (0.8, 1.8), (30, 300)),
+]
+
+
+@dataclass
+class Collar:
+    device_id: str
+    api_key: str
+    latitude: float
+    longitude: float
+    rng: random.Random = field(repr=False)
+    heading: float = 0.0
+    speed: float = 0.0
+    bout_left: float = 0.0
+
+    def _next_bout(self) -> None:
+        _, (low, high), (shortest, longest) = self.rng.choices(BEHAVIOURS, weights=[3, 5, 2])[0]
+        self.speed = self.rng.uniform(low, high)
+        self.bout_left = self.rng.uniform(shortest, longest)
+
+    def step(self, seconds: float) -> tuple[float, float]:
+        """Advance the collar and return a noisy (latitude, longitude) fix."""
+        if self.bout_left <= 0:
+            self._next_bout()
+        self.bout_left -= seconds
+        self.heading += self.rng.gauss(0.0, 0.3)
+        distance = self.speed * seconds
+        # Drift back towards the pasture when wandering too far away
+        north, east = self._offset_m()
+        if math.hypot(north, east) > SPREAD_M:
+            self.heading = math.atan2(-east, -north)
+        self.latitude += math.degrees(distance * math.cos(self.heading) / EARTH_RADIUS_M)
+        self.longitude += math.degrees(
+            distance * math.sin(self.heading) / (EARTH_RADIUS_M * math.cos(math.radians(self.latitude)))
+        )
+        noise_lat = math.degrees(self.rng.gauss(0.0, GPS_NOISE_M) / EARTH_RADIUS_M)
+        noise_lon = math.degrees(self.rng.gauss(0.0, GPS_NOISE_M) / EARTH_RADIUS_M)
+        return round(self.latitude + noise_lat, 7), round(self.longitude + noise_lon, 7)
+
+    def _offset_m(self) -> tuple[float, float]:
+        north = math.radians(self.latitude - CENTER[0]) * EARTH_RADIUS_M
+        east = math.radians(self.longitude - CENTER[1]) * EARTH_RADIUS_M * math.cos(math.radians(CENTER[0]))
+        return north, east
+
+
+def generate_fleet(count: int, seed: int = 1, prefix: str = "bench-collar") -> list[Collar]:
+    """`count` collars scattered within SPREAD_M of CENTER, each with its own API key."""
+    rng = random.Random(seed)
+    fleet = []
+    for i in range(count):
+        distance = SPREAD_M * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        latitude = CENTER[0] + math.degrees(distance * math.cos(bearing) / EARTH_RADIUS_M)
+        longitude = CENTER[1] + math.degrees(
+            distance * math.sin(bearing) / (EARTH_RADIUS_M * math.cos(math.radians(CENTER[0])))
+        )
+        fleet.append(Collar(
+            f"{prefix}-{i:05d}",
+            f"{rng.getrandbits(128):032x}",
+            latitude,
+            longitude,
+            random.Random(rng.getrandbits(64)),
+            heading=rng.uniform(0, 2 * math.pi),
+        ))
+    return fleet
+
+
+def iter_fixes(fleet: list[Collar], rate: float, duration: float) -> Iterator[tuple[float, Collar, float, float]]:
+    """Yield (offset seconds, collar, latitude, longitude) in time order.
+
+    Every collar reports `rate` times per second with a random phase, so the
+    fleet does not fire in lockstep.
+    """
+    interval = 1.0 / rate
+    rng = random.Random(len(fleet))
+    phases = [rng.uniform(0, interval) for _ in fleet]
+    ticks = int(duration * rate)
+    for tick in range(ticks):
+        slot = sorted(
+            (tick * interval + phase, index) for index, phase in enumerate(phases)
+        )
+        for offset, index in slot:
+            if offset >= duration:
+                continue
+            collar = fleet[index]
+            latitude, longitude = collar.step(interval)
+            yield offset, collar, latitude, longitude
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0, help="Fixes per second per collar.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of track.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    start = datetime.utcnow().replace(microsecond=0)
+    fleet = generate_fleet(args.devices, args.seed)
+    for offset, collar, latitude, longitude in iter_fixes(fleet, args.rate, args.duration):
+        sys.stdout.write(json.dumps({
+            "device_id": collar.device_id,
+            "latitude": latitude,
+            "longitude": longitude,
+            "created_at": (start + timedelta(seconds=offset)).isoformat(timespec="milliseconds"),
+        }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark geofence evaluation throughput against fence count.
+
+Times GeofenceIndex.contains (grid + bounding boxes + NumPy ray casting) and a
+pure-Python loop that tests every point against every polygon, on random
+polygons scattered over a ~50 km square.
+
+    python benchmarks/geofence.py --fences 10 100 500 1000 --points 20000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from location.domain.entities.geofence import Geofence
+from location.domain.services.geofence_index import GeofenceIndex
+
+CENTER = (-12.05, -77.05)
+SPREAD = 0.25  # degrees
+
+
+def random_fences(count: int, rng: random.Random) -> list[Geofence]:
+    fences = []
+    for i in range(count):
+        lat = CENTER[0] + rng.uniform(-SPREAD, SPREAD)
+        lon = CENTER[1] + rng.uniform(-SPREAD, SPREAD)
+        radius = rng.uniform(0.002, 0.02)
+        sides = rng.randint(4, 24)
+        vertices = [
+            (lat + radius * rng.uniform(0.6, 1.0) * math.sin(2 * math.pi * k / sides),
+             lon + radius * rng.uniform(0.6, 1.0) * math.cos(2 * math.pi * k / sides))
+            for k in range(sides)
+        ]
+        fences.append(Geofence(f"fence-{i}", vertices, id=i))
+    return fences
+
+
+def python_contains(fences: list[Geofence], lats, lons) -> int:
+    """Naive baseline: every point against every polygon."""
+    hits = 0
+    for lat, lon in zip(lats, lons):
+        for fence in fences:
+            inside = False
+            vertices = fence.vertices
+            for (lat1, lon1), (lat2, lon2) in zip(vertices, vertices[1:] + vertices[:1]):
+                if (lat1 > lat) != (lat2 > lat) and lon < lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1):
+                    inside = not inside
+            hits += inside
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fences", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--baseline-points", type=int, default=2000,
+                        help="Points used for the (slow) pure-Python baseline.")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lats = np.array([CENTER[0] + rng.uniform(-SPREAD, SPREAD) for _ in range(args.points)])
+    lons = np.array([CENTER[1] + rng.uniform(-SPREAD, SPREAD) for _ in range(args.points)])
+
+    print(f"{'fences':>7}{'build ms':>10}{'indexed pts/s':>15}{'python pts/s':>14}{'hits':>8}")
+    for count in args.fences:
+        fences = random_fences(count, rng)
+        started = time.perf_counter()
+        index = GeofenceIndex(fences)
+        build = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        points, _ = index.contains(lats, lons)
+        indexed = args.points / (time.perf_counter() - started)
+
+        sample = args.baseline_points
+        started = time.perf_counter()
+        python_contains(fences, lats[:sample].tolist(), lons[:sample].tolist())
+        baseline = sample / (time.perf_counter() - started)
+
+        print(f"{count:>7}{build:>10.1f}{indexed:>15.0f}{baseline:>14.0f}{len(points):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""Load test the ingest pipeline end to end with a synthetic collar fleet.
+
+On a scratch database this starts the app (python app.py --server ...), the
+stub backend (benchmarks/stub_backend.py, in-process) and the connector
+pointed at the stub. It registers a fleet from benchmarks/fleet.py and
+replays its tracks open-loop against one of the ingest endpoints:
+  * single: POST /api/v1/location, one fix per request;
+  * batch:  POST /api/v1/location/batch, --batch-size fixes of one collar;
+  * binary: POST /api/v1/location/binary, one frame of --batch-size fixes.
+
+Reported, and written as JSON to --output so runs can be compared:
+  * ingest latency p50/p95/p99, measured from each request's scheduled send
+    time so a stalled server cannot hide queueing (no coordinated omission);
+  * throughput and status counts;
+  * database growth (main file plus WAL) and bytes per stored row;
+  * upload lag: from the ingest response to the stub receiving that position.
+
+App settings (LOCATION_WRITE_BEHIND, TRACK_FILTER, DB_*...) come from the
+environment as usual and are recorded in the results.
+
+    python benchmarks/load_test.py --devices 200 --rate 1 --duration 30
+    python benchmarks/load_test.py --endpoint binary --batch-size 10 --server processes --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import aiohttp
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fleet import generate_fleet, iter_fixes
+from stub_backend import StubBackend
+
+RECORDED_ENV_PREFIXES = ("DB_", "LOCATION_", "TRACK_", "GEOFENCE_", "SERVER_", "BINARY_", "DEVICE_CACHE_")
+EPOCH = datetime(1970, 1, 1)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentiles(values: list[float]) -> dict:
+    """Nearest-rank p50/p95/p99 plus mean and max, in the unit of `values`."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": round(rank(50), 3),
+        "p95": round(rank(95), 3),
+        "p99": round(rank(99), 3),
+        "max": round(ordered[-1], 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+    }
+
+
+def database_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def checkpoint(path: str) -> None:
+    """Fold the WAL back into the main file so sizes compare across runs."""
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def count_rows(path: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM location_records").fetchone()[0]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def register_fleet(db_path: str, fleet) -> None:
+    """Create the schema and the fleet's devices in the scratch database."""
+    os.environ["DB_PATH"] = db_path
+    from iam.infrastructure.models import Device
+    from shared.infrastructure.database import db, init_db
+    init_db()
+    with db.connection_context():
+        Device.insert_many([
+            {"device_id": collar.device_id, "api_key": collar.api_key, "created_at": datetime.utcnow()}
+            for collar in fleet
+        ]).on_conflict_replace().execute()
+    db.close()
+
+
+def build_schedule(fleet, args, start: datetime) -> list[tuple[float, object, list]]:
+    """Requests as (send offset, collar, fixes), sorted by send time.
+
+    Batched kinds send when the last fix of the group was taken, as a collar
+    buffering `batch_size` fixes would.
+    """
+    schedule = []
+    pending = defaultdict(list)
+    group = 1 if args.endpoint == "single" else args.batch_size
+    for offset, collar, latitude, longitude in iter_fixes(fleet, args.rate, args.duration):
+        fixes = pending[collar.device_id]
+        fixes.append((start + timedelta(seconds=offset), latitude, longitude))
+        if len(fixes) == group:
+            schedule.append((offset, collar, list(fixes)))
+            fixes.clear()
+    schedule.sort(key=lambda request: request[0])
+    return schedule
+
+
+def request_body(endpoint: str, collar, fixes) -> tuple[str, dict, object]:
+    """(path, headers, body) of one ingest request."""
+    headers = {"X-API-Key": collar.api_key}
+    if endpoint == "single":
+        created_at, latitude, longitude = fixes[0]
+        return "/api/v1/location", headers, {"json": {
+            "device_id": collar.device_id, "latitude": latitude, "longitude": longitude,
+            "created_at": created_at.isoformat(),
+        }}
+    if endpoint == "batch":
+        return "/api/v1/location/batch", headers, {"json": [
+            {"device_id": collar.device_id, "latitude": latitude, "longitude": longitude,
+             "created_at": created_at.isoformat()}
+            for created_at, latitude, longitude in fixes
+        ]}
+    from location.interfaces.binary_protocol import encode_frame
+    points = [(int((created_at - EPOCH).total_seconds() * 1000), latitude, longitude)
+              for created_at, latitude, longitude in fixes]
+    frame = encode_frame(collar.device_id, collar.api_key, int(time.time() * 1000), points)
+    return "/api/v1/location/binary", {"Content-Type": "application/octet-stream"}, {"data": frame}
+
+
+async def drive(base_url: str, schedule, args) -> dict:
+    """Replay the schedule open-loop and collect per-request timings."""
+    latencies = []
+    statuses = Counter()
+    # device_id -> [(ack time.time(), latitude, longitude)] of fixes the app accepted
+    acks = defaultdict(list)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def send(scheduled: float, collar, fixes):
+            path, headers, body = request_body(args.endpoint, collar, fixes)
+            try:
+                async with session.post(base_url + path, headers=headers, **body) as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            done = time.monotonic()
+            latencies.append((done - scheduled) * 1000)
+            statuses[str(status)] += 1
+            if status in (200, 201, 202, 207):
+                acked = time.time()
+                acks[collar.device_id].extend((acked, latitude, longitude) for _, latitude, longitude in fixes)
+
+        started = time.monotonic()
+        tasks = []
+        for offset, collar, fixes in schedule:
+            delay = started + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(started + offset, collar, fixes)))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+    return {"latencies": latencies, "statuses": statuses, "acks": acks, "elapsed": elapsed}
+
+
+def upload_lags(received, acks, tolerance: float = 2e-6) -> list[float]:
+    """Milliseconds from the ingest ack of each uploaded position to its arrival at the stub.
+
+    The binary protocol quantizes coordinates, so positions match within
+    `tolerance` degrees; the latest matching ack before the arrival wins.
+    """
+    ordered = {device_id: sorted(fixes) for device_id, fixes in acks.items()}
+    lags = []
+    for arrived, device_id, latitude, longitude in received:
+        fixes = ordered.get(device_id, [])
+        index = bisect_right(fixes, (arrived, float("inf"), float("inf")))
+        for acked, fix_lat, fix_lon in reversed(fixes[:index]):
+            if abs(fix_lat - latitude) <= tolerance and abs(fix_lon - longitude) <= tolerance:
+                lags.append((arrived - acked) * 1000)
+                break
+    return lags
+
+
+async def wait_until_up(url: str, timeout: float) -> float:
+    started = time.monotonic()
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() - started < timeout:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return time.monotonic() - started
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.02)
+    raise RuntimeError(f"{url} did not come up within {timeout:g}s")
+
+
+def stop_process(process: subprocess.Popen, sig=signal.SIGTERM, timeout: float = 30) -> None:
+    if process.poll() is None:
+        process.send_signal(sig)
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    db_path = os.path.join(workdir, "load.db")
+    app_port, stub_port = free_port(), free_port()
+    env = dict(os.environ, DB_PATH=db_path, ARCHIVE_DIR=os.path.join(workdir, "archive"),
+               NOTIFY_SOCKET=os.path.join(workdir, "notify.sock"), PYTHONUNBUFFERED="1")
+
+    fleet = generate_fleet(args.devices, args.seed)
+    register_fleet(db_path, fleet)
+    stub = StubBackend(args.stub_latency_ms, args.stub_jitter_ms, args.stub_error_rate, seed=args.seed)
+    await stub.start("127.0.0.1", stub_port)
+
+    # App and connector output, kept for post-mortems
+    app_log = open(os.path.join(workdir, "processes.log"), "w")
+    app = subprocess.Popen(
+        [sys.executable, "app.py", "--server", args.server, "--host", "127.0.0.1", "--port", str(app_port),
+         "--workers", str(args.workers), "--threads", str(args.threads)],
+        cwd=REPO_ROOT, env=env, stdout=app_log, stderr=subprocess.STDOUT,
+    )
+    connector = None
+    try:
+        base_url = f"http://127.0.0.1:{app_port}"
+        startup = await wait_until_up(base_url + "/", args.startup_timeout)
+        if not args.no_connector:
+            connector = subprocess.Popen(
+                [sys.executable, "connector.py", db_path, "--outbox", os.path.join(workdir, "outbox.sqlite3"),
+                 "--api-url", f"http://127.0.0.1:{stub_port}", *args.connector_arg],
+                cwd=REPO_ROOT, env=env, stdout=app_log, stderr=subprocess.STDOUT,
+            )
+            # Give the connector time to bind its notification socket
+            await asyncio.sleep(1.0)
+
+        checkpoint(db_path)
+        rows_before, bytes_before = count_rows(db_path), database_bytes(db_path)
+        schedule = build_schedule(fleet, args, datetime.utcnow())
+        driven = await drive(base_url, schedule, args)
+        # Let the connector drain what is still pending
+        await asyncio.sleep(args.settle)
+        rows_after, bytes_after = count_rows(db_path), database_bytes(db_path)
+    finally:
+        if connector is not None:
+            stop_process(connector, signal.SIGINT)
+        stop_process(app)
+        await stub.stop()
+        app_log.close()
+    checkpoint(db_path)
+    bytes_checkpointed = database_bytes(db_path)
+
+    fixes = sum(len(request[2]) for request in schedule)
+    stored = rows_after - rows_before
+    lags = upload_lags(stub.received, driven["acks"])
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "revision": git_revision(),
+        "config": {
+            **{key: value for key, value in vars(args).items() if key != "output"},
+            "env": {key: value for key, value in os.environ.items() if key.startswith(RECORDED_ENV_PREFIXES)},
+        },
+        "startup_s": round(startup, 3),
+        "ingest": {
+            "requests": len(schedule),
+            "fixes": fixes,
+            "elapsed_s": round(driven["elapsed"], 3),
+            "requests_per_s": round(len(schedule) / driven["elapsed"], 1),
+            "fixes_per_s": round(fixes / driven["elapsed"], 1),
+            "statuses": dict(driven["statuses"]),
+            "latency_ms": percentiles(driven["latencies"]),
+        },
+        "database": {
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "growth_bytes": bytes_after - bytes_before,
+            "bytes_after_checkpoint": bytes_checkpointed,
+            "rows_stored": stored,
+            "bytes_per_row": round((bytes_checkpointed - bytes_before) / stored, 1) if stored else None,
+        },
+        "upload": {
+            **stub.stats(),
+            "lag_ms": percentiles(lags),
+        },
+        "workdir": workdir,
+    }
+
+
+def print_summary(result: dict) -> None:
+    ingest, database, upload = result["ingest"], result["database"], result["upload"]
+    latency, lag = ingest["latency_ms"], upload["lag_ms"]
+    print(f"startup        {result['startup_s']:.3f}s")
+    print(f"ingest         {ingest['requests']} requests / {ingest['fixes']} fixes in {ingest['elapsed_s']}s "
+          f"= {ingest['requests_per_s']} req/s, {ingest['fixes_per_s']} fixes/s  statuses {ingest['statuses']}")
+    if latency["count"]:
+        print(f"latency ms     p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"database       +{database['growth_bytes']} bytes with WAL for {database['rows_stored']} rows, "
+          f"{database['bytes_per_row']} B/row after checkpoint")
+    print(f"upload         {upload['accepted']} accepted / {upload['requests']} requests "
+          f"({upload['errors']} injected errors, {upload['devices']} devices)")
+    if lag["count"]:
+        print(f"upload lag ms  p50 {lag['p50']}  p95 {lag['p95']}  p99 {lag['p99']}  max {lag['max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0, help="Fixes per second per collar.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load.")
+    parser.add_argument("--endpoint", choices=["single", "batch", "binary"], default="single")
+    parser.add_argument("--batch-size", type=int, default=10, help="Fixes per request for batch/binary.")
+    parser.add_argument("--connections", type=int, default=64, help="Client connection limit.")
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--server", choices=["threaded", "processes", "dev"], default="threaded")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--stub-latency-ms", type=float, default=50.0)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--no-connector", action="store_true", help="Only measure ingest.")
+    parser.add_argument("--connector-arg", action="append", default=[],
+                        help="Extra connector.py argument, e.g. --connector-arg=--notify=poll (repeatable).")
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to wait for uploads after the load.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default benchmarks/results/load-<timestamp>.json).")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_summary(result)
+    output = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"load-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results        {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Benchmark R*Tree spatial queries against a full-scan baseline.
+
+Builds (or reuses) a scratch database with synthetic tracks, then times
+bounding-box and radius searches through LocationRecordApplicationService
+against the same predicates evaluated by scanning location_records.
+
+    python benchmarks/spatial_query.py --rows 1000000 --db /tmp/spatial-bench.db
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def populate(db, rows: int, devices: int, seed: int) -> None:
+    """Insert `rows` random-walk fixes spread over `devices` collars, one per second."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    positions = [(rng.uniform(-12.2, -11.9), rng.uniform(-77.2, -76.9)) for _ in range(devices)]
+    batch = []
+    with db.atomic():
+        for i in range(rows):
+            device = i % devices
+            lat, lon = positions[device]
+            lat += rng.gauss(0, 0.0002)
+            lon += rng.gauss(0, 0.0002)
+            positions[device] = (lat, lon)
+            created_at = start + timedelta(seconds=i // devices)
+            batch.append((f"bench-{device:05d}", lat, lon, str(created_at)))
+            if len(batch) == 10000:
+                db.connection().executemany(
+                    "INSERT INTO location_records (device_id, latitude, longitude, created_at) VALUES (?, ?, ?, ?)", batch)
+                batch.clear()
+        if batch:
+            db.connection().executemany(
+                "INSERT INTO location_records (device_id, latitude, longitude, created_at) VALUES (?, ?, ?, ?)", batch)
+
+
+def timed(fn, repeats: int) -> tuple[float, float, int]:
+    """Run fn repeatedly; return (median ms, p95 ms, result size of the last run)."""
+    samples = []
+    size = 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        size = len(fn())
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))], size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db", default="spatial-bench.db", help="Scratch database (reused if populated).")
+    args = parser.parse_args()
+
+    os.environ["DB_PATH"] = os.path.abspath(args.db)
+    from shared.infrastructure.database import db, init_db
+    from location.application.services.location_service import LocationRecordApplicationService
+    from location.domain.entities.location_record import LocationRecord
+    from location.domain.services.geometry import haversine_m, radius_bounding_boxes
+    from location.infrastructure.models.location_record import LocationRecord as LocationRecordModel
+
+    init_db()
+    existing = db.execute_sql("SELECT COUNT(*) FROM location_records").fetchone()[0]
+    if existing < args.rows:
+        started = time.perf_counter()
+        populate(db, args.rows - existing, args.devices, args.seed)
+        print(f"populated {args.rows - existing} rows in {time.perf_counter() - started:.1f}s")
+    total = db.execute_sql("SELECT COUNT(*) FROM location_records").fetchone()[0]
+
+    service = LocationRecordApplicationService()
+    start = datetime(2025, 1, 1, 0, 30)
+    end = start + timedelta(hours=1)
+    box = (-12.06, -77.06, -12.04, -77.04)
+    center, radius = (-12.05, -77.05), 500.0
+    limit = 10 ** 9
+
+    def to_records(rows):
+        # Same entity construction as the repository, so only the lookup differs
+        return [LocationRecord(row[1], row[2], row[3], LocationRecordModel.created_at.python_value(row[4]), row[0])
+                for row in rows]
+
+    def bbox_rtree():
+        return service.find_in_box(*box, start, end, limit)
+
+    def bbox_scan():
+        return to_records(db.execute_sql("""
+            SELECT id, device_id, latitude, longitude, created_at FROM location_records NOT INDEXED
+             WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+               AND created_at >= ? AND created_at < ?
+          ORDER BY created_at DESC
+        """, (box[0], box[2], box[1], box[3], str(start), str(end))))
+
+    def near_rtree():
+        return service.find_near(*center, radius, start, end, limit)
+
+    def near_scan():
+        (min_lat, min_lon, max_lat, max_lon), = radius_bounding_boxes(*center, radius)
+        rows = db.execute_sql("""
+            SELECT id, device_id, latitude, longitude, created_at FROM location_records NOT INDEXED
+             WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?
+               AND created_at >= ? AND created_at < ?
+        """, (min_lat, max_lat, min_lon, max_lon, str(start), str(end))).fetchall()
+        return to_records(row for row in rows if haversine_m(*center, row[2], row[3]) <= radius)
+
+    print(f"{total} rows, {args.devices} devices, window {start} .. {end}")
+    print(f"{'query':<14}{'median ms':>12}{'p95 ms':>10}{'rows':>8}")
+    for name, fn in (("bbox rtree", bbox_rtree), ("bbox scan", bbox_scan),
+                     ("near rtree", near_rtree), ("near scan", near_scan)):
+        median, p95, size = timed(fn, args.repeats)
+        print(f"{name:<14}{median:>12.2f}{p95:>10.2f}{size:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Local stand-in for the collar backend's PUT /api/v1/collar/updateLocation.
+
+Adds a configurable latency (plus jitter) and fails a fraction of requests
+with a retryable status, so the connector's concurrency, retries and outbox
+can be exercised without the real service. Every accepted upload is recorded
+with its arrival time; GET /_stats returns the counters.
+
+    python benchmarks/stub_backend.py --port 8080 --latency-ms 80 --error-rate 0.05
+    python connector.py --api-url http://127.0.0.1:8080
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+UPDATE_ENDPOINT = "/api/v1/collar/updateLocation"
+
+
+class StubBackend:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        # (arrival time.time(), device_id, latitude, longitude) of accepted uploads
+        self.received: list[tuple[float, str, float, float]] = []
+        self.requests = 0
+        self.errors = 0
+        self._runner = None
+
+    def application(self) -> web.Application:
+        app = web.Application()
+        app.router.add_put(UPDATE_ENDPOINT, self.update_location)
+        app.router.add_get("/_stats", self.get_stats)
+        return app
+
+    async def update_location(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        payload = await request.json()
+        delay = self.latency_ms + (self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.json_response({"error": "missing token"}, status=401)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": "injected failure"}, status=self.error_status)
+        self.received.append((time.time(), payload["serialNumber"], payload["lastLatitude"], payload["lastLongitude"]))
+        return web.json_response({"status": "ok"})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "accepted": len(self.received),
+            "errors": self.errors,
+            "devices": len({device_id for _, device_id, _, _ in self.received}),
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        self._runner = web.AppRunner(self.application(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of uploads answered with --error-status.")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    stub = StubBackend(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    print(f"Stub backend on http://{args.host}:{args.port}{UPDATE_ENDPOINT}")
+    web.run_app(stub.application(), host=args.host, port=args.port, print=None, access_log=None)
+    print(stub.stats())
+
+
+if __name__ == "__main__":
+    main()
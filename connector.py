@@ -2,26 +2,80 @@
 # -*- coding: utf-8 -*-
 
 import sqlite3
-import requests
 import argparse
+import asyncio
+import random
+import socket
 import sys
 import os
 import glob
 import time
+from dataclasses import dataclass
 from typing import Optional, Tuple
 
+import aiohttp
+from aiohttp import web
+
+from location.domain.services.geometry import haversine_m
+from shared.infrastructure import config
+from shared.infrastructure.metrics import counter, gauge, histogram, registry
+
 # ----- Configuración de la API -----
 #API_BASE_URL   = 'https://collar-link-production.up.railway.app'
 API_BASE_URL   = 'http://localhost:8080'
 UPDATE_ENDPOINT = '/api/v1/collar/updateLocation'
 
+# ----- Configuración del envío -----
+POLL_INTERVAL   = 5      # segundos entre rondas en modo sondeo
+FALLBACK_INTERVAL = 30   # segundos máximos entre rondas si hay notificaciones
+COALESCE        = 0.05   # segundos que se agrupan notificaciones antes de una ronda
+WATCH_INTERVAL  = 0.05   # segundos entre lecturas de PRAGMA data_version
+CONCURRENCY     = 10     # uploads simultáneos (y conexiones keep-alive)
+REQUEST_TIMEOUT = 10     # segundos por intento
+MAX_RETRIES     = 3      # reintentos tras el primer intento
+BACKOFF_BASE    = 0.5    # segundos
+BACKOFF_MAX     = 10     # segundos
+MIN_DISTANCE    = 0      # metros; 0 = sube cualquier registro nuevo
+HEARTBEAT       = 300    # segundos máximos sin subir un dispositivo
+OUTBOX_FILE     = 'connector-outbox.sqlite3'
+DRAIN_BATCH     = 200    # filas del outbox leídas por lote
+MAX_ATTEMPTS    = 10     # rondas fallidas antes de mover una fila a la cola de muertos
+METRICS_HOST    = '127.0.0.1'
+
+# Resultado de un upload
+UPLOAD_OK       = 'ok'
+UPLOAD_FAILED   = 'failed'    # error transitorio tras agotar los reintentos
+UPLOAD_REJECTED = 'rejected'  # 4xx no reintentable: reintentar no cambiaría nada
+UPLOAD_DEFERRED = 'deferred'  # no se intentó: una posición anterior del dispositivo falló
+
+# ----- Métricas (formato de texto de Prometheus en /metrics) -----
+
+ROUND_SECONDS = histogram("connector_round_seconds", "Duración de cada ronda: detección de cambios, encolado y drenado del outbox.", ("trigger",))
+UPLOAD_SECONDS = histogram("connector_upload_seconds",
+                           "Duración de cada upload, reintentos incluidos, por resultado.", ("result",))
+UPLOADS = counter("connector_uploads_total",
+                  "Uploads terminados por resultado (ok, failed tras reintentos o rejected por un 4xx).", ("result",))
+DEAD_LETTERS = counter("connector_dead_letters_total", "Filas movidas del outbox a la cola de muertos.", ("reason",))
+UPLOAD_ERRORS = counter("connector_upload_errors_total",
+                        "Intentos fallidos por motivo (código HTTP, timeout o network).", ("reason",))
+OUTBOX_DEPTH = gauge("connector_outbox_depth", "Posiciones pendientes en el outbox al final de la ronda.")
+OUTBOX_OLDEST = gauge("connector_outbox_oldest_seconds", "Antigüedad del pendiente más viejo del outbox.")
+
 # ----- Funciones de acceso a datos -----
 
 def connect_db(path: str) -> sqlite3.Connection:
-    """Abre la conexión a la base de datos SQLite."""
+    """Abre la base de datos SQLite como cliente de solo lectura.
+
+    Usa los mismos PRAGMAs que la app (salvo journal_mode, que fija el escritor),
+    para que en modo WAL las lecturas no bloqueen las escrituras de la app.
+    """
     try:
-        conn = sqlite3.connect(path)
+        conn = sqlite3.connect(path, timeout=config.DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
         conn.row_factory = sqlite3.Row
+        for pragma, value in config.sqlite_pragmas().items():
+            if pragma != "journal_mode":
+                conn.execute(f"PRAGMA {pragma}={value}")
+        conn.execute("PRAGMA query_only=ON")
         return conn
     except sqlite3.Error as e:
         print(f"[ERROR] No se pudo conectar a la BD en '{path}': {e}")
@@ -32,39 +86,520 @@ def fetch_devices(conn: sqlite3.Connection) -> list[Tuple[str, str]]:
     cur.execute("SELECT device_id, api_key FROM devices")
     return cur.fetchall()
 
-def fetch_latest_location(conn: sqlite3.Connection, device_id: str) -> Optional[Tuple[float, float]]:
+def fetch_latest_locations(conn: sqlite3.Connection) -> dict[str, sqlite3.Row]:
+    """Último registro (record_id, latitude, longitude, created_at) de todos los
+    dispositivos en una sola lectura indexada."""
     cur = conn.cursor()
-    cur.execute("""
-        SELECT latitude, longitude
-          FROM location_records
-         WHERE device_id = ?
-      ORDER BY created_at DESC
-         LIMIT 1
-    """, (device_id,))
-    row = cur.fetchone()
-    return (row['latitude'], row['longitude']) if row else None
-
-def upload_location(device_id: str, api_key: str, latitude: float, longitude: float) -> None:
-    url = f"{API_BASE_URL}{UPDATE_ENDPOINT}"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    payload = {
-        "serialNumber": device_id,
-        "lastLatitude": latitude,
-        "lastLongitude": longitude
-    }
     try:
-        resp = requests.put(url, headers=headers, json=payload, timeout=10)
-    except requests.RequestException as e:
-        print(f"[ERROR] Falló request para {device_id}: {e}")
-        return
+        cur.execute("""
+            SELECT device_id, record_id, latitude, longitude, created_at
+              FROM device_latest_location
+        """)
+    except sqlite3.OperationalError:
+        # BD sin migrar: SQLite toma las columnas de la fila con MAX(created_at)
+        cur.execute("""
+            SELECT device_id, id AS record_id, latitude, longitude, MAX(created_at) AS created_at
+              FROM location_records
+          GROUP BY device_id
+        """)
+    return {row['device_id']: row for row in cur.fetchall()}
 
-    if resp.ok:
-        print(f"[OK] Dispositivo {device_id} → ({latitude}, {longitude})")
-    else:
-        print(f"[FAIL] Dispositivo {device_id}: {resp.status_code} {resp.text}")
+# ----- Detección de cambios -----
+
+@dataclass
+class HighWaterMark:
+    """Último registro encolado para subir de un dispositivo."""
+    record_id: int
+    created_at: str
+    latitude: float
+    longitude: float
+    uploaded_at: float  # time.monotonic() del encolado
+
+def should_upload(mark: Optional[HighWaterMark], latest: sqlite3.Row, now: float,
+                  min_distance: float = MIN_DISTANCE, heartbeat: float = HEARTBEAT) -> bool:
+    """Decide si el último registro merece un upload.
+
+    Sube si nunca se subió nada, si venció el heartbeat, o si hay un registro
+    nuevo que se alejó al menos `min_distance` metros de lo último subido.
+    """
+    if mark is None or now - mark.uploaded_at >= heartbeat:
+        return True
+    if latest['record_id'] == mark.record_id:
+        return False
+    if min_distance <= 0:
+        return True
+    return haversine_m(mark.latitude, mark.longitude, latest['latitude'], latest['longitude']) >= min_distance
+
+# ----- Outbox persistente -----
+
+class Outbox:
+    """Cola store-and-forward en un SQLite propio del connector.
+
+    Las posiciones pendientes sobreviven a caídas del backend y reinicios del
+    proceso. En modo `compact` solo se conserva la posición pendiente más nueva
+    de cada dispositivo, manteniendo la antigüedad del primer pendiente.
+
+    Las filas que el backend rechaza (4xx no reintentable) o que agotan sus
+    intentos pasan a `outbox_dead`, para que no bloqueen la cola.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id          INTEGER PRIMARY KEY,
+            device_id   TEXT    NOT NULL,
+            record_id   INTEGER NOT NULL,
+            latitude    REAL    NOT NULL,
+            longitude   REAL    NOT NULL,
+            created_at  TEXT    NOT NULL,
+            enqueued_at REAL    NOT NULL,
+            attempts    INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS outbox_device_id ON outbox (device_id);
+        CREATE TABLE IF NOT EXISTS outbox_dead (
+            id          INTEGER PRIMARY KEY,
+            device_id   TEXT    NOT NULL,
+            record_id   INTEGER NOT NULL,
+            latitude    REAL    NOT NULL,
+            longitude   REAL    NOT NULL,
+            created_at  TEXT    NOT NULL,
+            enqueued_at REAL    NOT NULL,
+            attempts    INTEGER NOT NULL,
+            reason      TEXT    NOT NULL,
+            failed_at   REAL    NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, compact: bool = True):
+        self.compact = compact
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def enqueue(self, rows: list[sqlite3.Row]) -> None:
+        """Encola el último registro de cada dispositivo en una sola transacción."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                enqueued_at = now
+                if self.compact:
+                    oldest = self.conn.execute(
+                        "SELECT MIN(enqueued_at) FROM outbox WHERE device_id = ?", (row['device_id'],)
+                    ).fetchone()[0]
+                    enqueued_at = oldest if oldest is not None else now
+                    self.conn.execute("DELETE FROM outbox WHERE device_id = ?", (row['device_id'],))
+                self.conn.execute("""
+                    INSERT INTO outbox (device_id, record_id, latitude, longitude, created_at, enqueued_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (row['device_id'], row['record_id'], row['latitude'], row['longitude'],
+                      str(row['created_at']), enqueued_at))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def pending(self, after_id: int = 0, limit: int = DRAIN_BATCH) -> list[sqlite3.Row]:
+        """Siguiente lote de pendientes en orden FIFO (paginación por id)."""
+        return self.conn.execute(
+            "SELECT * FROM outbox WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+        ).fetchall()
+
+    def ack(self, ids: list[int]) -> None:
+        """Elimina las filas entregadas."""
+        if ids:
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def nack(self, ids: list[int], max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Registra un intento fallido; las filas quedan para el siguiente drenado
+        salvo las que llegan a `max_attempts`, que pasan a la cola de muertos.
+        Devuelve cuántas se movieron."""
+        if not ids:
+            return 0
+        self.conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+        exhausted = [row[0] for row in self.conn.execute(
+            f"SELECT id FROM outbox WHERE attempts >= ? AND id IN ({','.join('?' * len(ids))})",
+            (max_attempts, *ids)
+        )]
+        self._move_dead(exhausted, f"{max_attempts} intentos fallidos")
+        return len(exhausted)
+
+    def dead_letter(self, ids: list[int], reason: str) -> None:
+        """Cuenta el intento y mueve las filas a `outbox_dead` con el motivo."""
+        if ids:
+            self.conn.executemany("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+            self._move_dead(ids, reason)
+
+    def _move_dead(self, ids: list[int], reason: str) -> None:
+        if not ids:
+            return
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for i in ids:
+                self.conn.execute("""
+                    INSERT INTO outbox_dead (device_id, record_id, latitude, longitude, created_at,
+                                             enqueued_at, attempts, reason, failed_at)
+                    SELECT device_id, record_id, latitude, longitude, created_at, enqueued_at, attempts, ?, ?
+                      FROM outbox WHERE id = ?
+                """, (reason, now, i))
+                self.conn.execute("DELETE FROM outbox WHERE id = ?", (i,))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Tuple[int, float]:
+        """Profundidad de la cola y antigüedad en segundos del pendiente más viejo."""
+        depth, oldest = self.conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM outbox").fetchone()
+        return depth, (time.time() - oldest) if oldest is not None else 0.0
+
+    def close(self) -> None:
+        self.conn.close()
+
+# ----- Notificaciones de la app -----
+
+class ChangeSignal:
+    """Despierta el bucle de envío cuando la app guarda registros nuevos.
+
+    Acumula los dispositivos notificados hasta la siguiente ronda, de modo que
+    una ráfaga de un mismo dispositivo produce un solo upload.
+    """
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.devices: set[str] = set()
+
+    def notify(self, device_ids=()) -> None:
+        self.devices.update(device_ids)
+        self.event.set()
+
+    async def wait(self, timeout: float, coalesce: float) -> Optional[set[str]]:
+        """Espera una notificación (o `timeout` segundos) y devuelve los
+        dispositivos notificados, o None si venció el tiempo."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        # Deja llegar el resto de la ráfaga antes de arrancar la ronda
+        if coalesce > 0:
+            await asyncio.sleep(coalesce)
+        devices, self.devices = self.devices, set()
+        self.event.clear()
+        return devices
+
+class NotifyProtocol(asyncio.DatagramProtocol):
+    """Recibe por el socket Unix los device_id que la app acaba de guardar."""
+
+    def __init__(self, signal: ChangeSignal):
+        self.signal = signal
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.signal.notify(device_id for device_id in data.decode(errors="replace").split("\n") if device_id)
+
+async def listen_socket(path: str, signal: ChangeSignal) -> asyncio.DatagramTransport:
+    """Escucha notificaciones en el socket Unix `path` (se recrea si quedó uno viejo)."""
+    if os.path.exists(path):
+        os.unlink(path)
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: NotifyProtocol(signal), local_addr=path, family=socket.AF_UNIX
+    )
+    return transport
+
+async def watch_data_version(conn: sqlite3.Connection, signal: ChangeSignal,
+                             interval: float = WATCH_INTERVAL) -> None:
+    """Avisa cuando otra conexión confirma cambios en la BD.
+
+    PRAGMA data_version solo cambia con commits de otras conexiones y se lee
+    de la memoria compartida del WAL, así que es mucho más barato que repetir
+    la consulta de últimas ubicaciones. Sirve aunque la app no notifique.
+    """
+    last = conn.execute("PRAGMA data_version").fetchone()[0]
+    while True:
+        await asyncio.sleep(interval)
+        current = conn.execute("PRAGMA data_version").fetchone()[0]
+        if current != last:
+            last = current
+            signal.notify()
+
+# ----- Envío asíncrono -----
+
+@dataclass
+class RoundStats:
+    """Resultado de una ronda de envío."""
+    ok: int = 0
+    failed: int = 0
+    rejected: int = 0
+    dead: int = 0
+    skipped: int = 0
+    unchanged: int = 0
+    depth: int = 0
+    oldest_age: float = 0.0
+    duration: float = 0.0
+
+class Uploader:
+    """Motor de envío asíncrono con sesión keep-alive compartida.
+
+    Limita los uploads simultáneos con un semáforo y reintenta con backoff
+    exponencial con jitter los errores transitorios (red, timeout, 429, 5xx).
+    El resto de respuestas 4xx no se reintentan y se informan como rechazo.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, concurrency: int = CONCURRENCY,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, base_url: str = API_BASE_URL):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Espera antes del siguiente intento: Retry-After si viene, si no full jitter."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def upload_location(self, device_id: str, api_key: str, latitude: float, longitude: float) -> str:
+        """Sube una posición; devuelve UPLOAD_OK, UPLOAD_FAILED (error transitorio
+        tras agotar los reintentos) o UPLOAD_REJECTED (4xx no reintentable)."""
+        url = f"{self.base_url}{UPDATE_ENDPOINT}"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        payload = {
+            "serialNumber": device_id,
+            "lastLatitude": latitude,
+            "lastLongitude": longitude
+        }
+        started = time.perf_counter()
+        result = await self._upload_with_retries(url, headers, payload, device_id, latitude, longitude)
+        UPLOAD_SECONDS.observe(time.perf_counter() - started, result)
+        UPLOADS.inc(result)
+        return result
+
+    async def _upload_with_retries(self, url: str, headers: dict, payload: dict,
+                                   device_id: str, latitude: float, longitude: float) -> str:
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                # El semáforo solo cubre la request: las esperas de backoff no ocupan cupo
+                async with self.semaphore, self.session.put(url, headers=headers, json=payload) as resp:
+                    if resp.ok:
+                        print(f"[OK] Dispositivo {device_id} → ({latitude}, {longitude})")
+                        return UPLOAD_OK
+                    text = await resp.text()
+                    UPLOAD_ERRORS.inc(str(resp.status))
+                    if resp.status != 429 and resp.status < 500:
+                        print(f"[FAIL] Dispositivo {device_id}: {resp.status} {text}")
+                        return UPLOAD_REJECTED
+                    retry_after = resp.headers.get("Retry-After")
+                    error = f"{resp.status} {text}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                UPLOAD_ERRORS.inc("timeout" if isinstance(e, asyncio.TimeoutError) else "network")
+                error = repr(e)
+
+            if attempt == self.max_retries:
+                print(f"[ERROR] Falló request para {device_id} tras {attempt + 1} intentos: {error}")
+                return UPLOAD_FAILED
+            delay = self.backoff(attempt, retry_after)
+            print(f"[RETRY] Dispositivo {device_id}: {error}; reintento en {delay:.2f}s")
+            await asyncio.sleep(delay)
+        return UPLOAD_FAILED
+
+    async def upload_round(self, uploads: list[Tuple[str, str, float, float]]) -> Tuple[RoundStats, list[str]]:
+        """Sube una lista de (device_id, api_key, latitude, longitude).
+
+        Los dispositivos se suben en paralelo, pero las posiciones de un mismo
+        dispositivo van una tras otra y en orden, para que el backend no reciba
+        una posición vieja después de una nueva. Si una falla, las siguientes
+        del dispositivo quedan como UPLOAD_DEFERRED.
+
+        Devuelve las estadísticas de la ronda y el resultado de cada upload, en orden.
+        """
+        started = time.monotonic()
+        results = [UPLOAD_DEFERRED] * len(uploads)
+        by_device: dict[str, list[int]] = {}
+        for index, upload in enumerate(uploads):
+            by_device.setdefault(upload[0], []).append(index)
+
+        async def upload_device(indexes: list[int]) -> None:
+            for index in indexes:
+                results[index] = await self.upload_location(*uploads[index])
+                if results[index] == UPLOAD_FAILED:
+                    return
+
+        await asyncio.gather(*(upload_device(indexes) for indexes in by_device.values()))
+        stats = RoundStats(
+            ok=results.count(UPLOAD_OK),
+            failed=results.count(UPLOAD_FAILED),
+            rejected=results.count(UPLOAD_REJECTED),
+            duration=time.monotonic() - started,
+        )
+        return stats, results
+
+async def drain(outbox: Outbox, uploader: Uploader, api_keys: dict[str, str],
+                batch_size: int = DRAIN_BATCH, max_attempts: int = MAX_ATTEMPTS) -> RoundStats:
+    """Vacía el outbox por lotes de `batch_size` filas, con memoria acotada.
+
+    Las filas rechazadas por el backend pasan a la cola de muertos; las que
+    fallan por errores transitorios se reintentan en rondas siguientes hasta
+    `max_attempts`. Se detiene cuando la cola se agota o cuando un lote falla
+    sin ningún upload correcto (backend caído), para no insistir hasta la
+    siguiente ronda.
+
+    Tras un fallo, las filas posteriores del mismo dispositivo esperan a la
+    siguiente ronda sin contar intento, así se reintenta primero la más vieja.
+    """
+    total = RoundStats()
+    started = time.monotonic()
+    last_id = 0
+    blocked: set[str] = set()
+    while True:
+        rows = outbox.pending(last_id, batch_size)
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        # Dispositivos dados de baja: su pendiente ya no puede autenticarse
+        orphans = [row['id'] for row in rows if row['device_id'] not in api_keys]
+        outbox.ack(orphans)
+        rows = [row for row in rows if row['device_id'] in api_keys and row['device_id'] not in blocked]
+        stats, results = await uploader.upload_round([
+            (row['device_id'], api_keys[row['device_id']], row['latitude'], row['longitude'])
+            for row in rows
+        ])
+        outbox.ack([row['id'] for row, result in zip(rows, results) if result == UPLOAD_OK])
+        rejected = [row['id'] for row, result in zip(rows, results) if result == UPLOAD_REJECTED]
+        outbox.dead_letter(rejected, "rechazada por el backend")
+        DEAD_LETTERS.inc("rejected", amount=len(rejected))
+        exhausted = outbox.nack([row['id'] for row, result in zip(rows, results) if result == UPLOAD_FAILED],
+                                max_attempts)
+        DEAD_LETTERS.inc("max_attempts", amount=exhausted)
+        blocked.update(row['device_id'] for row, result in zip(rows, results)
+                       if result in (UPLOAD_FAILED, UPLOAD_DEFERRED))
+        total.ok += stats.ok
+        total.failed += stats.failed
+        total.rejected += stats.rejected
+        total.dead += len(rejected) + exhausted
+        if stats.failed and not stats.ok:
+            break
+    total.duration = time.monotonic() - started
+    return total
+
+async def serve_metrics(request: web.Request) -> web.Response:
+    return web.Response(body=registry.render().encode(),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Publica las métricas del connector en http://host:port/metrics."""
+    app = web.Application()
+    app.router.add_get("/metrics", serve_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Métricas en http://{host}:{port}/metrics")
+    return runner
+
+async def run(conn: sqlite3.Connection, outbox: Outbox, args: argparse.Namespace) -> None:
+    """Bucle de envío: encola en el outbox los dispositivos con registros nuevos
+    (o con heartbeat vencido) y lo drena con uploads concurrentes.
+
+    Cada ronda arranca en cuanto llega una notificación de la app (socket Unix,
+    PRAGMA data_version), o a más tardar cada `args.interval` segundos como
+    respaldo."""
+    signal = ChangeSignal()
+    transport = None
+    watcher = None
+    if args.notify == "socket":
+        try:
+            transport = await listen_socket(args.socket, signal)
+            print(f"Escuchando notificaciones en {args.socket}")
+        except (OSError, NotImplementedError) as e:
+            print(f"[WARNING] No se pudo abrir el socket {args.socket} ({e}); uso PRAGMA data_version.")
+            args.notify = "data-version"
+    if args.notify == "data-version":
+        watcher = asyncio.create_task(watch_data_version(conn, signal, args.watch_interval))
+    metrics_runner = await start_metrics_server(args.metrics_host, args.metrics_port) if args.metrics_port else None
+
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=max(30, args.interval * 2))
+    try:
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await upload_loop(conn, outbox, args, signal, session)
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if transport is not None:
+            transport.close()
+            if os.path.exists(args.socket):
+                os.unlink(args.socket)
+
+async def upload_loop(conn: sqlite3.Connection, outbox: Outbox, args: argparse.Namespace,
+                      signal: ChangeSignal, session: aiohttp.ClientSession) -> None:
+    """Rondas de envío, cada una tras una notificación, un sondeo o el respaldo."""
+    uploader = Uploader(session, args.concurrency, args.retries, base_url=args.api_url)
+    marks: dict[str, HighWaterMark] = {}
+    trigger = "start"
+    notified: set[str] = set()
+    while True:
+        round_started = time.monotonic()
+        # La lista se relee cada ronda para tomar dispositivos nuevos sin reiniciar
+        devices = fetch_devices(conn)
+        latest = fetch_latest_locations(conn)
+        now = time.monotonic()
+        changed = []
+        skipped = 0
+        unchanged = 0
+        for device in devices:
+            device_id = device["device_id"]
+
+            loc = latest.get(device_id)
+            if not loc:
+                skipped += 1
+                continue
+            if not should_upload(marks.get(device_id), loc, now, args.min_distance, args.heartbeat):
+                unchanged += 1
+                continue
+            changed.append(loc)
+
+        outbox.enqueue(changed)
+        for loc in changed:
+            marks[loc['device_id']] = HighWaterMark(
+                loc['record_id'], loc['created_at'], loc['latitude'], loc['longitude'], now
+            )
+        # Olvida dispositivos dados de baja
+        api_keys = {device["device_id"]: device["api_key"] for device in devices}
+        for device_id in marks.keys() - api_keys.keys():
+            del marks[device_id]
+
+        stats = await drain(outbox, uploader, api_keys, args.drain_batch, args.max_attempts)
+        stats.skipped = skipped
+        stats.unchanged = unchanged
+        stats.depth, stats.oldest_age = outbox.stats()
+        ROUND_SECONDS.observe(time.monotonic() - round_started, trigger)
+        OUTBOX_DEPTH.set(stats.depth)
+        OUTBOX_OLDEST.set(stats.oldest_age)
+        print(f"[ROUND] {trigger} notified={len(notified)} {stats.duration:.3f}s ok={stats.ok} "
+              f"failed={stats.failed} rejected={stats.rejected} dead={stats.dead} "
+              f"unchanged={stats.unchanged} skipped={stats.skipped} "
+              f"outbox={stats.depth} oldest={stats.oldest_age:.1f}s")
+
+        # Con el backend caído no se reintenta en cada notificación
+        if stats.failed and not stats.ok:
+            await asyncio.sleep(min(args.interval, POLL_INTERVAL))
+        # Espera una notificación o, como respaldo, el intervalo de sondeo
+        if args.notify == "poll":
+            await asyncio.sleep(args.interval)
+            trigger, notified = "poll", set()
+        else:
+            notified = await signal.wait(args.interval, args.coalesce)
+            trigger = "timeout" if notified is None else "notify"
+            notified = notified or set()
 
 # ----- Main -----
 
@@ -82,9 +617,57 @@ def main():
         help="(Opcional) Ruta al archivo .sqlite o .db. " +
              "Si no se indica, busca en el mismo directorio del script."
     )
+    parser.add_argument("--interval", type=float, default=None,
+                        help=f"Segundos entre rondas: {POLL_INTERVAL:g} con --notify poll; con notificaciones, "
+                             f"máximo entre rondas como respaldo ({FALLBACK_INTERVAL:g} por defecto).")
+    parser.add_argument("--notify", choices=["socket", "data-version", "poll"],
+                        default="socket" if hasattr(socket, "AF_UNIX") else "data-version",
+                        help="Cómo se entera de registros nuevos: socket Unix de la app, "
+                             "PRAGMA data_version de la BD, o solo sondeo periódico.")
+    parser.add_argument("--socket", default=None,
+                        help="Socket Unix de notificaciones (por defecto NOTIFY_SOCKET de la configuración).")
+    parser.add_argument("--coalesce", type=float, default=COALESCE,
+                        help="Segundos que se agrupan notificaciones antes de una ronda.")
+    parser.add_argument("--watch-interval", type=float, default=WATCH_INTERVAL,
+                        help="Segundos entre lecturas de PRAGMA data_version con --notify data-version.")
+    parser.add_argument("--api-url", default=API_BASE_URL,
+                        help="URL base del backend (p. ej. el stub de benchmarks/stub_backend.py).")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Máximo de uploads simultáneos.")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT,
+                        help="Timeout por intento, en segundos.")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES,
+                        help="Reintentos ante 429/5xx o errores de red.")
+    parser.add_argument("--min-distance", type=float, default=MIN_DISTANCE,
+                        help="Metros mínimos de desplazamiento para volver a subir (0 = cualquier registro nuevo).")
+    parser.add_argument("--heartbeat", type=float, default=HEARTBEAT,
+                        help="Segundos máximos sin subir un dispositivo aunque no cambie.")
+    parser.add_argument("--outbox", default=os.path.join(script_dir, OUTBOX_FILE),
+                        help="Ruta del SQLite donde se guardan los uploads pendientes.")
+    parser.add_argument("--no-compact", dest="compact", action="store_false",
+                        help="Conserva todas las posiciones pendientes, no solo la última por dispositivo.")
+    parser.add_argument("--drain-batch", type=int, default=DRAIN_BATCH,
+                        help="Filas del outbox procesadas por lote.")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                        help="Rondas fallidas antes de mover una posición a la cola de muertos (outbox_dead).")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Puerto donde publicar /metrics para Prometheus (0 = desactivado).")
+    parser.add_argument("--metrics-host", default=METRICS_HOST,
+                        help="Interfaz donde escucha el servidor de métricas.")
     args = parser.parse_args()
+    if args.socket is None:
+        if not config.NOTIFY_SOCKET:
+            # La app no notifica por socket: queda el aviso de la propia BD
+            args.notify = "poll" if args.notify == "poll" else "data-version"
+        args.socket = config.notify_socket_path()
+    if args.interval is None:
+        args.interval = POLL_INTERVAL if args.notify == "poll" else FALLBACK_INTERVAL
+
+    # Si no pasaron db_path, usamos DB_PATH de la configuración compartida con la app
+    if args.db_path is None and os.path.exists(config.DB_PATH):
+        args.db_path = config.DB_PATH
 
-    # Si no pasaron db_path, buscamos un .sqlite/.db en la carpeta
+    # Si tampoco existe, buscamos un .sqlite/.db en la carpeta
     if args.db_path is None:
         candidates = glob.glob(os.path.join(script_dir, "*.sqlite")) + \
                      glob.glob(os.path.join(script_dir, "*.db"))
@@ -99,31 +682,24 @@ def main():
 
     print(f"Usando base de datos: {args.db_path}")
     conn = connect_db(args.db_path)
-    devices = fetch_devices(conn)
+    if not fetch_devices(conn):
+        print("[WARNING] No hay dispositivos en la tabla `devices` todavía; se reintentará cada ronda.")
 
-    if not devices:
-        print("No se encontraron dispositivos en la tabla `devices`.")
-        return
+    outbox = Outbox(args.outbox, args.compact)
+    depth, oldest_age = outbox.stats()
+    print(f"Outbox: {args.outbox} ({depth} pendientes, el más antiguo hace {oldest_age:.1f}s)")
 
-    print("Iniciando envío periódico cada 5 segundos. Presiona Ctrl+C para detener.")
+    if args.notify == "poll":
+        print(f"Iniciando envío periódico cada {args.interval:g} segundos. Presiona Ctrl+C para detener.")
+    else:
+        print(f"Iniciando envío por notificación ({args.notify}), con respaldo cada {args.interval:g} segundos. "
+              "Presiona Ctrl+C para detener.")
     try:
-        while True:
-            for device in devices:
-                device_id = device["device_id"]
-                api_key   = device["api_key"]
-
-                loc = fetch_latest_location(conn, device_id)
-                if loc:
-                    latitude, longitude = loc
-                    upload_location(device_id, api_key, latitude, longitude)
-                else:
-                    print(f"[SKIP] Sin registros de ubicación para {device_id}")
-
-            # Espera antes de la siguiente ronda
-            time.sleep(5)
-
+        asyncio.run(run(conn, outbox, args))
     except KeyboardInterrupt:
         print("\nEnvío periódico detenido por el usuario.")
+    finally:
+        outbox.close()
 
 if __name__ == "__main__":
     main()
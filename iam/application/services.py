@@ -3,6 +3,7 @@ from typing import Optional
 
 from iam.domain.entities import Device
 from iam.domain.services import AuthService
+from iam.infrastructure.cache import device_credential_cache
 from iam.infrastructure.repositories import DeviceRepository
 
 class AuthApplicationService:
@@ -26,6 +27,27 @@ class AuthApplicationService:
         device: Optional[Device] = self.device_repository.find_by_id_and_api_key(device_id, api_key)
         return self.auth_service.authenticate(device)
 
+    def rotate_api_key(self, device_id: str, api_key: str) -> Optional[Device]:
+        """Rotate the API key of a device.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+            api_key (str): New API key.
+
+        Returns:
+            Optional[Device]: Updated device entity, None if it does not exist.
+        """
+        return self.device_repository.rotate_api_key(device_id, api_key)
+
+    @staticmethod
+    def credential_cache_stats() -> dict:
+        """Get hit/miss counters of the device credential cache.
+
+        Returns:
+            dict: Cache size, capacity and counters.
+        """
+        return device_credential_cache.stats()
+
     def get_or_create_test_device(self) -> Device:
         """Get or create a test device for development.
 
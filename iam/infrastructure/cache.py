@@ -0,0 +1,151 @@
+"""In-process device credential cache for the IAM bounded context."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from iam.domain.entities import Device
+from shared.infrastructure import config
+from shared.infrastructure.metrics import counter, gauge
+
+# Marker returned by lookup() when the device_id is not cached at all
+MISS = object()
+
+
+class DeviceCredentialCache:
+    """Bounded LRU cache of devices keyed on device_id, with TTL expiry.
+
+    Devices that do not exist are cached as None for a shorter negative TTL so
+    unknown ids cannot hammer the database. API keys are compared by the caller,
+    so a wrong key for a known device never reaches the database either.
+
+    Each process has its own cache. Credential changes made by any process bump
+    a shared revision, which sync() checks at most every `sync_interval`
+    seconds, dropping every entry when it moved.
+
+    Attributes:
+        max_size (int): Maximum number of cached device ids.
+        ttl (float): Seconds a found device stays cached.
+        negative_ttl (float): Seconds a missing device stays cached.
+        sync_interval (float): Seconds between checks of the shared revision.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to go to the database.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float, sync_interval: float = 1.0):
+        """Initialize an empty cache.
+
+        Args:
+            max_size (int): Maximum number of cached device ids.
+            ttl (float): Seconds a found device stays cached.
+            negative_ttl (float): Seconds a missing device stays cached.
+            sync_interval (float): Seconds between checks of the shared revision.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.sync_interval = sync_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[Optional[Device], float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._revision: Optional[int] = None
+        self._next_sync = 0.0
+
+    def sync(self, read_revision: Callable[[], int]) -> None:
+        """Drop every entry if the shared credential revision moved.
+
+        Reads the revision at most once per `sync_interval` seconds.
+
+        Args:
+            read_revision (Callable[[], int]): Returns the current shared revision.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+        revision = read_revision()
+        with self._lock:
+            if self._revision is not None and revision != self._revision:
+                self._entries.clear()
+            self._revision = revision
+
+    def lookup(self, device_id: str):
+        """Return the cached device (or None for a cached miss), or MISS.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+        """
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(device_id)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[device_id]
+            self.misses += 1
+            return MISS
+
+    def store(self, device_id: str, device: Optional[Device]) -> None:
+        """Cache the result of a database lookup.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+            device (Optional[Device]): Device found, or None if it does not exist.
+        """
+        ttl = self.ttl if device is not None else self.negative_ttl
+        with self._lock:
+            self._entries[device_id] = (device, time.monotonic() + ttl)
+            self._entries.move_to_end(device_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, device_id: str) -> None:
+        """Drop a device from the cache, e.g. after it is created or its key rotates.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+        """
+        with self._lock:
+            self._entries.pop(device_id, None)
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every DeviceRepository in the process
+device_credential_cache = DeviceCredentialCache(
+    config.DEVICE_CACHE_SIZE, config.DEVICE_CACHE_TTL, config.DEVICE_CACHE_NEGATIVE_TTL,
+    config.DEVICE_CACHE_SYNC_INTERVAL
+)
+
+gauge(
+    "edge_device_cache_entries",
+    "Devices held by the credential cache.",
+    callback=lambda: device_credential_cache.stats()["size"],
+)
+counter(
+    "edge_device_cache_lookups_total",
+    "Credential cache lookups by result (hit or miss).",
+    ("result",),
+    callback=lambda: {("hit",): device_credential_cache.hits, ("miss",): device_credential_cache.misses},
+)
@@ -1,5 +1,5 @@
 """Peewee models for the IAM bounded context."""
-from peewee import Model, CharField, DateTimeField
+from peewee import Model, CharField, DateTimeField, IntegerField
 from shared.infrastructure.database import db
 
 
@@ -19,3 +19,22 @@ class Device(Model):
         """Metadata for the Device model."""
         database    = db
         table_name  = 'devices'
+
+
+class CredentialRevision(Model):
+    """Peewee model for the single-row 'credential_revisions' table.
+
+    Bumped whenever a device is created or its API key changes, so every
+    process can tell that its credential cache is stale.
+
+    Attributes:
+        id (IntegerField): Always 1.
+        revision (IntegerField): Number of credential changes so far.
+    """
+    id          = IntegerField(primary_key=True)
+    revision    = IntegerField()
+
+    class Meta:
+        """Metadata for the CredentialRevision model."""
+        database    = db
+        table_name  = 'credential_revisions'
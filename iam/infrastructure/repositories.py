@@ -1,32 +1,100 @@
 """Repositories for the IAM bounded context."""
+import hmac
+from datetime import datetime
 from typing import Optional
 
 import peewee
 
 from iam.domain.entities import Device
+from iam.infrastructure.cache import MISS, device_credential_cache
+from iam.infrastructure.models import CredentialRevision
 from iam.infrastructure.models import Device as DeviceModel
+from shared.infrastructure.database import db
 
 class DeviceRepository:
     """Repository for managing Device entities."""
 
     @staticmethod
-    def find_by_id_and_api_key(device_id: str, api_key: str) -> Optional[Device]:
-        """Find a device by its ID and API key.
+    def find_by_id(device_id: str) -> Optional[Device]:
+        """Find a device by its ID, going through the credential cache.
 
         Args:
             device_id (str): Unique identifier of the device.
-            api_key (str): API key for authentication.
 
         Returns:
             Optional[Device]: Device entity if found, None otherwise.
         """
+        device_credential_cache.sync(DeviceRepository.credential_revision)
+        device = device_credential_cache.lookup(device_id)
+        if device is not MISS:
+            return device
         try:
-            device = DeviceModel.get(
-                (DeviceModel.device_id == device_id) & (DeviceModel.api_key == api_key)
-            )
-            return Device(device.device_id, device.api_key, device.created_at)
+            model = DeviceModel.get(DeviceModel.device_id == device_id)
+            device = Device(model.device_id, model.api_key, model.created_at)
         except peewee.DoesNotExist:
+            device = None
+        device_credential_cache.store(device_id, device)
+        return device
+
+    @staticmethod
+    def find_by_id_and_api_key(device_id: str, api_key: str) -> Optional[Device]:
+        """Find a device by its ID and API key.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+            api_key (str): API key for authentication.
+
+        Returns:
+            Optional[Device]: Device entity if found, None otherwise. Credentials
+            that are not strings (e.g. a numeric or null api_key from a JSON body)
+            never match.
+        """
+        if not isinstance(device_id, str) or not isinstance(api_key, str):
             return None
+        device = DeviceRepository.find_by_id(device_id)
+        if device is None or not hmac.compare_digest(device.api_key.encode(), api_key.encode()):
+            return None
+        return device
+
+    @staticmethod
+    def credential_revision() -> int:
+        """Read the shared credential revision.
+
+        Returns:
+            int: Number of credential changes so far, 0 if there were none.
+        """
+        row = CredentialRevision.get_or_none(CredentialRevision.id == 1)
+        return row.revision if row is not None else 0
+
+    @staticmethod
+    def _bump_credential_revision() -> None:
+        """Tell the credential caches of every process that a device changed."""
+        (CredentialRevision
+         .insert(id=1, revision=1)
+         .on_conflict(conflict_target=[CredentialRevision.id],
+                      update={CredentialRevision.revision: CredentialRevision.revision + 1})
+         .execute())
+
+    @staticmethod
+    def rotate_api_key(device_id: str, api_key: str) -> Optional[Device]:
+        """Replace the API key of a device.
+
+        The cache of this process forgets the device at once; other processes
+        see the bumped credential revision within DEVICE_CACHE_SYNC_INTERVAL.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+            api_key (str): New API key.
+
+        Returns:
+            Optional[Device]: Updated device entity, None if it does not exist.
+        """
+        with db.atomic("IMMEDIATE"):
+            updated = DeviceModel.update(api_key=api_key).where(DeviceModel.device_id == device_id).execute()
+            if updated:
+                DeviceRepository._bump_credential_revision()
+        device_credential_cache.invalidate(device_id)
+        return DeviceRepository.find_by_id(device_id) if updated else None
 
     @staticmethod
     def get_or_create_test_device() -> Device:
@@ -35,8 +103,11 @@ class DeviceRepository:
         Returns:
             Device: The test device entity.
         """
-        device, _ = DeviceModel.get_or_create(
+        device, created = DeviceModel.get_or_create(
             device_id="gps-collar-001",
-            defaults={"api_key": "test-api-key-123", "created_at": "2025-06-04T23:23:00Z"}
+            defaults={"api_key": "test-api-key-123", "created_at": datetime(2025, 6, 4, 23, 23)}
         )
-        return Device(device.device_id, device.api_key, device.created_at)
\ No newline at end of file
+        if created:
+            DeviceRepository._bump_credential_revision()
+            device_credential_cache.invalidate(device.device_id)
+        return Device(device.device_id, device.api_key, device.created_at)
@@ -1,6 +1,10 @@
 """Interface services for the IAM bounded context."""
+import hmac
+import secrets
+
 from flask import Blueprint, request, jsonify
 from iam.application.services import AuthApplicationService
+from shared.infrastructure import config
 
 iam_api = Blueprint("iam_api", __name__)
 
@@ -10,15 +14,87 @@ auth_service = AuthApplicationService()
 def authenticate_request():
     """Authenticate an incoming HTTP request.
 
-    Checks for device_id in the JSON body and X-API-Key in headers.
+    Checks for device_id in the JSON body and X-API-Key in headers. A body that
+    is not a JSON object carries no device_id.
+
+    Returns:
+        tuple: (JSON response, status code) if authentication fails, None if successful.
+    """
+    data = request.get_json(silent=True)
+    device_id = data.get("device_id") if isinstance(data, dict) else None
+    return authenticate_device(device_id)
+
+def authenticate_device(device_id):
+    """Authenticate an incoming HTTP request on behalf of a known device_id.
+
+    Used by routes that carry the device in the URL instead of a JSON body.
+    Checks the X-API-Key header against that device.
+
+    Args:
+        device_id (str): Unique identifier of the device.
 
     Returns:
         tuple: (JSON response, status code) if authentication fails, None if successful.
     """
-    device_id = request.json.get("device_id") if request.json else None
     api_key = request.headers.get("X-API-Key")
     if not device_id or not api_key:
         return jsonify({"error": "Missing device_id or X-API-Key"}), 401
     if not auth_service.authenticate(device_id, api_key):
         return jsonify({"error": "Invalid device_id or API key"}), 401
-    return None
\ No newline at end of file
+    return None
+
+def authenticate_admin():
+    """Authenticate a request to a fleet-wide endpoint.
+
+    Checks the X-API-Key header against the configured ADMIN_API_KEY.
+
+    Returns:
+        tuple: (JSON response, status code) if authentication fails, None if successful.
+    """
+    if not config.ADMIN_API_KEY:
+        return jsonify({"error": "Admin API disabled"}), 403
+    api_key = request.headers.get("X-API-Key") or ""
+    if not hmac.compare_digest(api_key.encode(), config.ADMIN_API_KEY.encode()):
+        return jsonify({"error": "Invalid API key"}), 401
+    return None
+
+@iam_api.route("/api/v1/iam/credential-cache", methods=["GET"])
+def credential_cache_stats():
+    """Expose the device credential cache counters of this process.
+
+    Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    return jsonify(auth_service.credential_cache_stats()), 200
+
+@iam_api.route("/api/v1/iam/devices/<device_id>/api-key", methods=["POST"])
+def rotate_api_key(device_id):
+    """Replace the API key of a device.
+
+    Expects optional JSON with api_key; a random key is generated when it is
+    missing. The old key stops working in every server process within
+    DEVICE_CACHE_SYNC_INTERVAL seconds. Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response with device_id and the new api_key, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    api_key = data.get("api_key", secrets.token_urlsafe(32))
+    if not isinstance(api_key, str) or not api_key:
+        return jsonify({"error": "api_key must be a non-empty string"}), 400
+    device = auth_service.rotate_api_key(device_id, api_key)
+    if device is None:
+        return jsonify({"error": "Device not found"}), 404
+    return jsonify({"device_id": device.device_id, "api_key": device.api_key}), 200
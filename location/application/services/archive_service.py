@@ -0,0 +1,124 @@
+import logging
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+
+from location.domain.entities.location_record import LocationRecord
+from location.infrastructure.repositories.archive_repository import (ArchiveRepository, DayArchive, from_epoch_us,
+                                                                     to_epoch_us)
+from location.infrastructure.repositories.location_repository import LocationRecordRepository
+from shared.infrastructure import config
+from shared.infrastructure.database import db
+
+logger = logging.getLogger(__name__)
+
+class ArchiveApplicationService:
+    """Moves aged location_records into per-device, per-day columnar files and reads them back."""
+
+    def __init__(self, archive_repo: ArchiveRepository = None):
+        self.repo = LocationRecordRepository()
+        self.archive_repo = archive_repo or ArchiveRepository(config.ARCHIVE_DIR, config.ARCHIVE_COMPRESS)
+        self._job: Optional[dict] = None
+        self._job_lock = threading.Lock()
+
+    def start_archive(self, before: date) -> tuple[dict, bool]:
+        """Run archive_before in a background thread.
+
+        Only one run per process at a time: while one is running, its job is
+        returned instead of starting another.
+
+        Returns:
+            tuple: (job state, whether a new job was started).
+        """
+        with self._job_lock:
+            if self._job is not None and self._job["status"] == "running":
+                return dict(self._job), False
+            self._job = {
+                "id": uuid.uuid4().hex,
+                "before": before.isoformat(),
+                "status": "running",
+                "started_at": datetime.utcnow().isoformat() + "Z",
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            job = dict(self._job)
+        threading.Thread(target=self._run_job, args=(job["id"], before), name="location-archive",
+                         daemon=True).start()
+        return job, True
+
+    def job(self) -> Optional[dict]:
+        """State of the latest archive job of this process, None if none was started."""
+        with self._job_lock:
+            return dict(self._job) if self._job is not None else None
+
+    def _run_job(self, job_id: str, before: date) -> None:
+        try:
+            with db.connection_context():
+                result, error = self.archive_before(before), None
+        except Exception as e:
+            # Finished device-days stay archived; a new run picks up the rest
+            logger.exception("Archiving records before %s failed", before)
+            result, error = None, str(e)
+        with self._job_lock:
+            if self._job is None or self._job["id"] != job_id:
+                return
+            self._job.update(
+                status="done" if result is not None else "failed",
+                finished_at=datetime.utcnow().isoformat() + "Z",
+                result=result,
+                error=error,
+            )
+
+    def archive_before(self, before: date) -> dict:
+        """Archive every whole day before `before`, one device-day at a time.
+
+        Each file is written and fsynced before the archived ids are deleted from
+        SQLite, so an interrupted run never loses rows; re-running merges them.
+        """
+        devices = set()
+        days = 0
+        records = 0
+        for device_id, day in self.repo.archivable_days(before):
+            start = datetime.combine(day, time())
+            rows = list(self.repo.iter_history(device_id, start, start + timedelta(days=1)))
+            if not rows:
+                continue
+            self.archive_repo.append(
+                device_id, day,
+                np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter((to_epoch_us(row.created_at) for row in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter((row.latitude for row in rows), dtype=np.float64, count=len(rows)),
+                np.fromiter((row.longitude for row in rows), dtype=np.float64, count=len(rows)),
+            )
+            self.repo.delete_ids([row.id for row in rows])
+            devices.add(device_id)
+            days += 1
+            records += len(rows)
+        return {"devices": len(devices), "days": days, "records": records}
+
+    def read_range(self, device_id: str, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None) -> Iterator[tuple[date, DayArchive]]:
+        """Archived columns per day for analytics; arrays are zero-copy views of the files."""
+        return self.archive_repo.iter_range(device_id, start, end)
+
+    def iter_records(self, device_id: str, day: date, start: Optional[datetime], end: Optional[datetime],
+                     after: Optional[tuple[datetime, int]]) -> Iterator[LocationRecord]:
+        """Records of one archived day within [start, end) and after the cursor, in (created_at, id) order."""
+        archive = self.archive_repo.read(device_id, day)
+        if archive is None:
+            return
+        mask = np.ones(len(archive), dtype=bool)
+        if start is not None:
+            mask &= archive.ts >= to_epoch_us(start)
+        if end is not None:
+            mask &= archive.ts < to_epoch_us(end)
+        if after is not None:
+            after_ts, after_id = to_epoch_us(after[0]), after[1]
+            mask &= (archive.ts > after_ts) | ((archive.ts == after_ts) & (archive.id > after_id))
+        for record_id, ts, latitude, longitude in zip(archive.id[mask].tolist(), archive.ts[mask].tolist(),
+                                                      archive.latitude[mask].tolist(), archive.longitude[mask].tolist()):
+            yield LocationRecord(device_id, latitude, longitude, from_epoch_us(ts), record_id)
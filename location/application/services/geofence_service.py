@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+from location.domain.entities.geofence import Geofence, GeofenceEvent
+from location.domain.entities.location_record import LocationRecord
+from location.domain.services.geofence_index import GeofenceIndex
+from location.infrastructure.repositories.geofence_repository import GeofenceRepository
+from shared.infrastructure import config
+
+class GeofenceApplicationService:
+    """Stores geofences and evaluates ingested records against them.
+
+    The GeofenceIndex is rebuilt lazily whenever the set of fences changes.
+    Changes made through this service are picked up immediately; changes made
+    by other processes sharing the database within GEOFENCE_INDEX_TTL seconds,
+    so the ingest path does not query the fences table on every insert.
+    """
+
+    def __init__(self):
+        self.repo = GeofenceRepository()
+        self._index: Optional[GeofenceIndex] = None
+        self._version = None
+        self._checked_until = 0.0
+        # Bumped by local fence changes so a concurrent check cannot re-arm the TTL
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def create_geofence(self, name: str, vertices: list[tuple[float, float]], device_id: Optional[str] = None) -> Geofence:
+        if device_id is not None and not isinstance(device_id, str):
+            raise ValueError("device_id must be a string")
+        if len(vertices) < 3:
+            raise ValueError("A geofence needs at least 3 vertices")
+        for lat, lon in vertices:
+            if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+                raise ValueError("Coordinates out of range")
+        fence = self.repo.save(Geofence(name, [(float(lat), float(lon)) for lat, lon in vertices], device_id))
+        self._invalidate()
+        return fence
+
+    def list_geofences(self) -> list[Geofence]:
+        return self.repo.find_all()
+
+    def delete_geofence(self, fence_id: int) -> bool:
+        deleted = self.repo.delete(fence_id)
+        self._invalidate()
+        return deleted
+
+    def list_events(self, device_id: Optional[str], limit: int) -> list[GeofenceEvent]:
+        return self.repo.find_events(device_id, limit)
+
+    def index(self) -> GeofenceIndex:
+        """Current index, rebuilt if fences were added or removed since it was built."""
+        now = time.monotonic()
+        if self._index is not None and now < self._checked_until:
+            return self._index
+        generation = self._generation
+        version = self.repo.version()
+        with self._lock:
+            if self._index is None or version != self._version:
+                self._index = GeofenceIndex(self.repo.find_all(), config.GEOFENCE_CELL_SIZE)
+                self._version = version
+            if generation == self._generation:
+                self._checked_until = now + config.GEOFENCE_INDEX_TTL
+            return self._index
+
+    def _invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._index = None
+            self._version = None
+            self._checked_until = 0.0
+
+    def evaluate(self, records: list[LocationRecord]) -> list[GeofenceEvent]:
+        """Test a batch of records against every applicable fence and record transitions.
+
+        Records are applied per device in created_at order. A device enters a
+        fence the first time one of its points is inside it and exits when a
+        later point is outside; a device with no prior state starts outside.
+        A fix older than the newest one already applied to its device arrives
+        too late to change the state and is ignored.
+
+        Runs in one write transaction: called from the location insert, the
+        states change in the same commit as the records.
+        """
+        if not records:
+            return []
+        index = self.index()
+        if not index.fences:
+            return []
+
+        records = sorted(records, key=lambda record: (record.device_id, record.created_at))
+        points, fences = index.contains(
+            np.fromiter((record.latitude for record in records), dtype=np.float64, count=len(records)),
+            np.fromiter((record.longitude for record in records), dtype=np.float64, count=len(records)),
+        )
+        containing: list[set[int]] = [set() for _ in records]
+        for point, fence in zip(points.tolist(), fences.tolist()):
+            owner = index.fences[fence].device_id
+            if owner is None or owner == records[point].device_id:
+                containing[point].add(index.fences[fence].id)
+
+        device_ids = {record.device_id for record in records}
+        with self.repo.transaction():
+            inside = self.repo.find_inside(device_ids)
+            last_fixes = self.repo.find_last_fixes(device_ids)
+            applied: dict[str, datetime] = {}
+            events = []
+            for record, now_inside in zip(records, containing):
+                last_fix = last_fixes.get(record.device_id)
+                if last_fix is not None and record.created_at < last_fix:
+                    continue
+                before = inside[record.device_id]
+                for fence_id in sorted(now_inside - before):
+                    events.append(self._event(fence_id, record, GeofenceEvent.ENTER))
+                for fence_id in sorted(before - now_inside):
+                    events.append(self._event(fence_id, record, GeofenceEvent.EXIT))
+                inside[record.device_id] = now_inside
+                applied[record.device_id] = last_fixes[record.device_id] = record.created_at
+            self.repo.record_transitions(events, applied)
+        return events
+
+    @staticmethod
+    def _event(fence_id: int, record: LocationRecord, event: str) -> GeofenceEvent:
+        return GeofenceEvent(fence_id, record.device_id, event, record.latitude, record.longitude,
+                             record.created_at or datetime.utcnow(), record.id)
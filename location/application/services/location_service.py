@@ -1,15 +1,316 @@
-from datetime import datetime
+import heapq
+import itertools
+from datetime import datetime, time, timedelta
+from time import perf_counter
+from typing import Iterator, Optional, Union
+
+from location.application.services.archive_service import ArchiveApplicationService
+from location.application.services.geofence_service import GeofenceApplicationService
 from location.domain.entities.location_record import LocationRecord
+from location.domain.services.geometry import haversine_m, radius_bounding_boxes
+from location.domain.services.timestamps import parse_timestamp
+from location.domain.services.track_filter import TrackFilter
+from location.infrastructure.metrics import (INGEST_STAGE, LOCATION_POINTS, UNKNOWN_DEVICE, count_points,
+                                             count_records)
 from location.infrastructure.repositories.location_repository import LocationRecordRepository
+from location.infrastructure.repositories.received_frame_repository import ReceivedFrameRepository
 from iam.infrastructure.repositories import DeviceRepository
+from shared.infrastructure import config
+
+def build_track_filter() -> Optional[TrackFilter]:
+    """Track filter configured from TRACK_* settings, or None when disabled."""
+    if not config.TRACK_FILTER:
+        return None
+    return TrackFilter(
+        config.TRACK_MAX_SPEED_MPS,
+        config.TRACK_STATIONARY_RADIUS_M,
+        config.TRACK_MAX_GAP_S,
+        config.TRACK_COMPRESSION,
+        config.TRACK_COMPRESSION_ERROR_M,
+        config.TRACK_SPEED_LIMITS,
+        config.TRACK_FILTER_MAX_DEVICES,
+    )
+
+class DeviceAuthError(ValueError):
+    """The device_id/api_key pair of a fix does not match a registered device."""
 
-class LocationRecordApplicationService:
     def __init__(self):
-        self.repo = LocationRecordRepository()
+        super().__init__("Device not found")
+
+class DuplicateFrameError(ValueError):
+    """A binary frame was already received within the replay window."""
+
+    def __init__(self):
+        super().__init__("Frame already received")
+
+class LocationRecordApplicationService:
+    def __init__(self, geofence_service: GeofenceApplicationService = None, track_filter: TrackFilter = None,
+                 archive_service: ArchiveApplicationService = None):
+        self.geofence_service = geofence_service or GeofenceApplicationService()
+        # Geofence transitions commit in the same transaction as the records
+        self.repo = LocationRecordRepository(on_insert=self._evaluate_geofences)
         self.device_repo = DeviceRepository()
+        self.frame_repo = ReceivedFrameRepository()
+        self.archive_service = archive_service or ArchiveApplicationService()
+        self.track_filter = track_filter or build_track_filter()
+
+    def create_location_record(self, device_id: str, lat: float, lon: float, created_at: Optional[str], api_key: str) -> LocationRecord:
+        with INGEST_STAGE.time("auth"):
+            device = self.device_repo.find_by_id_and_api_key(device_id, api_key)
+        if not device:
+            count_points([UNKNOWN_DEVICE], "rejected")
+            raise DeviceAuthError()
+        try:
+            with INGEST_STAGE.time("validate"):
+                record = self._validated_record(device_id, lat, lon, created_at)
+        except ValueError:
+            count_points([device_id], "rejected")
+            raise
+        decision = None
+        if self.track_filter is not None:
+            with INGEST_STAGE.time("filter"):
+                decision = self.track_filter.process([record])
+            record.dropped_reason = decision.reasons[0]
+            if record.dropped_reason is not None:
+                decision.commit()
+                count_records([record])
+                return record
+        saved = self.repo.save(record)
+        if decision is not None:
+            decision.commit()
+        count_records([saved])
+        return saved
+
+    def save_many(self, fixes: list[tuple[str, float, float, Optional[str], str]]) -> list[Union[LocationRecord, ValueError]]:
+        """Validate and persist a batch of fixes, possibly from several devices.
+
+        Each fix is ``(device_id, lat, lon, created_at, api_key)``. Every distinct
+        device/key pair is authenticated once, coordinates and timestamps are
+        checked row by row (a missing created_at defaults to now), and all valid
+        rows are written in a single transaction. The stored rows are then checked
+        against the geofences in one vectorised pass.
+
+        Returns one entry per fix, in order: the saved record, the unsaved record
+        with its dropped_reason if the track filter discarded it, or the
+        ValueError that rejected it (a DeviceAuthError for bad credentials).
+        """
+        authenticated: dict[tuple[str, str], bool] = {}
+        results: list[Union[LocationRecord, ValueError]] = []
+        accepted: list[tuple[int, LocationRecord]] = []
+        rejected: list[str] = []
+        # Credential lookups happen once per device, so they are timed apart
+        # from the per-row checks by subtraction instead of per row
+        started = perf_counter()
+        auth_time = 0.0
+        for index, (device_id, lat, lon, created_at, api_key) in enumerate(fixes):
+            credentials = (device_id, api_key)
+            if credentials not in authenticated:
+                lookup_started = perf_counter()
+                authenticated[credentials] = self.device_repo.find_by_id_and_api_key(device_id, api_key) is not None
+                auth_time += perf_counter() - lookup_started
+            if not authenticated[credentials]:
+                results.append(DeviceAuthError())
+                rejected.append(UNKNOWN_DEVICE)
+                continue
+            try:
+                record = self._validated_record(device_id, lat, lon, created_at)
+            except ValueError as e:
+                results.append(e)
+                rejected.append(device_id)
+                continue
+            results.append(record)
+            accepted.append((index, record))
+        if authenticated:
+            INGEST_STAGE.observe(auth_time, "auth")
+        INGEST_STAGE.observe(perf_counter() - started - auth_time, "validate")
+        count_points(rejected, "rejected")
+
+        stored = self.store_records([record for _, record in accepted])
+        for (index, _), record in zip(accepted, stored):
+            results[index] = record
+        return results
+
+    @staticmethod
+    def _validated_record(device_id: str, lat: float, lon: float, created_at: Optional[str]) -> LocationRecord:
+        """Build the record of an authenticated fix; a missing created_at defaults to now.
+
+        Raises:
+            ValueError: If the coordinates are out of range or created_at is not
+                an ISO 8601 timestamp.
+        """
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise ValueError("Coordinates out of range")
+        try:
+            timestamp = parse_timestamp(created_at) if created_at else datetime.utcnow()
+        except (TypeError, ValueError):
+            raise ValueError("Invalid created_at")
+        return LocationRecord(device_id, lat, lon, timestamp)
+
+    def device_api_key(self, device_id: str) -> Optional[str]:
+        """API key of a device, or None if it is unknown; used to verify signed frames."""
+        with INGEST_STAGE.time("auth"):
+            device = self.device_repo.find_by_id(device_id)
+        return device.api_key if device is not None else None
+
+    def save_frames(self, frames) -> list[LocationRecord]:
+        """Persist decoded binary frames whose signature was already verified.
+
+        Each frame carries a device_id plus parallel timestamps, latitudes and
+        longitudes lists. Points with out-of-range coordinates are skipped.
+        Frame tags are remembered until sent_at leaves the BINARY_MAX_SKEW_S
+        window; frames that fail to store are forgotten so they can be resent.
+
+        Raises:
+            DuplicateFrameError: If a frame was already received, in which case
+                none of the frames is stored.
+        """
+        expiries: dict[bytes, int] = {}
+        for frame in frames:
+            if frame.tag in expiries:
+                raise DuplicateFrameError()
+            expiries[frame.tag] = frame.sent_at_ms + config.BINARY_MAX_SKEW_S * 1000
+        with INGEST_STAGE.time("auth"):
+            if expiries and not self.frame_repo.claim(expiries):
+                raise DuplicateFrameError()
+        try:
+            return self._store_frames(frames)
+        except Exception:
+            self.frame_repo.release(list(expiries))
+            raise
+
+    def _store_frames(self, frames) -> list[LocationRecord]:
+        records = []
+        with INGEST_STAGE.time("validate"):
+            for frame in frames:
+                kept = len(records)
+                records.extend(
+                    LocationRecord(frame.device_id, lat, lon, timestamp)
+                    for timestamp, lat, lon in zip(frame.timestamps, frame.latitudes, frame.longitudes)
+                    if -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+                )
+                skipped = len(frame.timestamps) - (len(records) - kept)
+                if skipped:
+                    LOCATION_POINTS.inc(frame.device_id, "rejected", amount=skipped)
+        return self.store_records(records)
+
+    def store_records(self, records: list[LocationRecord]) -> list[LocationRecord]:
+        """Filter, persist and geofence records of already authenticated devices.
+
+        Returns one entry per record, in order: the saved record, or the unsaved
+        record with its dropped_reason if the track filter discarded it.
+        """
+        decision = None
+        if self.track_filter is not None and records:
+            with INGEST_STAGE.time("filter"):
+                decision = self.track_filter.process(records)
+                for record, reason in zip(records, decision.reasons):
+                    record.dropped_reason = reason
+        kept = [index for index, record in enumerate(records) if record.dropped_reason is None]
+        saved = self.repo.save_many([records[index] for index in kept])
+        # Tracks advance only once their records are stored (or buffered)
+        if decision is not None:
+            decision.commit()
+        results = list(records)
+        for index, record in zip(kept, saved):
+            results[index] = record
+        count_records(results)
+        return results
+
+    def _evaluate_geofences(self, saved: list[LocationRecord]) -> None:
+        with INGEST_STAGE.time("geofence"):
+            self.geofence_service.evaluate(saved)
+
+    def iter_history(self, device_id: str, start: Optional[datetime], end: Optional[datetime],
+                     after: Optional[tuple[datetime, int]], limit: Optional[int]) -> Iterator[LocationRecord]:
+        """Stream a device's records in time order, resuming after a keyset cursor.
+
+        Archived days are read from the columnar archive and merged with any live
+        rows of the same day; the rest comes from location_records.
+        """
+        records = self._iter_stitched(device_id, start, end, after)
+        return itertools.islice(records, limit) if limit is not None else records
+
+    def _iter_stitched(self, device_id: str, start: Optional[datetime], end: Optional[datetime],
+                       after: Optional[tuple[datetime, int]]) -> Iterator[LocationRecord]:
+        days = self.archive_service.archive_repo.days(
+            device_id, start.date() if start else None, end.date() if end else None
+        )
+        live_from = start
+        for day in days:
+            day_start = datetime.combine(day, time())
+            day_end = day_start + timedelta(days=1)
+            if live_from is None or live_from < day_start:
+                yield from self.repo.iter_history(device_id, live_from, day_start if end is None else min(day_start, end), after)
+            window_start = day_start if start is None else max(day_start, start)
+            window_end = day_end if end is None else min(day_end, end)
+            merged = heapq.merge(
+                self.archive_service.iter_records(device_id, day, window_start, window_end, after),
+                self.repo.iter_history(device_id, window_start, window_end, after),
+                key=lambda record: (record.created_at, record.id)
+            )
+            # While a day is being archived its rows are in the file and in
+            # SQLite at once; the copies come out of the merge side by side
+            last_id = None
+            for record in merged:
+                if record.id != last_id:
+                    last_id = record.id
+                    yield record
+            live_from = day_end
+        if end is None or live_from is None or live_from < end:
+            yield from self.repo.iter_history(device_id, live_from, end, after)
+
+    def find_in_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                    start: Optional[datetime], end: Optional[datetime], limit: int,
+                    latest: bool = False) -> list[LocationRecord]:
+        """Records inside a bounding box, newest first.
+
+        With `latest`, only the newest matching record of each device is kept.
+        A box with min_lon > max_lon wraps across the antimeridian.
+        """
+        if min_lon > max_lon:
+            boxes = [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+        else:
+            boxes = [(min_lat, min_lon, max_lat, max_lon)]
+        return list(itertools.islice(self._iter_matches(boxes, start, end, latest), limit))
+
+    def find_near(self, lat: float, lon: float, radius_m: float,
+                  start: Optional[datetime], end: Optional[datetime], limit: int,
+                  latest: bool = False) -> list[tuple[LocationRecord, float]]:
+        """The `limit` records nearest to a point within `radius_m` metres, with distances.
+
+        The R*Tree narrows the search to the circle's bounding boxes; the
+        haversine distance is the exact test. Every record in the circle is
+        ranked by distance before `limit` applies, keeping at most `limit`
+        of them in memory.
+        """
+        def within(record: LocationRecord) -> bool:
+            return haversine_m(lat, lon, record.latitude, record.longitude) <= radius_m
+
+        records = self._iter_matches(radius_bounding_boxes(lat, lon, radius_m), start, end, latest, within)
+        return heapq.nsmallest(
+            limit,
+            ((record, haversine_m(lat, lon, record.latitude, record.longitude)) for record in records),
+            key=lambda match: match[1]
+        )
+
+    def _iter_matches(self, boxes, start, end, latest, accept=None) -> Iterator[LocationRecord]:
+        # Each box streams newest first; merging keeps that order across boxes,
+        # so the first accepted record of a device is its newest one
+        candidates = heapq.merge(
+            *(self.repo.iter_in_box(*box, start, end) for box in boxes),
+            key=lambda record: (record.created_at, record.id), reverse=True
+        )
+        if accept is not None:
+            candidates = filter(accept, candidates)
+        if not latest:
+            yield from candidates
+            return
+        seen_devices = set()
+        for record in candidates:
+            if record.device_id not in seen_devices:
+                seen_devices.add(record.device_id)
+                yield record
 
-    def create_location_record(self, device_id: str, lat: float, lon: float, created_at: str, api_key: str) -> LocationRecord:
-        if not self.device_repo.find_by_id_and_api_key(device_id, api_key):
-            raise ValueError("Device not found")
-        record = LocationRecord(device_id, lat, lon, datetime.fromisoformat(created_at))
-        return self.repo.save(record)
+    def filter_stats(self) -> Optional[dict]:
+        """Counters of the track filter, None when it is disabled."""
+        return self.track_filter.stats() if self.track_filter is not None else None
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+
+class Geofence:
+    """Polygon a device is allowed to be in.
+
+    `vertices` are (latitude, longitude) pairs of a simple polygon that does not
+    cross the antimeridian. A fence without device_id applies to every device.
+    """
+    def __init__(self, name: str, vertices: list[tuple[float, float]], device_id: Optional[str] = None,
+                 created_at: datetime = None, id: int = None):
+        self.id = id
+        self.name = name
+        self.vertices = vertices
+        self.device_id = device_id
+        self.created_at = created_at
+
+class GeofenceEvent:
+    ENTER = "enter"
+    EXIT = "exit"
+
+    def __init__(self, geofence_id: int, device_id: str, event: str, latitude: float, longitude: float,
+                 created_at: datetime, record_id: int = None, id: int = None):
+        self.id = id
+        self.geofence_id = geofence_id
+        self.device_id = device_id
+        self.event = event
+        self.latitude = latitude
+        self.longitude = longitude
+        self.created_at = created_at
+        self.record_id = record_id
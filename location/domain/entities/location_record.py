@@ -7,3 +7,5 @@ class LocationRecord:
         self.latitude = latitude
         self.longitude = longitude
         self.created_at = created_at
+        # Set when the track filter decided not to store the record
+        self.dropped_reason = None
@@ -0,0 +1,105 @@
+from collections import defaultdict
+
+import numpy as np
+
+from location.domain.entities.geofence import Geofence
+
+# Fences whose bounding box spans more grid cells than this are tested against
+# every point by bounding box instead of being registered cell by cell.
+MAX_CELLS_PER_FENCE = 4096
+
+# Upper bound on points x edges evaluated in one NumPy ray-casting pass
+PIP_CHUNK_ELEMENTS = 1 << 20
+
+class GeofenceIndex:
+    """Immutable spatial index over a set of geofences.
+
+    Each fence gets a precomputed bounding box and is registered in the cells of
+    a uniform lat/lon grid it overlaps, so a point is only tested against the
+    fences registered in its cell. Point-in-polygon runs NumPy-vectorised even-odd
+    ray casting per fence over all the points that reached it.
+    """
+
+    def __init__(self, fences: list[Geofence], cell_size: float = 0.01):
+        self.fences = fences
+        self.cell_size = cell_size
+        self.edges = []
+        boxes = []
+        for fence in fences:
+            vertices = np.asarray(fence.vertices, dtype=np.float64)
+            closed = np.vstack([vertices, vertices[:1]])
+            # (lat1, lon1, lat2, lon2) for every edge
+            self.edges.append(np.hstack([closed[:-1], closed[1:]]))
+            boxes.append((vertices[:, 0].min(), vertices[:, 1].min(), vertices[:, 0].max(), vertices[:, 1].max()))
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+        self.grid: dict[tuple[int, int], list[int]] = defaultdict(list)
+        large = []
+        for index, (min_lat, min_lon, max_lat, max_lon) in enumerate(self.boxes):
+            lat0, lon0 = self._cell(min_lat, min_lon)
+            lat1, lon1 = self._cell(max_lat, max_lon)
+            if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > MAX_CELLS_PER_FENCE:
+                large.append(index)
+                continue
+            for cell_lat in range(lat0, lat1 + 1):
+                for cell_lon in range(lon0, lon1 + 1):
+                    self.grid[(cell_lat, cell_lon)].append(index)
+        self.large = np.asarray(large, dtype=np.intp)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return int(np.floor(lat / self.cell_size)), int(np.floor(lon / self.cell_size))
+
+    def candidates(self, lats: np.ndarray, lons: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return parallel arrays (point index, fence index) whose bounding boxes overlap."""
+        cell_lats = np.floor(lats / self.cell_size).astype(np.int64)
+        cell_lons = np.floor(lons / self.cell_size).astype(np.int64)
+        points = []
+        fences = []
+        for point, key in enumerate(zip(cell_lats.tolist(), cell_lons.tolist())):
+            registered = self.grid.get(key)
+            if registered:
+                points.extend([point] * len(registered))
+                fences.extend(registered)
+        if len(self.large):
+            points.extend(np.repeat(np.arange(len(lats)), len(self.large)).tolist())
+            fences.extend(np.tile(self.large, len(lats)).tolist())
+        points = np.asarray(points, dtype=np.intp)
+        fences = np.asarray(fences, dtype=np.intp)
+        if not len(points):
+            return points, fences
+        boxes = self.boxes[fences]
+        plat = lats[points]
+        plon = lons[points]
+        inside_box = ((plat >= boxes[:, 0]) & (plon >= boxes[:, 1]) &
+                      (plat <= boxes[:, 2]) & (plon <= boxes[:, 3]))
+        return points[inside_box], fences[inside_box]
+
+    def contains(self, lats: np.ndarray, lons: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return parallel arrays (point index, fence index) of points inside fences."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        points, fences = self.candidates(lats, lons)
+        if not len(points):
+            return points, fences
+        order = np.argsort(fences, kind="stable")
+        points, fences = points[order], fences[order]
+        inside = np.zeros(len(points), dtype=bool)
+        bounds = np.flatnonzero(np.diff(fences)) + 1
+        for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(fences)]])):
+            subset = points[start:end]
+            inside[start:end] = points_in_polygon(lats[subset], lons[subset], self.edges[fences[start]])
+        return points[inside], fences[inside]
+
+def points_in_polygon(lats: np.ndarray, lons: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Even-odd ray casting of many points against one polygon's edges."""
+    inside = np.zeros(len(lats), dtype=bool)
+    step = max(1, PIP_CHUNK_ELEMENTS // max(1, len(edges)))
+    lat1, lon1, lat2, lon2 = (edges[:, i] for i in range(4))
+    for start in range(0, len(lats), step):
+        plat = lats[start:start + step, None]
+        plon = lons[start:start + step, None]
+        crosses = (lat1 > plat) != (lat2 > plat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_at = lon1 + (plat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside[start:start + step] = np.count_nonzero(crosses & (plon < lon_at), axis=1) % 2 == 1
+    return inside
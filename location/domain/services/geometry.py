@@ -0,0 +1,40 @@
+import math
+
+EARTH_RADIUS_M = 6371008.8
+# Degrees added to every side of a search box so that float rounding can never
+# push a point on the circle outside the R*Tree prefilter (about 0.1 m)
+BOX_EPSILON_DEG = 1e-6
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres between two coordinates."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def radius_bounding_boxes(lat: float, lon: float, radius_m: float) -> list[tuple[float, float, float, float]]:
+    """Boxes (min_lat, min_lon, max_lat, max_lon) covering a circle.
+
+    Uses the same sphere as haversine_m, so every point the haversine test
+    accepts lies inside the boxes. The longitude half-width is the exact one
+    of a spherical cap, asin(sin(r/R) / cos(lat)), which grows faster than
+    r / cos(lat) at high latitudes and large radii. Returns two boxes when the
+    circle crosses the antimeridian and a full longitude band when it reaches
+    a pole.
+    """
+    angle = radius_m / EARTH_RADIUS_M
+    dlat = math.degrees(angle) + BOX_EPSILON_DEG
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    cos_lat = math.cos(math.radians(lat))
+    if min_lat <= -90.0 or max_lat >= 90.0 or angle >= math.pi / 2 or math.sin(angle) >= cos_lat:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    dlon = math.degrees(math.asin(math.sin(angle) / cos_lat)) + BOX_EPSILON_DEG
+    if dlon >= 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180.0:
+        return [(min_lat, min_lon + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon - 360.0)]
+    return [(min_lat, min_lon, max_lat, max_lon)]
@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+
+# Every created_at in the tree, live table and archive alike, is a naive UTC
+# datetime; the API marks them with a trailing "Z" on the way out.
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC; naive ones are taken as UTC already."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse an ISO 8601 timestamp (offset or "Z" optional) into naive UTC."""
+    return to_utc_naive(datetime.fromisoformat(value))
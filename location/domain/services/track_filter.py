@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from typing import Optional
+
+from location.domain.entities.location_record import LocationRecord
+from location.domain.services.geometry import haversine_m
+
+DROPPED_SPEED = "speed"
+DROPPED_STATIONARY = "stationary"
+DROPPED_COMPRESSION = "compression"
+
+# Consecutive speed rejections after which the stored fix itself is assumed to
+# be the outlier and the track restarts from the new fix.
+MAX_CONSECUTIVE_SPEED_DROPS = 5
+
+# Rough on-disk cost of one stored fix: the location_records row plus its
+# (device_id, created_at) index entry and R*Tree entry.
+ESTIMATED_ROW_BYTES = 160
+
+class _DeviceTrack:
+    """Constant-size per-device state: last stored fix and its velocity."""
+    __slots__ = ("lat", "lon", "ts", "v_lat", "v_lon", "speed_drops")
+
+    def __init__(self, lat: float, lon: float, ts: float):
+        self.lat = lat
+        self.lon = lon
+        self.ts = ts
+        self.v_lat = 0.0  # degrees per second
+        self.v_lon = 0.0
+        self.speed_drops = 0
+
+    def copy(self) -> "_DeviceTrack":
+        track = _DeviceTrack(self.lat, self.lon, self.ts)
+        track.v_lat, track.v_lon, track.speed_drops = self.v_lat, self.v_lon, self.speed_drops
+        return track
+
+class TrackFilter:
+    """Streaming GPS filter applied to fixes before they are stored.
+
+    For each device, in time order, a fix is dropped when:
+
+    - reaching it from the last stored fix needs more than the device's speed
+      limit (a physically impossible jump);
+    - it lies within `stationary_radius_m` of the last stored fix (jitter while
+      the animal is still);
+    - with compression on, dead reckoning from the last stored fix and velocity
+      predicts it within `compression_error_m`.
+
+    A fix is always kept once `max_gap_s` seconds have passed since the last
+    stored one, and fixes older than the last stored one pass through untouched.
+    State is kept for at most `max_devices` devices (least recently seen evicted).
+    """
+
+    def __init__(self, max_speed_mps: float, stationary_radius_m: float, max_gap_s: float,
+                 compression: bool = False, compression_error_m: float = 0.0,
+                 speed_limits: Optional[dict[str, float]] = None, max_devices: int = 10000):
+        self.max_speed_mps = max_speed_mps
+        self.stationary_radius_m = stationary_radius_m
+        self.max_gap_s = max_gap_s
+        self.compression = compression
+        self.compression_error_m = compression_error_m
+        self.speed_limits = speed_limits or {}
+        self.max_devices = max_devices
+        self.received = 0
+        self.kept = 0
+        self.dropped = {DROPPED_SPEED: 0, DROPPED_STATIONARY: 0, DROPPED_COMPRESSION: 0}
+        self._tracks: OrderedDict[str, _DeviceTrack] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def process(self, records: list[LocationRecord]) -> "TrackDecision":
+        """Decide which records to keep, without changing any device track.
+
+        The drop reasons (None = keep) follow the order of `records`. Call
+        commit() on the result once the kept records are stored; a batch that
+        fails to store leaves the tracks as they were.
+        """
+        reasons: list[Optional[str]] = [None] * len(records)
+        tracks: dict[str, _DeviceTrack] = {}
+        order = sorted(range(len(records)), key=lambda i: (records[i].device_id, records[i].created_at))
+        with self._lock:
+            for i in order:
+                device_id = records[i].device_id
+                track = tracks.get(device_id)
+                if track is None and device_id in self._tracks:
+                    track = self._tracks[device_id].copy()
+                reasons[i], tracks[device_id] = self._check(records[i], track)
+        return TrackDecision(self, reasons, tracks)
+
+    def _check(self, record: LocationRecord, track: Optional[_DeviceTrack]) -> tuple[Optional[str], _DeviceTrack]:
+        # created_at is naive UTC; a bare .timestamp() would read it as local time
+        ts = record.created_at.replace(tzinfo=timezone.utc).timestamp()
+        if track is None:
+            return None, _DeviceTrack(record.latitude, record.longitude, ts)
+        dt = ts - track.ts
+        if dt <= 0:
+            return None, track
+
+        distance = haversine_m(track.lat, track.lon, record.latitude, record.longitude)
+        if distance / dt > self.speed_limits.get(record.device_id, self.max_speed_mps):
+            track.speed_drops += 1
+            if track.speed_drops < MAX_CONSECUTIVE_SPEED_DROPS:
+                return DROPPED_SPEED, track
+            return None, _DeviceTrack(record.latitude, record.longitude, ts)
+
+        if dt < self.max_gap_s:
+            if distance <= self.stationary_radius_m:
+                return DROPPED_STATIONARY, track
+            if self.compression:
+                predicted_lat = track.lat + track.v_lat * dt
+                predicted_lon = track.lon + track.v_lon * dt
+                if haversine_m(predicted_lat, predicted_lon, record.latitude, record.longitude) <= self.compression_error_m:
+                    return DROPPED_COMPRESSION, track
+
+        track.v_lat = (record.latitude - track.lat) / dt
+        track.v_lon = (record.longitude - track.lon) / dt
+        track.lat, track.lon, track.ts = record.latitude, record.longitude, ts
+        track.speed_drops = 0
+        return None, track
+
+    def _commit(self, reasons: list[Optional[str]], tracks: dict[str, _DeviceTrack]) -> None:
+        with self._lock:
+            for device_id, track in tracks.items():
+                current = self._tracks.get(device_id)
+                # A concurrent batch may have committed a newer fix meanwhile
+                if current is None or current.ts <= track.ts:
+                    self._tracks[device_id] = track
+                self._tracks.move_to_end(device_id)
+            while len(self._tracks) > self.max_devices:
+                self._tracks.popitem(last=False)
+            self.received += len(reasons)
+            for reason in reasons:
+                if reason is None:
+                    self.kept += 1
+                else:
+                    self.dropped[reason] += 1
+
+    def stats(self) -> dict:
+        """Counts of received, kept and dropped fixes and the storage saved."""
+        with self._lock:
+            dropped = sum(self.dropped.values())
+            return {
+                "received": self.received,
+                "kept": self.kept,
+                "dropped": dict(self.dropped),
+                "drop_ratio": dropped / self.received if self.received else 0.0,
+                "bytes_saved": dropped * ESTIMATED_ROW_BYTES,
+                "tracked_devices": len(self._tracks),
+            }
+
+class TrackDecision:
+    """Drop reasons of one batch and the device tracks they lead to."""
+
+    def __init__(self, track_filter: TrackFilter, reasons: list[Optional[str]], tracks: dict[str, _DeviceTrack]):
+        self.reasons = reasons
+        self._filter = track_filter
+        self._tracks = tracks
+
+    def commit(self) -> None:
+        """Make the tracks current and count the batch; call once its kept records are stored."""
+        self._filter._commit(self.reasons, self._tracks)
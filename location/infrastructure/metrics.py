@@ -0,0 +1,60 @@
+"""Ingest-path metrics of the Location bounded context."""
+from collections import Counter
+from typing import Iterable
+
+from location.infrastructure.repositories.write_behind import write_buffer_stats
+from shared.infrastructure import config
+from shared.infrastructure.metrics import counter, gauge, histogram
+
+# parse: JSON body or binary frames (frame decoding includes the HMAC key lookups)
+# auth: device credential checks; validate: coordinate and timestamp checks
+# filter: track filter; db_write: BEGIN IMMEDIATE and inserts; commit: COMMIT
+# buffer_wait: time a request waits for the write-behind group commit
+# geofence: transition evaluation of the stored rows
+INGEST_STAGE = histogram(
+    "edge_ingest_stage_seconds",
+    "Time spent in each stage of location ingestion.",
+    ("stage",),
+)
+
+LOCATION_POINTS = counter(
+    "edge_location_points_total",
+    "Location points received per device, by outcome (accepted, rejected, dropped).",
+    ("device_id", "result"),
+    max_series=config.METRICS_MAX_DEVICES * 3,
+)
+
+# Label of points rejected for bad credentials: the device_id is the caller's
+# claim, and letting it pick series would crowd real devices into "_other"
+UNKNOWN_DEVICE = "_unknown"
+
+
+def count_points(device_ids: Iterable[str], result: str) -> None:
+    """Add one point per device_id occurrence, taking the metric lock once per device."""
+    for device_id, amount in Counter(device_ids).items():
+        LOCATION_POINTS.inc(device_id, result, amount=amount)
+
+
+def count_records(records) -> None:
+    """Count stored or buffered records as accepted and track-filtered ones as dropped."""
+    count_points((record.device_id for record in records if record.dropped_reason is None), "accepted")
+    count_points((record.device_id for record in records if record.dropped_reason is not None), "dropped")
+
+
+def _write_buffer_gauge(key: str):
+    def read():
+        stats = write_buffer_stats()
+        return stats[key] if stats is not None else 0
+    return read
+
+
+gauge("edge_write_buffer_pending", "Records waiting in the write-behind buffer.",
+      callback=_write_buffer_gauge("pending"))
+counter("edge_write_buffer_flushes_total", "Group commits done by the write-behind buffer.",
+        callback=_write_buffer_gauge("flushes"))
+counter("edge_write_buffer_rejected_total", "Records refused because the write-behind buffer was full.",
+        callback=_write_buffer_gauge("rejected_records"))
+counter("edge_write_buffer_failed_flushes_total", "Group commit attempts of the write-behind buffer that failed.",
+        callback=_write_buffer_gauge("failed_flushes"))
+counter("edge_write_buffer_spilled_total", "Records written to the spill file after their group commit kept failing.",
+        callback=_write_buffer_gauge("spilled_records"))
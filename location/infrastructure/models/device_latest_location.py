@@ -0,0 +1,58 @@
+from peewee import Model, CharField, IntegerField, FloatField, DateTimeField
+from shared.infrastructure.database import db
+
+class DeviceLatestLocation(Model):
+    device_id = CharField(primary_key=True)
+    record_id = IntegerField()
+    latitude = FloatField()
+    longitude = FloatField()
+    created_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'device_latest_location'
+
+
+# Keeps device_latest_location in step with every insert into location_records,
+# inside the inserting transaction. Out-of-order fixes only win if they are not
+# older than the stored one; ties go to the newest row.
+LATEST_LOCATION_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS location_records_latest_ai
+AFTER INSERT ON location_records
+BEGIN
+    INSERT INTO device_latest_location (device_id, record_id, latitude, longitude, created_at)
+    VALUES (NEW.device_id, NEW.id, NEW.latitude, NEW.longitude, NEW.created_at)
+    ON CONFLICT (device_id) DO UPDATE SET
+        record_id = excluded.record_id,
+        latitude = excluded.latitude,
+        longitude = excluded.longitude,
+        created_at = excluded.created_at
+    WHERE excluded.created_at >= device_latest_location.created_at;
+END
+"""
+
+# Seeds device_latest_location from existing history, using the
+# (device_id, created_at) index for one lookup per device.
+LATEST_LOCATION_BACKFILL = """
+INSERT OR REPLACE INTO device_latest_location (device_id, record_id, latitude, longitude, created_at)
+SELECT r.device_id, r.id, r.latitude, r.longitude, r.created_at
+  FROM (SELECT DISTINCT device_id FROM location_records) d
+  JOIN location_records r
+    ON r.id = (SELECT l.id
+                 FROM location_records l
+                WHERE l.device_id = d.device_id
+             ORDER BY l.created_at DESC, l.id DESC
+                LIMIT 1)
+"""
+
+def install_latest_location(database) -> None:
+    """Create the maintenance trigger and backfill the table if it is empty.
+
+    The backfill copies created_at from location_records as stored, so init_db
+    runs it after normalize_timestamps. On later starts the table is already
+    filled and only the IF NOT EXISTS trigger statement runs.
+    """
+    with database.atomic("IMMEDIATE"):
+        database.execute_sql(LATEST_LOCATION_TRIGGER)
+        if not DeviceLatestLocation.select().exists():
+            database.execute_sql(LATEST_LOCATION_BACKFILL)
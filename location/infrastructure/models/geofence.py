@@ -0,0 +1,64 @@
+from peewee import (Model, AutoField, CharField, CompositeKey, DateTimeField, FloatField,
+                    IntegerField, TextField)
+from shared.infrastructure.database import db
+
+class Geofence(Model):
+    id = AutoField()
+    name = CharField()
+    device_id = CharField(null=True, index=True)
+    vertices = TextField()  # JSON list of [latitude, longitude]
+    created_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'geofences'
+
+class GeofenceState(Model):
+    """A row per (device, fence) the device is currently inside."""
+    device_id = CharField()
+    geofence_id = IntegerField()
+    updated_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'geofence_states'
+        primary_key = CompositeKey('device_id', 'geofence_id')
+
+class GeofenceCheckpoint(Model):
+    """Timestamp of the newest fix of a device applied to its fence states."""
+    device_id = CharField(primary_key=True)
+    last_fix_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'geofence_checkpoints'
+
+class GeofenceRevision(Model):
+    """Single row bumped whenever a fence is created or deleted.
+
+    Fence ids are reused after a delete, so (count, max id) cannot tell the
+    sets of fences apart; every process compares this number instead.
+    """
+    id = IntegerField(primary_key=True)
+    revision = IntegerField()
+
+    class Meta:
+        database = db
+        table_name = 'geofence_revisions'
+
+class GeofenceEvent(Model):
+    id = AutoField()
+    geofence_id = IntegerField(index=True)
+    device_id = CharField()
+    event = CharField()
+    latitude = FloatField()
+    longitude = FloatField()
+    record_id = IntegerField(null=True)
+    created_at = DateTimeField()
+
+    class Meta:
+        database = db
+        table_name = 'geofence_events'
+        indexes = (
+            (('device_id', 'created_at'), False),
+        )
@@ -1,8 +1,11 @@
-from peewee import Model, AutoField, CharField, FloatField, DateTimeField
+from peewee import Model, CharField, FloatField, DateTimeField
+from playhouse.sqlite_ext import AutoIncrementField
 from shared.infrastructure.database import db
 
 class LocationRecord(Model):
-    id = AutoField()
+    # AUTOINCREMENT: archiving deletes rows, and their ids are already in the
+    # archive files, geofence events and the connector's upload marks
+    id = AutoIncrementField()
     device_id = CharField()
     latitude = FloatField()
     longitude = FloatField()
@@ -11,3 +14,48 @@ class LocationRecord(Model):
     class Meta:
         database = db
         table_name = 'location_records'
+        indexes = (
+            (('device_id', 'created_at'), False),
+        )
+
+
+def install_autoincrement(database, highest_used_id=lambda: 0) -> None:
+    """Rebuild location_records with AUTOINCREMENT if it was created without it.
+
+    Without it SQLite hands the rowids of deleted (archived) rows to new
+    inserts. The rebuild copies the rows with their ids and starts the sequence
+    after the highest id still referenced anywhere; `highest_used_id` supplies
+    the ones that only live outside the table, such as the archive files.
+
+    Once the table has AUTOINCREMENT this only reads its schema. Must run
+    before the triggers on location_records are installed, since dropping the
+    old table drops them.
+    """
+    with database.atomic("IMMEDIATE"):
+        sql = database.execute_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'location_records'"
+        ).fetchone()
+        if sql is None or "AUTOINCREMENT" in sql[0].upper():
+            return
+        database.execute_sql("ALTER TABLE location_records RENAME TO location_records_old")
+        # Indexes follow the renamed table; drop them so the new table gets its own
+        for (name,) in database.execute_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'location_records_old' "
+                "AND sql IS NOT NULL").fetchall():
+            database.execute_sql(f'DROP INDEX "{name}"')
+        LocationRecord.create_table(safe=False)
+        database.execute_sql("""
+            INSERT INTO location_records (id, device_id, latitude, longitude, created_at)
+            SELECT id, device_id, latitude, longitude, created_at FROM location_records_old
+        """)
+        database.execute_sql("DROP TABLE location_records_old")
+        highest = max(highest_used_id(), *(
+            database.execute_sql(query).fetchone()[0] or 0
+            for query in (
+                "SELECT max(id) FROM location_records",
+                "SELECT max(record_id) FROM device_latest_location",
+                "SELECT max(record_id) FROM geofence_events",
+            )
+        ))
+        database.execute_sql("DELETE FROM sqlite_sequence WHERE name = 'location_records'")
+        database.execute_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('location_records', ?)", (highest,))
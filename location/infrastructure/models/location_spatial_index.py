@@ -0,0 +1,49 @@
+# R*Tree over location_records: one point box per record in (latitude,
+# longitude, unix time). The rtree stores 32-bit floats rounded outwards, so it
+# only yields candidates; queries refine them against location_records.
+SPATIAL_INDEX_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS location_records_rtree USING rtree(
+    id,
+    min_lat, max_lat,
+    min_lon, max_lon,
+    min_ts, max_ts
+)
+"""
+
+SPATIAL_INDEX_INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS location_records_rtree_ai
+AFTER INSERT ON location_records
+BEGIN
+    INSERT INTO location_records_rtree (id, min_lat, max_lat, min_lon, max_lon, min_ts, max_ts)
+    VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude,
+            CAST(strftime('%s', NEW.created_at) AS INTEGER), CAST(strftime('%s', NEW.created_at) AS INTEGER));
+END
+"""
+
+SPATIAL_INDEX_DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS location_records_rtree_ad
+AFTER DELETE ON location_records
+BEGIN
+    DELETE FROM location_records_rtree WHERE id = OLD.id;
+END
+"""
+
+SPATIAL_INDEX_BACKFILL = """
+INSERT INTO location_records_rtree (id, min_lat, max_lat, min_lon, max_lon, min_ts, max_ts)
+SELECT id, latitude, latitude, longitude, longitude,
+       CAST(strftime('%s', created_at) AS INTEGER), CAST(strftime('%s', created_at) AS INTEGER)
+  FROM location_records
+"""
+
+def install_spatial_index(database) -> None:
+    """Create the R*Tree and its triggers, backfilling it if it is empty.
+
+    An empty R*Tree next to existing rows means the database predates the
+    index; the backfill then indexes all of location_records in one pass.
+    """
+    with database.atomic("IMMEDIATE"):
+        database.execute_sql(SPATIAL_INDEX_TABLE)
+        database.execute_sql(SPATIAL_INDEX_INSERT_TRIGGER)
+        database.execute_sql(SPATIAL_INDEX_DELETE_TRIGGER)
+        if database.execute_sql("SELECT NOT EXISTS (SELECT 1 FROM location_records_rtree)").fetchone()[0]:
+            database.execute_sql(SPATIAL_INDEX_BACKFILL)
@@ -0,0 +1,11 @@
+from peewee import Model, BigIntegerField, BlobField
+from shared.infrastructure.database import db
+
+class ReceivedFrame(Model):
+    """HMAC tag of a stored binary frame, kept while its sent_at is inside the replay window."""
+    tag = BlobField(primary_key=True)
+    expires_at = BigIntegerField(index=True)  # epoch ms
+
+    class Meta:
+        database = db
+        table_name = 'received_frames'
@@ -0,0 +1,43 @@
+"""Post-commit notifications of newly stored location records.
+
+The uploader (connector.py) used to find new records by polling. The write
+path now announces every commit instead: the connector process gets the
+device ids as one datagram on the Unix socket configured in NOTIFY_SOCKET
+(newline-separated device ids, or an empty datagram when they do not fit).
+
+This is best effort: nobody listening is not an error, and the connector
+still polls as a fallback.
+"""
+import errno
+import socket
+from typing import Iterable
+
+from shared.infrastructure import config
+
+class IngestNotifier:
+    """Sends the device ids of each commit to a Unix socket."""
+
+    def __init__(self, socket_path: str = ""):
+        self.socket_path = socket_path
+        self._socket = None
+        if socket_path and hasattr(socket, "AF_UNIX"):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+
+    def notify(self, device_ids: Iterable[str]) -> None:
+        if self._socket is None:
+            return
+        device_ids = set(device_ids)
+        if device_ids:
+            self._send("\n".join(sorted(device_ids)).encode())
+
+    def _send(self, payload: bytes) -> None:
+        try:
+            self._socket.sendto(payload, self.socket_path)
+        except OSError as e:
+            if e.errno == errno.EMSGSIZE:  # fall back to a bare "something changed"
+                self._send(b"")
+            # Otherwise nobody is listening or the receiver is backed up; it
+            # will catch up on its next round either way.
+
+ingest_notifier = IngestNotifier(config.notify_socket_path())
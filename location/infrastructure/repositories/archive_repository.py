@@ -0,0 +1,158 @@
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+
+from location.domain.services.timestamps import to_utc_naive
+
+# File layout (little endian):
+#   header  magic "NODOARC1", version u16, flags u16, reserved u32, count u64,
+#           then (offset u64, nbytes u64) for each column, padded to HEADER_SIZE
+#   columns id int64, ts int64 (UTC epoch microseconds), latitude float64,
+#           longitude float64; each 8-byte aligned, zlib-compressed if FLAG_ZLIB
+MAGIC = b"NODOARC1"
+VERSION = 1
+FLAG_ZLIB = 1
+HEADER_SIZE = 128
+COLUMNS = (("id", np.int64), ("ts", np.int64), ("latitude", np.float64), ("longitude", np.float64))
+_HEADER = struct.Struct("<8sHHIQ" + "QQ" * len(COLUMNS))
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_epoch_us(value: datetime) -> int:
+    """UTC epoch microseconds; naive datetimes are taken as UTC, like created_at."""
+    return (to_utc_naive(value) - EPOCH) // timedelta(microseconds=1)
+
+def from_epoch_us(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(value))
+
+class DayArchive:
+    """Columns of one device-day file.
+
+    Uncompressed files are memory-mapped: the arrays are read-only views over
+    the mapping, so nothing is copied until the caller touches the data.
+    """
+
+    def __init__(self, id: np.ndarray, ts: np.ndarray, latitude: np.ndarray, longitude: np.ndarray):
+        self.id = id
+        self.ts = ts
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+def write_day(path: str, id: np.ndarray, ts: np.ndarray, latitude: np.ndarray, longitude: np.ndarray,
+              compress: bool = False) -> None:
+    """Write one device-day file atomically (temporary file, fsync, rename)."""
+    columns = [np.ascontiguousarray(column, dtype=dtype) for column, (_, dtype) in zip((id, ts, latitude, longitude), COLUMNS)]
+    payloads = [zlib.compress(column.tobytes()) if compress else column.tobytes() for column in columns]
+    offsets = []
+    offset = HEADER_SIZE
+    for payload in payloads:
+        offsets += [offset, len(payload)]
+        offset += (len(payload) + 7) // 8 * 8
+    header = _HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if compress else 0, 0, len(columns[0]), *offsets)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            for payload in payloads:
+                f.write(payload)
+                f.write(b"\0" * (-len(payload) % 8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def read_day(path: str) -> DayArchive:
+    """Open a device-day file, memory-mapped when it is not compressed."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, flags, _, count, *offsets = _HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a location archive: {path}")
+    columns = []
+    for (_, dtype), offset, nbytes in zip(COLUMNS, offsets[::2], offsets[1::2]):
+        if flags & FLAG_ZLIB:
+            columns.append(np.frombuffer(zlib.decompress(buffer[offset:offset + nbytes]), dtype=dtype, count=count))
+        else:
+            columns.append(np.frombuffer(buffer, dtype=dtype, count=count, offset=offset))
+    return DayArchive(*columns)
+
+class ArchiveRepository:
+    """Per-device, per-day columnar files under `root`: <root>/<device_id>/<YYYY-MM-DD>.loc"""
+
+    SUFFIX = ".loc"
+
+    def __init__(self, root: str, compress: bool = False):
+        self.root = root
+        self.compress = compress
+
+    def path(self, device_id: str, day: date) -> str:
+        return os.path.join(self.root, device_id, day.isoformat() + self.SUFFIX)
+
+    def days(self, device_id: str, start: Optional[date] = None, end: Optional[date] = None) -> list[date]:
+        """Archived days of a device within [start, end], in order."""
+        try:
+            names = os.listdir(os.path.join(self.root, device_id))
+        except FileNotFoundError:
+            return []
+        days = sorted(date.fromisoformat(name[:-len(self.SUFFIX)]) for name in names if name.endswith(self.SUFFIX))
+        return [day for day in days if (start is None or day >= start) and (end is None or day <= end)]
+
+    def read(self, device_id: str, day: date) -> Optional[DayArchive]:
+        path = self.path(device_id, day)
+        return read_day(path) if os.path.exists(path) else None
+
+    def append(self, device_id: str, day: date, id: np.ndarray, ts: np.ndarray,
+               latitude: np.ndarray, longitude: np.ndarray) -> int:
+        """Add rows to a device-day file, merging with what is already archived.
+
+        Returns the number of rows in the file afterwards.
+        """
+        existing = self.read(device_id, day)
+        if existing is not None:
+            id = np.concatenate([existing.id, id])
+            ts = np.concatenate([existing.ts, ts])
+            latitude = np.concatenate([existing.latitude, latitude])
+            longitude = np.concatenate([existing.longitude, longitude])
+            # An interrupted run may have archived some rows already: keep one
+            # copy of each (id, created_at); device_id is the same for the file
+            _, first = np.unique(np.stack([id, ts], axis=1), axis=0, return_index=True)
+            id, ts, latitude, longitude = id[first], ts[first], latitude[first], longitude[first]
+        order = np.lexsort((id, ts))
+        id, ts, latitude, longitude = id[order], ts[order], latitude[order], longitude[order]
+        write_day(self.path(device_id, day), id, ts, latitude, longitude, self.compress)
+        return len(id)
+
+    def max_id(self) -> int:
+        """Highest record id in any archive file, 0 when nothing is archived."""
+        highest = 0
+        try:
+            device_ids = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        for device_id in device_ids:
+            for day in self.days(device_id):
+                archive = self.read(device_id, day)
+                if archive is not None and len(archive):
+                    highest = max(highest, int(archive.id.max()))
+        return highest
+
+    def iter_range(self, device_id: str, start: Optional[datetime], end: Optional[datetime]) -> Iterator[tuple[date, DayArchive]]:
+        """Yield (day, columns) for the archived days overlapping [start, end)."""
+        first = start.date() if start is not None else None
+        last = end.date() if end is not None else None
+        for day in self.days(device_id, first, last):
+            archive = self.read(device_id, day)
+            if archive is not None:
+                yield day, archive
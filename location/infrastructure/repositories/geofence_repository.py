@@ -0,0 +1,134 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+from peewee import EXCLUDED, chunked
+
+from location.domain.entities.geofence import Geofence, GeofenceEvent
+from location.infrastructure.models.geofence import (Geofence as GeofenceModel, GeofenceCheckpoint,
+                                                     GeofenceEvent as GeofenceEventModel, GeofenceRevision,
+                                                     GeofenceState)
+from shared.infrastructure.database import db
+
+class GeofenceRepository:
+    @staticmethod
+    def save(fence: Geofence) -> Geofence:
+        with db.atomic("IMMEDIATE"):
+            db_fence = GeofenceModel.create(
+                name=fence.name,
+                device_id=fence.device_id,
+                vertices=json.dumps(fence.vertices),
+                created_at=fence.created_at or datetime.utcnow()
+            )
+            GeofenceRepository._bump_revision()
+        return GeofenceRepository._to_entity(db_fence)
+
+    @staticmethod
+    def find_all() -> list[Geofence]:
+        return [GeofenceRepository._to_entity(fence) for fence in GeofenceModel.select().order_by(GeofenceModel.id)]
+
+    @staticmethod
+    def delete(fence_id: int) -> bool:
+        with db.atomic("IMMEDIATE"):
+            GeofenceState.delete().where(GeofenceState.geofence_id == fence_id).execute()
+            deleted = GeofenceModel.delete_by_id(fence_id) > 0
+            if deleted:
+                GeofenceRepository._bump_revision()
+            return deleted
+
+    @staticmethod
+    def version() -> int:
+        """Revision of the set of fences; changes whenever one is added or removed."""
+        row = GeofenceRevision.get_or_none(GeofenceRevision.id == 1)
+        return row.revision if row is not None else 0
+
+    @staticmethod
+    def _bump_revision() -> None:
+        (GeofenceRevision
+         .insert(id=1, revision=1)
+         .on_conflict(conflict_target=[GeofenceRevision.id],
+                      update={GeofenceRevision.revision: GeofenceRevision.revision + 1})
+         .execute())
+
+    @staticmethod
+    def find_inside(device_ids: set[str]) -> dict[str, set[int]]:
+        """Fences each device is currently inside."""
+        inside: dict[str, set[int]] = {device_id: set() for device_id in device_ids}
+        query = GeofenceState.select(GeofenceState.device_id, GeofenceState.geofence_id).where(
+            GeofenceState.device_id.in_(list(device_ids))
+        )
+        for device_id, fence_id in query.tuples():
+            inside[device_id].add(fence_id)
+        return inside
+
+    @staticmethod
+    def transaction():
+        """Write transaction for a read-modify-write of device states.
+
+        BEGIN IMMEDIATE takes the database write lock up front, serialising
+        evaluations across threads and processes. Inside the transaction of a
+        location insert it is a savepoint of that transaction.
+        """
+        return db.atomic("IMMEDIATE")
+
+    @staticmethod
+    def find_last_fixes(device_ids: set[str]) -> dict[str, datetime]:
+        """Timestamp of the newest fix already applied, per device that has one."""
+        query = GeofenceCheckpoint.select(GeofenceCheckpoint.device_id, GeofenceCheckpoint.last_fix_at).where(
+            GeofenceCheckpoint.device_id.in_(list(device_ids))
+        )
+        return dict(query.tuples())
+
+    @staticmethod
+    def record_transitions(events: list[GeofenceEvent], last_fixes: dict[str, datetime]) -> None:
+        """Apply enter/exit transitions to the device states, log them and advance the checkpoints, atomically."""
+        if not events and not last_fixes:
+            return
+        now = datetime.utcnow()
+        with db.atomic("IMMEDIATE"):
+            for chunk in chunked(last_fixes.items(), 400):
+                GeofenceCheckpoint.insert_many(
+                    [{"device_id": device_id, "last_fix_at": last_fix_at} for device_id, last_fix_at in chunk]
+                ).on_conflict(
+                    conflict_target=[GeofenceCheckpoint.device_id],
+                    update={GeofenceCheckpoint.last_fix_at: EXCLUDED.last_fix_at},
+                    where=(EXCLUDED.last_fix_at > GeofenceCheckpoint.last_fix_at),
+                ).execute()
+            if not events:
+                return
+            for event in events:
+                if event.event == GeofenceEvent.ENTER:
+                    GeofenceState.insert(
+                        device_id=event.device_id, geofence_id=event.geofence_id, updated_at=now
+                    ).on_conflict_replace().execute()
+                else:
+                    GeofenceState.delete().where(
+                        (GeofenceState.device_id == event.device_id) & (GeofenceState.geofence_id == event.geofence_id)
+                    ).execute()
+            GeofenceEventModel.insert_many([
+                {
+                    "geofence_id": event.geofence_id,
+                    "device_id": event.device_id,
+                    "event": event.event,
+                    "latitude": event.latitude,
+                    "longitude": event.longitude,
+                    "record_id": event.record_id,
+                    "created_at": event.created_at,
+                }
+                for event in events
+            ]).execute()
+
+    @staticmethod
+    def find_events(device_id: Optional[str] = None, limit: int = 100) -> list[GeofenceEvent]:
+        query = GeofenceEventModel.select()
+        if device_id is not None:
+            query = query.where(GeofenceEventModel.device_id == device_id)
+        return [
+            GeofenceEvent(e.geofence_id, e.device_id, e.event, e.latitude, e.longitude, e.created_at, e.record_id, e.id)
+            for e in query.order_by(GeofenceEventModel.created_at.desc(), GeofenceEventModel.id.desc()).limit(limit)
+        ]
+
+    @staticmethod
+    def _to_entity(fence: GeofenceModel) -> Geofence:
+        vertices = [tuple(vertex) for vertex in json.loads(fence.vertices)]
+        return Geofence(fence.name, vertices, fence.device_id, fence.created_at, fence.id)
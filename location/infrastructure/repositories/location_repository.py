@@ -1,19 +1,190 @@
+import calendar
+import time
+from datetime import date, datetime
+from typing import Callable, Iterator, Optional
+
+from peewee import chunked
+
 from location.domain.entities.location_record import LocationRecord
 from location.infrastructure.models.location_record import LocationRecord as LocationRecordModel
+from location.infrastructure.metrics import INGEST_STAGE
+from location.infrastructure.notifier import ingest_notifier
+from location.infrastructure.repositories.write_behind import DURABILITY_COMMIT, get_write_buffer
+from shared.infrastructure import config
+from shared.infrastructure.database import db
+
+# Rows fetched per keyset page while streaming history
+HISTORY_PAGE_SIZE = 1000
+
+# Rows per multi-row INSERT; 5 bound parameters per row keeps every statement
+# under SQLite's historical 999-variable limit.
+INSERT_CHUNK_SIZE = 150
 
 class LocationRecordRepository:
+    def __init__(self, durability: str = None, on_insert: Callable[[list[LocationRecord]], None] = None):
+        """Use the write-behind buffer when LOCATION_WRITE_BEHIND is enabled.
+
+        With "commit" durability save/save_many block until the group commit and
+        return records with ids; with "enqueue" they return as soon as the records
+        are buffered, without ids.
+
+        `on_insert` is called with the saved records inside the insert's
+        transaction, so whatever it writes commits or rolls back with them.
+        """
+        self.write_buffer = get_write_buffer(LocationRecordRepository.insert_many)
+        self.durability = durability or config.LOCATION_DURABILITY
+        self.on_insert = on_insert
+
+    def save(self, record: LocationRecord) -> LocationRecord:
+        if self.write_buffer is not None:
+            return self._buffer([record])[0]
+        return self.insert(record, self.on_insert)
+
+    def save_many(self, records: list[LocationRecord]) -> list[LocationRecord]:
+        """Persist several records in a single transaction (or group commit)."""
+        if self.write_buffer is not None and records:
+            return self._buffer(records)
+        return self.insert_many(records, self.on_insert)
+
+    def _buffer(self, records: list[LocationRecord]) -> list[LocationRecord]:
+        future = self.write_buffer.submit(records, self.on_insert)
+        if self.durability == DURABILITY_COMMIT:
+            with INGEST_STAGE.time("buffer_wait"):
+                return future.result()
+        return records
+
+    @staticmethod
+    def insert(record: LocationRecord, on_insert: Callable[[list[LocationRecord]], None] = None) -> LocationRecord:
+        return LocationRecordRepository.insert_many([record], on_insert)[0]
+
+    @staticmethod
+    def insert_many(records: list[LocationRecord],
+                    on_insert: Callable[[list[LocationRecord]], None] = None) -> list[LocationRecord]:
+        """Persist several records with bulk inserts inside a single transaction.
+
+        SQLite assigns consecutive rowids to the rows of a multi-row INSERT while
+        the transaction holds the write lock, so the ids of each chunk are derived
+        from the last inserted rowid.
+
+        The transaction is BEGIN IMMEDIATE: a deferred one that has to upgrade
+        its read snapshot to a write fails with "database is locked", without
+        waiting for busy_timeout, when another process committed in between.
+        `on_insert` runs before the COMMIT, holding that write lock.
+        """
+        if not records:
+            return []
+        saved = []
+        started = time.perf_counter()
+        with db.atomic("IMMEDIATE"):
+            for chunk in chunked(records, INSERT_CHUNK_SIZE):
+                last_id = LocationRecordModel.insert_many([
+                    {
+                        "device_id": record.device_id,
+                        "latitude": record.latitude,
+                        "longitude": record.longitude,
+                        "created_at": record.created_at,
+                    }
+                    for record in chunk
+                ]).execute()
+                first_id = last_id - len(chunk) + 1
+                saved.extend(
+                    LocationRecord(record.device_id, record.latitude, record.longitude, record.created_at, first_id + offset)
+                    for offset, record in enumerate(chunk)
+                )
+            written = time.perf_counter()
+            if on_insert is not None:
+                on_insert(saved)
+            hooked = time.perf_counter()
+        committed = time.perf_counter()
+        INGEST_STAGE.observe(written - started, "db_write")
+        INGEST_STAGE.observe(committed - hooked, "commit")
+        ingest_notifier.notify(record.device_id for record in saved)
+        return saved
+
+    @staticmethod
+    def iter_history(device_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     after: Optional[tuple[datetime, int]] = None,
+                     limit: Optional[int] = None) -> Iterator[LocationRecord]:
+        """Yield a device's records in (created_at, id) order within [start, end).
+
+        Reads through the (device_id, created_at) index in keyset pages of
+        HISTORY_PAGE_SIZE rows, so memory stays constant and no read transaction
+        is held for the whole export. `after` is the (created_at, id) of the last
+        record already seen.
+        """
+        model = LocationRecordModel
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_size = HISTORY_PAGE_SIZE if remaining is None else min(HISTORY_PAGE_SIZE, remaining)
+            query = (model
+                     .select(model.id, model.device_id, model.latitude, model.longitude, model.created_at)
+                     .where(model.device_id == device_id))
+            if start is not None:
+                query = query.where(model.created_at >= start)
+            if end is not None:
+                query = query.where(model.created_at < end)
+            if after is not None:
+                after_created_at, after_id = after
+                query = query.where(
+                    (model.created_at > after_created_at) |
+                    ((model.created_at == after_created_at) & (model.id > after_id))
+                )
+            rows = list(query.order_by(model.created_at, model.id).limit(page_size).tuples())
+            for record_id, record_device_id, latitude, longitude, created_at in rows:
+                yield LocationRecord(record_device_id, latitude, longitude, created_at, record_id)
+            if len(rows) < page_size:
+                return
+            last = rows[-1]
+            after = (last[4], last[0])
+            if remaining is not None:
+                remaining -= len(rows)
+
+    @staticmethod
+    def iter_in_box(min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[LocationRecord]:
+        """Yield records inside a lat/lon box and [start, end), newest first.
+
+        Candidates come from the location_records_rtree R*Tree; the exact bounds
+        are then checked against location_records.
+        """
+        model = LocationRecordModel
+        where = [
+            "t.min_lat <= ?", "t.max_lat >= ?", "t.min_lon <= ?", "t.max_lon >= ?",
+            "r.latitude BETWEEN ? AND ?", "r.longitude BETWEEN ? AND ?",
+        ]
+        params = [max_lat, min_lat, max_lon, min_lon, min_lat, max_lat, min_lon, max_lon]
+        if start is not None:
+            where += ["t.max_ts >= ?", "r.created_at >= ?"]
+            params += [calendar.timegm(start.utctimetuple()), model.created_at.db_value(start)]
+        if end is not None:
+            where += ["t.min_ts <= ?", "r.created_at < ?"]
+            params += [calendar.timegm(end.utctimetuple()) + 1, model.created_at.db_value(end)]
+        cursor = db.execute_sql(f"""
+            SELECT r.id, r.device_id, r.latitude, r.longitude, r.created_at
+              FROM location_records_rtree t
+              JOIN location_records r ON r.id = t.id
+             WHERE {" AND ".join(where)}
+          ORDER BY r.created_at DESC, r.id DESC
+        """, params)
+        for record_id, device_id, latitude, longitude, created_at in cursor:
+            yield LocationRecord(device_id, latitude, longitude, model.created_at.python_value(created_at), record_id)
+
+    @staticmethod
+    def archivable_days(before: date) -> list[tuple[str, date]]:
+        """(device_id, day) pairs that have records on days before `before`."""
+        cursor = db.execute_sql("""
+            SELECT DISTINCT device_id, date(created_at)
+              FROM location_records
+             WHERE created_at < ?
+          ORDER BY 1, 2
+        """, (before.isoformat(),))
+        return [(device_id, date.fromisoformat(day)) for device_id, day in cursor]
+
     @staticmethod
-    def save(record: LocationRecord) -> LocationRecord:
-        db_record = LocationRecordModel.create(
-            device_id=record.device_id,
-            latitude=record.latitude,
-            longitude=record.longitude,
-            created_at=record.created_at
-        )
-        return LocationRecord(
-            db_record.device_id,
-            db_record.latitude,
-            db_record.longitude,
-            db_record.created_at,
-            db_record.id
-        )
+    def delete_ids(ids: list[int]) -> int:
+        """Delete records by id in one transaction; the R*Tree follows via trigger."""
+        deleted = 0
+        with db.atomic("IMMEDIATE"):
+            for chunk in chunked(ids, 500):
+                deleted += LocationRecordModel.delete().where(LocationRecordModel.id.in_(chunk)).execute()
+        return deleted
@@ -0,0 +1,34 @@
+import time
+
+from peewee import chunked
+
+from location.infrastructure.models.received_frame import ReceivedFrame
+from shared.infrastructure.database import db
+
+class ReceivedFrameRepository:
+    @staticmethod
+    def claim(expiries: dict[bytes, int]) -> bool:
+        """Record frame tags with their expiry (epoch ms) unless one is already recorded.
+
+        Runs in a BEGIN IMMEDIATE transaction, so the same frame sent to two
+        threads or worker processes is claimed by only one of them. Expired tags
+        are purged on the way.
+
+        Returns:
+            bool: False, recording nothing, if any tag was seen before.
+        """
+        with db.atomic("IMMEDIATE"):
+            ReceivedFrame.delete().where(ReceivedFrame.expires_at < int(time.time() * 1000)).execute()
+            for tags in chunked(expiries, 500):
+                if ReceivedFrame.select().where(ReceivedFrame.tag.in_(tags)).exists():
+                    return False
+            for rows in chunked(expiries.items(), 400):
+                ReceivedFrame.insert_many(rows, fields=[ReceivedFrame.tag, ReceivedFrame.expires_at]).execute()
+            return True
+
+    @staticmethod
+    def release(tags) -> None:
+        """Forget claimed tags whose frames could not be stored, so they can be resent."""
+        with db.atomic():
+            for batch in chunked(tags, 500):
+                ReceivedFrame.delete().where(ReceivedFrame.tag.in_(batch)).execute()
@@ -0,0 +1,281 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Optional
+
+from location.domain.entities.location_record import LocationRecord
+from shared.infrastructure import config
+
+DURABILITY_ENQUEUE = "enqueue"
+DURABILITY_COMMIT = "commit"
+
+# Seconds before the first flush retry; doubles on every attempt
+RETRY_BACKOFF = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBufferFullError(Exception):
+    """Raised when the write-behind buffer cannot take more records."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Location write buffer is full")
+        self.retry_after = retry_after
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue of location records flushed by a single writer thread.
+
+    The writer group-commits everything queued in one transaction as soon as
+    `flush_size` records are waiting or `flush_interval` seconds have passed since
+    the oldest one arrived, whichever comes first. Each submitted batch gets a
+    Future resolved with the saved records after its group commit.
+
+    A batch may come with an `on_insert` callback. `flush` runs them inside the
+    group commit's transaction, each with the saved records of its own batches.
+
+    A failed group commit is retried `max_retries` times with exponential
+    backoff. If it still fails, its records are appended to the NDJSON file
+    `spill_path` and count as accepted: the futures resolve with the records
+    unsaved (no ids), so "commit" callers answer 202 instead of an error that
+    would make the client resend what the spill will store anyway. The next
+    buffer started on the same path replays the file. Replayed records skip
+    their on_insert callbacks. Only when the records could not be spilled
+    either do the futures get the error.
+    """
+
+    def __init__(self, flush: Callable[[list[LocationRecord], Optional[Callable]], list[LocationRecord]],
+                 capacity: int, flush_size: int, flush_interval: float, retry_after: int = 1,
+                 max_retries: int = 3, spill_path: Optional[str] = None):
+        self.flush = flush
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retry_after = retry_after
+        self.max_retries = max_retries
+        self.spill_path = os.path.abspath(spill_path) if spill_path else None
+        self.flushes = 0
+        self.flushed_records = 0
+        self.rejected_records = 0
+        self.failed_flushes = 0
+        self.spilled_records = 0
+        self.replayed_records = 0
+        self._queue: deque[tuple[list[LocationRecord], Future, Optional[Callable]]] = deque()
+        self._pending = 0
+        self._oldest = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._writer = threading.Thread(target=self._run, name="location-write-behind", daemon=True)
+        self._writer.start()
+
+    def submit(self, records: list[LocationRecord], on_insert: Optional[Callable] = None) -> Future:
+        """Queue records for the next group commit.
+
+        `on_insert` is called with the saved records inside the commit's transaction.
+
+        Raises:
+            WriteBufferFullError: If accepting them would exceed the capacity.
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Location write buffer is closed")
+            if self._pending + len(records) > self.capacity:
+                self.rejected_records += len(records)
+                raise WriteBufferFullError(self.retry_after)
+            if not self._queue:
+                self._oldest = time.monotonic()
+            self._queue.append((records, future, on_insert))
+            self._pending += len(records)
+            self._condition.notify()
+        return future
+
+    def _take(self) -> list[tuple[list[LocationRecord], Future, Optional[Callable]]]:
+        """Wait for the next group and pop it; returns [] once closed and drained."""
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            while self._queue and self._pending < self.flush_size and not self._closed:
+                remaining = self._oldest + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            group = []
+            size = 0
+            while self._queue and (not group or size + len(self._queue[0][0]) <= self.flush_size):
+                group.append(self._queue.popleft())
+                size += len(group[-1][0])
+            self._pending -= size
+            self._oldest = time.monotonic()
+            return group
+
+    def _run(self) -> None:
+        self._replay_spill()
+        while True:
+            group = self._take()
+            if not group:
+                return
+            records = [record for batch, _, _ in group for record in batch]
+            try:
+                saved = self._flush_with_retries(records, lambda saved: self._run_callbacks(group, saved))
+            except Exception as e:
+                spilled = self._spill(records)
+                for batch, future, _ in group:
+                    if spilled:
+                        future.set_result(batch)
+                    else:
+                        future.set_exception(e)
+                continue
+            self.flushes += 1
+            self.flushed_records += len(saved)
+            offset = 0
+            for batch, future, _ in group:
+                future.set_result(saved[offset:offset + len(batch)])
+                offset += len(batch)
+
+    @staticmethod
+    def _run_callbacks(group, saved: list[LocationRecord]) -> None:
+        # One call per distinct callback, with the records of all its batches
+        by_callback: dict[Callable, list[LocationRecord]] = {}
+        offset = 0
+        for batch, _, on_insert in group:
+            if on_insert is not None:
+                by_callback.setdefault(on_insert, []).extend(saved[offset:offset + len(batch)])
+            offset += len(batch)
+        for on_insert, records in by_callback.items():
+            on_insert(records)
+
+    def _flush_with_retries(self, records: list[LocationRecord], on_insert: Optional[Callable]) -> list[LocationRecord]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.flush(records, on_insert)
+            except Exception as e:
+                self.failed_flushes += 1
+                if attempt == self.max_retries:
+                    logger.exception("Group commit of %d location records failed after %d attempts",
+                                     len(records), attempt + 1)
+                    raise
+                logger.warning("Group commit of %d location records failed (%s), retrying", len(records), e)
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    def _spill(self, records: list[LocationRecord]) -> bool:
+        """Append records to the spill file; False if they could not be kept."""
+        if self.spill_path is None:
+            logger.error("Dropped %d location records: no spill file configured", len(records))
+            return False
+        try:
+            # One write per group on an O_APPEND file, so workers sharing it do not interleave lines
+            with open(self.spill_path, "a", encoding="utf-8") as spill:
+                spill.write("".join(
+                    json.dumps({
+                        "device_id": record.device_id,
+                        "latitude": record.latitude,
+                        "longitude": record.longitude,
+                        "created_at": record.created_at.isoformat(),
+                    }) + "\n"
+                    for record in records
+                ))
+        except OSError:
+            logger.exception("Dropped %d location records: could not write %s", len(records), self.spill_path)
+            return False
+        self.spilled_records += len(records)
+        logger.error("Spilled %d location records to %s", len(records), self.spill_path)
+        return True
+
+    def _replay_spill(self) -> None:
+        """Store the records a previous buffer spilled, before taking new ones."""
+        if self.spill_path is None or not os.path.exists(self.spill_path):
+            return
+        # Renaming claims the file, so only one of several workers replays it
+        claimed = f"{self.spill_path}.{os.getpid()}.replay"
+        try:
+            os.rename(self.spill_path, claimed)
+        except OSError:
+            return
+        try:
+            with open(claimed, encoding="utf-8") as spill:
+                records = [
+                    LocationRecord(row["device_id"], row["latitude"], row["longitude"],
+                                   datetime.fromisoformat(row["created_at"]))
+                    for row in map(json.loads, filter(str.strip, spill))
+                ]
+        except (OSError, ValueError, KeyError):
+            logger.exception("Could not read spilled location records; left in %s", claimed)
+            return
+        replayed = 0
+        for start in range(0, len(records), self.flush_size):
+            chunk = records[start:start + self.flush_size]
+            try:
+                self._flush_with_retries(chunk, None)
+            except Exception:
+                self._spill(records[start:])
+                break
+            replayed += len(chunk)
+        os.remove(claimed)
+        self.replayed_records += replayed
+        if replayed:
+            logger.warning("Replayed %d spilled location records from %s", replayed, self.spill_path)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush everything still queued and stop the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer.join(timeout)
+
+    def stats(self) -> dict:
+        """Return queue depth and flush counters."""
+        with self._condition:
+            return {
+                "pending": self._pending,
+                "capacity": self.capacity,
+                "flushes": self.flushes,
+                "flushed_records": self.flushed_records,
+                "rejected_records": self.rejected_records,
+                "failed_flushes": self.failed_flushes,
+                "spilled_records": self.spilled_records,
+                "replayed_records": self.replayed_records,
+            }
+
+
+_write_buffer: Optional[WriteBehindBuffer] = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer(flush: Callable[[list[LocationRecord], Optional[Callable]], list[LocationRecord]]) -> Optional[WriteBehindBuffer]:
+    """Return the process-wide buffer when LOCATION_WRITE_BEHIND is on, else None."""
+    global _write_buffer
+    if not config.LOCATION_WRITE_BEHIND:
+        return None
+    with _write_buffer_lock:
+        if _write_buffer is None:
+            _write_buffer = WriteBehindBuffer(
+                flush,
+                config.LOCATION_BUFFER_CAPACITY,
+                config.LOCATION_FLUSH_SIZE,
+                config.LOCATION_FLUSH_INTERVAL_MS / 1000.0,
+                config.LOCATION_RETRY_AFTER,
+                config.LOCATION_FLUSH_RETRIES,
+                config.LOCATION_SPILL_PATH,
+            )
+            atexit.register(_write_buffer.close)
+        return _write_buffer
+
+
+def close_write_buffer() -> None:
+    """Flush and stop the process-wide buffer, if one was started."""
+    with _write_buffer_lock:
+        if _write_buffer is not None:
+            _write_buffer.close()
+
+
+def write_buffer_stats() -> Optional[dict]:
+    """Stats of the process-wide buffer, None if none was started."""
+    buffer = _write_buffer
+    return buffer.stats() if buffer is not None else None
@@ -0,0 +1,174 @@
+"""Compact binary frame format for constrained collars.
+
+A frame (little endian) is::
+
+    magic "NB" | version u8 | flags u8 | device_id length u8 | device_id (UTF-8)
+    sent_at epoch ms i64 | point count u16
+    first point: epoch ms i64 | latitude i32 | longitude i32   (degrees * 1e7)
+    count - 1 deltas from the previous point:
+        narrow (default):  dt u16 (1/10 s) | dlat i16 | dlon i16  (degrees * 1e6)
+        FLAG_WIDE_DELTAS:  dt u32 (ms)     | dlat i32 | dlon i32  (degrees * 1e7)
+    tag: first 16 bytes of HMAC-SHA256(device api_key, everything above)
+
+The HMAC replaces the plaintext X-API-Key, and sent_at bounds how long a
+captured frame can be replayed. Within that window the server remembers the
+tags of stored frames and refuses a frame it has already received. Several
+frames may be concatenated in a body or datagram.
+"""
+import hmac
+import struct
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Optional
+
+import numpy as np
+
+MAGIC = b"NB"
+VERSION = 1
+FLAG_WIDE_DELTAS = 1
+TAG_SIZE = 16
+
+_PREFIX = struct.Struct("<2sBBB")
+_HEADER = struct.Struct("<qH")
+_FIRST = struct.Struct("<qii")
+NARROW_DELTA = np.dtype([("dt", "<u2"), ("dlat", "<i2"), ("dlon", "<i2")])
+WIDE_DELTA = np.dtype([("dt", "<u4"), ("dlat", "<i4"), ("dlon", "<i4")])
+NARROW_STEP = struct.Struct("<Hhh")
+WIDE_STEP = struct.Struct("<Iii")
+# Frames with at most this many deltas are decoded without NumPy
+SMALL_FRAME = 32
+_EPOCH = datetime(1970, 1, 1)
+# Point timestamps must fit a datetime: from the epoch up to the end of year 9999
+MAX_TIMESTAMP_MS = (datetime.max - _EPOCH) // timedelta(milliseconds=1)
+
+class FrameError(ValueError):
+    """Raised for malformed frames."""
+
+class FrameAuthError(FrameError):
+    """Raised for frames with a bad signature, unknown device or stale timestamp."""
+
+class Frame:
+    """Decoded frame: device_id plus parallel lists of naive UTC timestamps and degrees.
+
+    `tag` is the frame's HMAC tag, which identifies it for replay detection.
+    """
+
+    def __init__(self, device_id: str, sent_at_ms: int, timestamps: list[datetime],
+                 latitudes: list[float], longitudes: list[float], tag: bytes = b""):
+        self.device_id = device_id
+        self.sent_at_ms = sent_at_ms
+        self.timestamps = timestamps
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.tag = tag
+
+def encode_frame(device_id: str, api_key: str, sent_at_ms: int, points: list[tuple[int, float, float]]) -> bytes:
+    """Encode (epoch ms, latitude, longitude) points; wide deltas are used only if needed."""
+    if not points or len(points) > 0xFFFF:
+        raise FrameError("A frame carries 1 to 65535 points")
+    timestamps = np.array([point[0] for point in points], dtype=np.int64)
+    lat_e7 = np.rint(np.array([point[1] for point in points]) * 1e7).astype(np.int64)
+    lon_e7 = np.rint(np.array([point[2] for point in points]) * 1e7).astype(np.int64)
+
+    flags = 0
+    deltas = b""
+    if len(points) > 1:
+        narrow = np.empty(len(points) - 1, dtype=NARROW_DELTA)
+        dt = np.diff(timestamps)
+        # Narrow deltas accumulate at 1e-6 degrees, so encode against the rounded track
+        lat_e6 = np.rint(lat_e7 / 10).astype(np.int64)
+        lon_e6 = np.rint(lon_e7 / 10).astype(np.int64)
+        dlat, dlon = np.diff(lat_e6), np.diff(lon_e6)
+        if (dt >= 0).all() and (dt % 100 == 0).all() and (dt // 100 <= 0xFFFF).all() and \
+                (np.abs(dlat) < 0x8000).all() and (np.abs(dlon) < 0x8000).all():
+            narrow["dt"], narrow["dlat"], narrow["dlon"] = dt // 100, dlat, dlon
+            deltas = narrow.tobytes()
+        else:
+            if (dt < 0).any() or (dt > 0xFFFFFFFF).any():
+                raise FrameError("Points must be in time order")
+            wide = np.empty(len(points) - 1, dtype=WIDE_DELTA)
+            wide["dt"], wide["dlat"], wide["dlon"] = dt, np.diff(lat_e7), np.diff(lon_e7)
+            deltas = wide.tobytes()
+            flags |= FLAG_WIDE_DELTAS
+
+    device = device_id.encode()
+    body = (_PREFIX.pack(MAGIC, VERSION, flags, len(device)) + device +
+            _HEADER.pack(sent_at_ms, len(points)) +
+            _FIRST.pack(int(timestamps[0]), int(lat_e7[0]), int(lon_e7[0])) + deltas)
+    return body + hmac.digest(api_key.encode(), body, "sha256")[:TAG_SIZE]
+
+def decode_frames(data: bytes, api_key_for: Callable[[str], Optional[str]],
+                  max_skew_ms: Optional[int] = None) -> list[Frame]:
+    """Decode and authenticate every frame in `data`.
+
+    `api_key_for` returns the API key of a device, or None if it is unknown.
+    With `max_skew_ms`, frames whose sent_at is further than that from the
+    server clock are rejected as stale or replayed.
+
+    Raises:
+        FrameError: On the first malformed frame.
+        FrameAuthError: On the first unauthenticated or stale frame.
+    """
+    frames = []
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        frame, offset = _decode_frame(view, offset, api_key_for)
+        if max_skew_ms is not None and abs(time.time() * 1000 - frame.sent_at_ms) > max_skew_ms:
+            raise FrameAuthError("Frame timestamp outside the accepted window")
+        frames.append(frame)
+    return frames
+
+def _decode_frame(view: memoryview, offset: int, api_key_for) -> tuple[Frame, int]:
+    start = offset
+    try:
+        magic, version, flags, device_len = _PREFIX.unpack_from(view, offset)
+        if magic != MAGIC or version != VERSION:
+            raise FrameError("Unknown frame format")
+        offset += _PREFIX.size
+        device_id = bytes(view[offset:offset + device_len]).decode()
+        offset += device_len
+        sent_at_ms, count = _HEADER.unpack_from(view, offset)
+        offset += _HEADER.size
+        first_ts, first_lat, first_lon = _FIRST.unpack_from(view, offset)
+        offset += _FIRST.size
+    except (struct.error, UnicodeDecodeError):
+        raise FrameError("Truncated frame")
+    if count == 0:
+        raise FrameError("Empty frame")
+    wide = flags & FLAG_WIDE_DELTAS
+    deltas_end = offset + (count - 1) * (WIDE_STEP if wide else NARROW_STEP).size
+    if deltas_end + TAG_SIZE > len(view):
+        raise FrameError("Truncated frame")
+
+    api_key = api_key_for(device_id)
+    expected = hmac.digest(api_key.encode(), view[start:deltas_end], "sha256")[:TAG_SIZE] if api_key else None
+    tag = bytes(view[deltas_end:deltas_end + TAG_SIZE])
+    if expected is None or not hmac.compare_digest(expected, tag):
+        raise FrameAuthError("Invalid device_id or signature")
+
+    ts_scale, degree_scale = (1, 1e7) if wide else (100, 1e6)
+    base_lat, base_lon = (first_lat, first_lon) if wide else (round(first_lat / 10), round(first_lon / 10))
+    if count - 1 <= SMALL_FRAME:
+        # NumPy's per-call overhead dominates for a handful of points
+        steps = list(zip(*(WIDE_STEP if wide else NARROW_STEP).iter_unpack(view[offset:deltas_end]))) or [(), (), ()]
+        _check_timestamps(first_ts, sum(steps[0]) * ts_scale)
+        first = _EPOCH + timedelta(0, 0, first_ts * 1000)
+        timestamps = [first + timedelta(0, 0, dt * ts_scale * 1000) for dt in accumulate(steps[0], initial=0)]
+        latitudes = [first_lat / 1e7] + [(base_lat + dlat) / degree_scale for dlat in accumulate(steps[1])]
+        longitudes = [first_lon / 1e7] + [(base_lon + dlon) / degree_scale for dlon in accumulate(steps[2])]
+    else:
+        deltas = np.frombuffer(view, dtype=WIDE_DELTA if wide else NARROW_DELTA, count=count - 1, offset=offset)
+        offsets = np.zeros(count, dtype=np.int64)
+        np.cumsum(deltas["dt"], dtype=np.int64, out=offsets[1:])
+        _check_timestamps(first_ts, int(offsets[-1]) * ts_scale)
+        timestamps = (first_ts + offsets * ts_scale).astype("datetime64[ms]").astype("datetime64[us]").tolist()
+        latitudes = [first_lat / 1e7] + ((base_lat + np.cumsum(deltas["dlat"], dtype=np.int64)) / degree_scale).tolist()
+        longitudes = [first_lon / 1e7] + ((base_lon + np.cumsum(deltas["dlon"], dtype=np.int64)) / degree_scale).tolist()
+    return Frame(device_id, sent_at_ms, timestamps, latitudes, longitudes, tag), deltas_end + TAG_SIZE
+
+def _check_timestamps(first_ts: int, span_ms: int) -> None:
+    """Refuse points that would not convert to a datetime (deltas are unsigned)."""
+    if first_ts < 0 or first_ts + span_ms > MAX_TIMESTAMP_MS:
+        raise FrameError("Point timestamp out of range")
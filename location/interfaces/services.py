@@ -1,13 +1,27 @@
 """Interface services for the Location-bounded context."""
-from flask import Blueprint, request, jsonify
+import base64
+import json
+from datetime import date, datetime, timedelta
 
-from location.application.services.location_service import LocationRecordApplicationService
-from iam.interfaces.services import authenticate_request
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from location.application.services.archive_service import ArchiveApplicationService
+from location.application.services.geofence_service import GeofenceApplicationService
+from location.application.services.location_service import (DeviceAuthError, DuplicateFrameError,
+                                                             LocationRecordApplicationService)
+from location.domain.services.timestamps import parse_timestamp
+from location.interfaces.binary_protocol import FrameAuthError, FrameError, decode_frames
+from location.infrastructure.metrics import INGEST_STAGE
+from location.infrastructure.repositories.write_behind import WriteBufferFullError
+from iam.interfaces.services import authenticate_admin, authenticate_device, authenticate_request
+from shared.infrastructure import config
 
 location_api = Blueprint("location_api", __name__)
 
 # Inicializa el servicio de ubicación
-location_service = LocationRecordApplicationService()
+geofence_service = GeofenceApplicationService()
+archive_service = ArchiveApplicationService()
+location_service = LocationRecordApplicationService(geofence_service, archive_service=archive_service)
 
 @location_api.route("/api/v1/location", methods=["POST"])
 def create_location():
@@ -16,29 +30,511 @@ def create_location():
     Expects JSON with device_id, latitude, longitude, and optional created_at.
 
     Returns:
-        tuple: (JSON response, status code).
+        tuple: (JSON response, status code). 202 instead of 201 when the record was
+        only buffered for a later group commit, 200 with "dropped" when the track
+        filter discarded it.
     """
+    with INGEST_STAGE.time("parse"):
+        data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    # Not timed here: the service times its own credential lookup as "auth"
     auth_result = authenticate_request()
     if auth_result:
         return auth_result
 
-    data = request.json
     try:
         device_id = data["device_id"]
         latitude = float(data["latitude"])
         longitude = float(data["longitude"])
-        created_at = data.get("created_at")
+    except KeyError:
+        return jsonify({"error": "Missing required fields"}), 400
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid latitude or longitude"}), 400
+    try:
         record = location_service.create_location_record(
-            device_id, latitude, longitude, created_at, request.headers.get("X-API-Key")
+            device_id, latitude, longitude, data.get("created_at"), request.headers.get("X-API-Key")
         )
-        return jsonify({
-            "id": record.id,
-            "device_id": record.device_id,
-            "latitude": record.latitude,
-            "longitude": record.longitude,
-            "created_at": record.created_at.isoformat() + "Z"
-        }), 201
+        return jsonify(ingest_result_to_json(record)), ingest_status(record)
+    except WriteBufferFullError as e:
+        return buffer_full_response(e)
+    except DeviceAuthError as e:
+        return jsonify({"error": str(e)}), 401
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def ingest_status(record) -> int:
+    """HTTP status of an ingested record: 201 stored, 202 buffered, 200 dropped by the track filter."""
+    if record.dropped_reason is not None:
+        return 200
+    return 201 if record.id is not None else 202
+
+def ingest_result_to_json(record) -> dict:
+    """Serialize an ingested record, flagging it when the track filter dropped it."""
+    result = {
+        "id": record.id,
+        "device_id": record.device_id,
+        "latitude": record.latitude,
+        "longitude": record.longitude,
+        "created_at": record.created_at.isoformat() + "Z"
+    }
+    if record.dropped_reason is not None:
+        result["dropped"] = record.dropped_reason
+    return result
+
+def buffer_full_response(error: WriteBufferFullError):
+    """Build the backpressure response sent while the write buffer is full.
+
+    Returns:
+        tuple: (JSON response, status code, headers).
+    """
+    return jsonify({"error": str(error)}), 503, {"Retry-After": str(error.retry_after)}
+
+# Upper bound on fixes per batch request, keeps a single transaction short
+MAX_BATCH_SIZE = 1000
+
+@location_api.route("/api/v1/location/batch", methods=["POST"])
+def create_location_batch():
+    """Handle POST requests to create several location records at once.
+
+    Expects a JSON array of objects with device_id, latitude, longitude, optional
+    created_at and optional api_key (defaults to the X-API-Key header). Fixes may
+    belong to different devices; each device is authenticated once and all valid
+    fixes are stored in one transaction. Per fix, a device_id or api_key that is
+    not a string is a 400 and credentials that do not match are a 401.
+
+    Returns:
+        tuple: (JSON response with one result per fix, status code). 201 when every
+        fix was stored, 202 when they were only buffered for a later group commit,
+        200 when the track filter dropped them all, 207 when some were rejected,
+        503 with Retry-After when the buffer is full.
+    """
+    with INGEST_STAGE.time("parse"):
+        data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return jsonify({"error": "Expected a JSON array of locations"}), 400
+    if len(data) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch exceeds {MAX_BATCH_SIZE} locations"}), 413
+
+    header_api_key = request.headers.get("X-API-Key")
+    results = [None] * len(data)
+    fixes = []
+    positions = []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            results[index] = {"index": index, "status": 400, "error": "Expected a location object"}
+            continue
+        try:
+            device_id = item["device_id"]
+            api_key = item.get("api_key") or header_api_key
+            if not device_id or not api_key:
+                results[index] = {"index": index, "status": 401, "error": "Missing device_id or X-API-Key"}
+                continue
+            if not isinstance(device_id, str) or not isinstance(api_key, str):
+                results[index] = {"index": index, "status": 400, "error": "device_id and api_key must be strings"}
+                continue
+            fixes.append((
+                device_id,
+                float(item["latitude"]),
+                float(item["longitude"]),
+                item.get("created_at"),
+                api_key,
+            ))
+            positions.append(index)
+        except KeyError:
+            results[index] = {"index": index, "status": 400, "error": "Missing required fields"}
+        except (TypeError, ValueError):
+            results[index] = {"index": index, "status": 400, "error": "Invalid latitude or longitude"}
+
+    try:
+        outcomes = location_service.save_many(fixes)
+    except WriteBufferFullError as e:
+        return buffer_full_response(e)
+
+    for index, outcome in zip(positions, outcomes):
+        if isinstance(outcome, ValueError):
+            status = 401 if isinstance(outcome, DeviceAuthError) else 400
+            results[index] = {"index": index, "status": status, "error": str(outcome)}
+        else:
+            results[index] = {"index": index, "status": ingest_status(outcome), **ingest_result_to_json(outcome)}
+
+    statuses = {result["status"] for result in results}
+    accepted = sum(1 for result in results if result["status"] in (200, 201, 202))
+    if accepted < len(results):
+        status = 207
+    elif 202 in statuses:
+        status = 202
+    elif 201 in statuses or not results:
+        status = 201
+    else:
+        status = 200
+    return jsonify({
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results
+    }), status
+
+@location_api.route("/api/v1/location/binary", methods=["POST"])
+def create_location_binary():
+    """Handle POST requests carrying binary location frames.
+
+    Expects an application/octet-stream body with one or more frames in the
+    format described in location.interfaces.binary_protocol. Frames are
+    authenticated by their HMAC tag, so no X-API-Key header is needed.
+
+    Returns:
+        tuple: (JSON summary, status code). 201 stored, 202 buffered, 400 for a
+        malformed frame, 401 for a bad signature or stale frame, 409 when a frame
+        was already received, 413 when the body is too large, 503 with
+        Retry-After when the buffer is full.
+    """
+    if request.content_length is not None and request.content_length > config.BINARY_MAX_BODY:
+        return body_too_large_response()
+    try:
+        with INGEST_STAGE.time("parse"):
+            # A chunked upload has no Content-Length, so the limit is enforced on read
+            data = read_body(config.BINARY_MAX_BODY + 1)
+            if len(data) > config.BINARY_MAX_BODY:
+                return body_too_large_response()
+            frames = decode_frames(data, location_service.device_api_key, config.BINARY_MAX_SKEW_S * 1000)
+    except FrameAuthError as e:
+        return jsonify({"error": str(e)}), 401
+    except FrameError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        records = location_service.save_frames(frames)
+    except WriteBufferFullError as e:
+        return buffer_full_response(e)
+    except DuplicateFrameError as e:
+        return jsonify({"error": str(e)}), 409
+    status = 202 if any(ingest_status(record) == 202 for record in records) else 201
+    return jsonify(binary_ingest_summary(frames, records)), status
+
+def body_too_large_response():
+    return jsonify({"error": f"Body exceeds {config.BINARY_MAX_BODY} bytes"}), 413
+
+def read_body(limit: int) -> bytes:
+    """Read the request body, stopping after `limit` bytes."""
+    chunks = []
+    remaining = limit
+    while remaining > 0:
+        chunk = request.stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+def binary_ingest_summary(frames, records) -> dict:
+    """Counts of a binary ingest; per-point results would cost more than the frames themselves."""
+    dropped = sum(1 for record in records if record.dropped_reason is not None)
+    points = sum(len(frame.timestamps) for frame in frames)
+    return {
+        "frames": len(frames),
+        "points": points,
+        "accepted": len(records) - dropped,
+        "dropped": dropped,
+        "rejected": points - len(records)
+    }
+
+
+def encode_cursor(record) -> str:
+    """Encode the keyset position of a record as an opaque URL-safe cursor."""
+    raw = f"{record.created_at.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, record_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+@location_api.route("/api/v1/location/<device_id>/history", methods=["GET"])
+def location_history(device_id):
+    """Stream the location history of a device as NDJSON.
+
+    Query parameters: from and to (ISO 8601, half-open range), limit (maximum
+    records, all if omitted) and after (cursor of the last record already read).
+    Each line is one record with a "cursor" field; pass the last one as after to
+    fetch the next page.
+
+    Returns:
+        Response: application/x-ndjson stream, or (JSON error, status code).
+    """
+    auth_result = authenticate_device(device_id)
+    if auth_result:
+        return auth_result
+
+    try:
+        start = parse_timestamp(request.args["from"]) if request.args.get("from") else None
+        end = parse_timestamp(request.args["to"]) if request.args.get("to") else None
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+        after = decode_cursor(request.args["after"]) if request.args.get("after") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if limit is not None and limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    records = location_service.iter_history(device_id, start, end, after, limit)
+
+    def generate():
+        for record in records:
+            yield json.dumps({
+                "id": record.id,
+                "device_id": record.device_id,
+                "latitude": record.latitude,
+                "longitude": record.longitude,
+                "created_at": record.created_at.isoformat() + "Z",
+                "cursor": encode_cursor(record)
+            }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# Default and maximum number of records returned by spatial searches
+SEARCH_DEFAULT_LIMIT = 1000
+SEARCH_MAX_LIMIT = 10000
+
+def parse_search_window():
+    """Parse the from/to/limit/latest query parameters shared by spatial searches.
+
+    Raises:
+        ValueError: If a parameter is malformed.
+    """
+    start = parse_timestamp(request.args["from"]) if request.args.get("from") else None
+    end = parse_timestamp(request.args["to"]) if request.args.get("to") else None
+    limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+    if not 0 < limit <= SEARCH_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    latest = request.args.get("latest", "").lower() in ("1", "true", "yes")
+    return start, end, limit, latest
+
+def location_to_json(record, **extra) -> dict:
+    """Serialize a location record for JSON responses."""
+    return {
+        "id": record.id,
+        "device_id": record.device_id,
+        "latitude": record.latitude,
+        "longitude": record.longitude,
+        "created_at": record.created_at.isoformat() + "Z",
+        **extra
+    }
+
+@location_api.route("/api/v1/location/search/bbox", methods=["GET"])
+def search_bbox():
+    """Find records inside a bounding box, newest first.
+
+    Query parameters: min_lat, min_lon, max_lat, max_lon (min_lon > max_lon wraps
+    the antimeridian), optional from/to (ISO 8601), limit and latest (keep only
+    the newest record per device). Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    try:
+        min_lat = float(request.args["min_lat"])
+        min_lon = float(request.args["min_lon"])
+        max_lat = float(request.args["max_lat"])
+        max_lon = float(request.args["max_lon"])
+        start, end, limit, latest = parse_search_window()
     except KeyError:
-        return jsonify({"error": "Missing required fields"}), 400
+        return jsonify({"error": "Missing required parameters"}), 400
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
+    if not (-90.0 <= min_lat <= max_lat <= 90.0 and -180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
+        return jsonify({"error": "Coordinates out of range"}), 400
+
+    records = location_service.find_in_box(min_lat, min_lon, max_lat, max_lon, start, end, limit, latest)
+    return jsonify([location_to_json(record) for record in records]), 200
+
+@location_api.route("/api/v1/location/search/near", methods=["GET"])
+def search_near():
+    """Find the records nearest to a point within a radius, nearest first.
+
+    Query parameters: lat, lon, radius (metres), optional from/to (ISO 8601),
+    limit (the nearest `limit` records, whatever their age) and latest (keep
+    only the newest record per device). Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius = float(request.args["radius"])
+        start, end, limit, latest = parse_search_window()
+    except KeyError:
+        return jsonify({"error": "Missing required parameters"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 and radius > 0):
+        return jsonify({"error": "Coordinates out of range"}), 400
+
+    matches = location_service.find_near(lat, lon, radius, start, end, limit, latest)
+    return jsonify([location_to_json(record, distance_m=distance) for record, distance in matches]), 200
+
+
+def geofence_to_json(fence) -> dict:
+    """Serialize a geofence for JSON responses."""
+    return {
+        "id": fence.id,
+        "name": fence.name,
+        "device_id": fence.device_id,
+        "vertices": [list(vertex) for vertex in fence.vertices],
+        "created_at": fence.created_at.isoformat() + "Z"
+    }
+
+@location_api.route("/api/v1/geofences", methods=["POST"])
+def create_geofence():
+    """Create a geofence.
+
+    Expects JSON with name, vertices (list of [latitude, longitude], at least 3)
+    and optional device_id (the fence applies to every device if omitted).
+    Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        vertices = [(float(lat), float(lon)) for lat, lon in data["vertices"]]
+        fence = geofence_service.create_geofence(data["name"], vertices, data.get("device_id"))
+    except KeyError:
+        return jsonify({"error": "Missing required fields"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(geofence_to_json(fence)), 201
+
+@location_api.route("/api/v1/geofences", methods=["GET"])
+def list_geofences():
+    """List every geofence. Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    return jsonify([geofence_to_json(fence) for fence in geofence_service.list_geofences()]), 200
+
+@location_api.route("/api/v1/geofences/<int:fence_id>", methods=["DELETE"])
+def delete_geofence(fence_id):
+    """Delete a geofence and the device states that refer to it.
+
+    Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    if not geofence_service.delete_geofence(fence_id):
+        return jsonify({"error": "Geofence not found"}), 404
+    return "", 204
+
+@location_api.route("/api/v1/geofences/events", methods=["GET"])
+def list_geofence_events():
+    """List enter/exit transitions, newest first.
+
+    Query parameters: optional device_id and limit. Requires the admin X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    try:
+        limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    events = geofence_service.list_events(request.args.get("device_id"), min(max(limit, 1), SEARCH_MAX_LIMIT))
+    return jsonify([{
+        "id": event.id,
+        "geofence_id": event.geofence_id,
+        "device_id": event.device_id,
+        "event": event.event,
+        "latitude": event.latitude,
+        "longitude": event.longitude,
+        "record_id": event.record_id,
+        "created_at": event.created_at.isoformat() + "Z"
+    } for event in events]), 200
+
+@location_api.route("/api/v1/location/filter-stats", methods=["GET"])
+def track_filter_stats():
+    """Expose the track filter counters (received, kept, dropped, bytes saved).
+
+    Returns:
+        tuple: (JSON response, status code). 404 when the filter is disabled.
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    stats = location_service.filter_stats()
+    if stats is None:
+        return jsonify({"error": "Track filter disabled"}), 404
+    return jsonify(stats), 200
+
+@location_api.route("/api/v1/location/archive", methods=["POST"])
+def archive_locations():
+    """Start moving whole days of old records into the columnar archive.
+
+    Expects optional JSON with before (ISO date); defaults to ARCHIVE_AFTER_DAYS
+    days ago (UTC). Requires the admin X-API-Key. The archive runs in a
+    background job; poll GET /api/v1/location/archive for its outcome.
+
+    Returns:
+        tuple: (JSON job state, status code). 202 when the job was started, 409
+        with the running job when one is already in progress.
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        before = date.fromisoformat(data["before"]) if data.get("before") else \
+            datetime.utcnow().date() - timedelta(days=config.ARCHIVE_AFTER_DAYS)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid before date"}), 400
+    job, started = archive_service.start_archive(before)
+    return jsonify(job), 202 if started else 409
+
+@location_api.route("/api/v1/location/archive", methods=["GET"])
+def archive_job():
+    """Report the latest archive job of this process.
+
+    Returns:
+        tuple: (JSON job state with status running, done or failed and, once done,
+        the devices, days and records archived; status code). 404 when no job
+        was started.
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    job = archive_service.job()
+    if job is None:
+        return jsonify({"error": "No archive job"}), 404
+    return jsonify(job), 200
@@ -0,0 +1,81 @@
+"""UDP listener for binary location frames.
+
+Collars on constrained links can send each frame (or several concatenated) as
+a single datagram instead of an HTTP request. Datagrams are fire-and-forget:
+nothing is sent back, and invalid ones are only counted.
+"""
+import logging
+import socket
+import threading
+from typing import Optional
+
+from location.application.services.location_service import DuplicateFrameError
+from location.infrastructure.metrics import INGEST_STAGE
+from location.infrastructure.repositories.write_behind import WriteBufferFullError
+from location.interfaces.binary_protocol import FrameError, decode_frames
+from location.interfaces.services import location_service
+from shared.infrastructure import config
+from shared.infrastructure.database import db
+
+logger = logging.getLogger(__name__)
+
+MAX_DATAGRAM = 65507
+
+class UdpFrameListener:
+    """Receives binary frames on a UDP socket and stores them from one thread."""
+
+    def __init__(self, host: str, port: int, reuse_port: bool = False):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if reuse_port:
+            # Several worker processes share the port; the kernel balances datagrams
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.socket.bind((host, port))
+        self.address = self.socket.getsockname()
+        self.datagrams = 0
+        self.points = 0
+        self.rejected = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "UdpFrameListener":
+        self._thread = threading.Thread(target=self._serve, name="udp-frame-listener", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.socket.close()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def stats(self) -> dict:
+        return {"datagrams": self.datagrams, "points": self.points, "rejected": self.rejected}
+
+    def _serve(self) -> None:
+        db.connect(reuse_if_open=True)
+        try:
+            while True:
+                try:
+                    data = self.socket.recv(MAX_DATAGRAM)
+                except OSError:
+                    return
+                self.datagrams += 1
+                self._handle(data)
+        finally:
+            db.close()
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            with INGEST_STAGE.time("parse"):
+                frames = decode_frames(data, location_service.device_api_key, config.BINARY_MAX_SKEW_S * 1000)
+            self.points += len(location_service.save_frames(frames))
+        except (FrameError, DuplicateFrameError, WriteBufferFullError) as e:
+            self.rejected += 1
+            logger.debug("Rejected datagram: %s", e)
+        except Exception:
+            self.rejected += 1
+            logger.exception("Failed to store datagram")
+
+def start_udp_listener(reuse_port: bool = False) -> Optional[UdpFrameListener]:
+    """Start the listener on BINARY_UDP_PORT, or return None when it is 0."""
+    if not config.BINARY_UDP_PORT:
+        return None
+    return UdpFrameListener(config.BINARY_UDP_HOST, config.BINARY_UDP_PORT, reuse_port).start()
@@ -0,0 +1,166 @@
+"""
+Runtime configuration for the Smart Band Edge Service.
+
+Every setting can be overridden through an environment variable of the same name.
+"""
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting from the environment (1/true/yes/on)."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment."""
+    return float(os.environ.get(name, default))
+
+
+# Repository root, where app.py and connector.py live
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def resolve_path(value: str) -> str:
+    """Absolute form of a configured path; "" (disabled) and ":memory:" pass through.
+
+    A relative path resolves against BASE_DIR rather than the working
+    directory, so the app and the connector agree wherever they are started.
+    """
+    if not value or value == ":memory:":
+        return value
+    return os.path.join(BASE_DIR, value)
+
+
+# SQLite database
+DB_PATH = resolve_path(os.environ.get("DB_PATH", "collar-location.db"))
+DB_JOURNAL_MODE = os.environ.get("DB_JOURNAL_MODE", "wal")
+DB_SYNCHRONOUS = os.environ.get("DB_SYNCHRONOUS", "normal")
+DB_CACHE_SIZE = env_int("DB_CACHE_SIZE", -16000)  # negative = KiB
+DB_MMAP_SIZE = env_int("DB_MMAP_SIZE", 128 * 1024 * 1024)
+DB_BUSY_TIMEOUT_MS = env_int("DB_BUSY_TIMEOUT_MS", 5000)
+# Pool connections across threads instead of one connection per thread
+DB_POOLED = env_bool("DB_POOLED", False)
+DB_MAX_CONNECTIONS = env_int("DB_MAX_CONNECTIONS", 8)
+DB_STALE_TIMEOUT = env_int("DB_STALE_TIMEOUT", 300)
+
+
+def sqlite_pragmas() -> dict:
+    """PRAGMAs applied to every connection to the edge database."""
+    return {
+        "journal_mode": DB_JOURNAL_MODE,
+        "synchronous": DB_SYNCHRONOUS,
+        "cache_size": DB_CACHE_SIZE,
+        "mmap_size": DB_MMAP_SIZE,
+        "busy_timeout": DB_BUSY_TIMEOUT_MS,
+    }
+
+
+# Geofence grid cell size, in degrees
+GEOFENCE_CELL_SIZE = env_float("GEOFENCE_CELL_SIZE", 0.01)
+# Seconds between checks for fences changed by other processes
+GEOFENCE_INDEX_TTL = env_float("GEOFENCE_INDEX_TTL", 5.0)
+
+
+# Columnar archive of cold location history
+ARCHIVE_DIR = resolve_path(os.environ.get("ARCHIVE_DIR", "archive"))
+ARCHIVE_COMPRESS = env_bool("ARCHIVE_COMPRESS", False)
+ARCHIVE_AFTER_DAYS = env_int("ARCHIVE_AFTER_DAYS", 30)
+
+
+# Key for fleet-wide endpoints (spatial search); empty disables them
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY", "")
+
+
+# Device credential cache (IAM)
+DEVICE_CACHE_SIZE = env_int("DEVICE_CACHE_SIZE", 1024)
+DEVICE_CACHE_TTL = env_float("DEVICE_CACHE_TTL", 300.0)
+DEVICE_CACHE_NEGATIVE_TTL = env_float("DEVICE_CACHE_NEGATIVE_TTL", 10.0)
+# Seconds between checks of the shared credential revision; a key rotated in
+# another worker process stops working here within this delay
+DEVICE_CACHE_SYNC_INTERVAL = env_float("DEVICE_CACHE_SYNC_INTERVAL", 1.0)
+
+
+# Binary ingestion protocol
+BINARY_MAX_BODY = env_int("BINARY_MAX_BODY", 1 << 20)
+# Frames signed further than this from the server clock are rejected (replay window)
+BINARY_MAX_SKEW_S = env_int("BINARY_MAX_SKEW_S", 300)
+# UDP port for datagram ingestion; 0 disables the listener
+BINARY_UDP_PORT = env_int("BINARY_UDP_PORT", 0)
+BINARY_UDP_HOST = os.environ.get("BINARY_UDP_HOST", "0.0.0.0")
+
+
+# HTTP server started by app.py ("threaded", "processes" or "dev")
+SERVER_MODE = os.environ.get("SERVER_MODE", "threaded")
+SERVER_HOST = os.environ.get("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = env_int("SERVER_PORT", 5000)
+# Processes for "processes" mode; SQLite still has a single writer, so a few suffice
+SERVER_WORKERS = env_int("SERVER_WORKERS", 2)
+SERVER_THREADS = env_int("SERVER_THREADS", 8)
+SERVER_GRACEFUL_TIMEOUT = env_int("SERVER_GRACEFUL_TIMEOUT", 30)
+
+
+# Unix datagram socket where committed device ids are announced to the
+# connector; empty disables it. Both ends resolve it with notify_socket_path().
+NOTIFY_SOCKET = os.environ.get("NOTIFY_SOCKET", "ingest-notify.sock")
+
+
+def notify_socket_path() -> str:
+    """Absolute path of NOTIFY_SOCKET, or "" when disabled."""
+    return resolve_path(NOTIFY_SOCKET)
+
+
+# Write-behind buffer for location inserts
+LOCATION_WRITE_BEHIND = env_bool("LOCATION_WRITE_BEHIND", False)
+LOCATION_FLUSH_SIZE = env_int("LOCATION_FLUSH_SIZE", 500)
+LOCATION_FLUSH_INTERVAL_MS = env_float("LOCATION_FLUSH_INTERVAL_MS", 50.0)
+LOCATION_BUFFER_CAPACITY = env_int("LOCATION_BUFFER_CAPACITY", 10000)
+# "commit": acknowledge after the group commit; "enqueue": acknowledge once buffered
+LOCATION_DURABILITY = os.environ.get("LOCATION_DURABILITY", "commit")
+LOCATION_RETRY_AFTER = env_int("LOCATION_RETRY_AFTER", 1)
+# Retries of a failed group commit before its records are spilled to disk
+LOCATION_FLUSH_RETRIES = env_int("LOCATION_FLUSH_RETRIES", 3)
+# NDJSON file for records whose group commit kept failing, replayed on the next
+# start; empty drops them (logged and counted)
+LOCATION_SPILL_PATH = resolve_path(os.environ.get("LOCATION_SPILL_PATH", "location-spill.ndjson"))
+
+
+def parse_speed_limits(value: str) -> dict:
+    """Parse "device-a=5,device-b=12.5" into per-device speed limits (m/s)."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        device_id, limit = item.rsplit("=", 1)
+        limits[device_id.strip()] = float(limit)
+    return limits
+
+
+# Ingest-time GPS filtering and trajectory compression
+TRACK_FILTER = env_bool("TRACK_FILTER", False)
+TRACK_MAX_SPEED_MPS = env_float("TRACK_MAX_SPEED_MPS", 25.0)
+TRACK_SPEED_LIMITS = parse_speed_limits(os.environ.get("TRACK_SPEED_LIMITS", ""))
+TRACK_STATIONARY_RADIUS_M = env_float("TRACK_STATIONARY_RADIUS_M", 10.0)
+TRACK_MAX_GAP_S = env_float("TRACK_MAX_GAP_S", 300.0)
+TRACK_COMPRESSION = env_bool("TRACK_COMPRESSION", False)
+TRACK_COMPRESSION_ERROR_M = env_float("TRACK_COMPRESSION_ERROR_M", 15.0)
+TRACK_FILTER_MAX_DEVICES = env_int("TRACK_FILTER_MAX_DEVICES", 10000)
+
+
+# Prometheus /metrics endpoint and hot-path instrumentation
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+# Devices with their own per-device series; the rest are counted as "_other"
+METRICS_MAX_DEVICES = env_int("METRICS_MAX_DEVICES", 1000)
+# Bearer key required to scrape /metrics; empty leaves it open
+METRICS_API_KEY = os.environ.get("METRICS_API_KEY", "")
+
+
+# Sampling profiler for slow requests (toggled at runtime via /debug/profile)
+PROFILER_ENABLED = env_bool("PROFILER_ENABLED", False)
+PROFILER_SLOW_MS = env_float("PROFILER_SLOW_MS", 250.0)
+PROFILER_INTERVAL_MS = env_float("PROFILER_INTERVAL_MS", 5.0)
@@ -2,19 +2,115 @@
 Database initialization for the Smart Band Edge Service.
 
 Sets up the SQLite database and creates required tables for devices and health records.
+Running init_db against an existing database also applies later schema additions.
+The database file, PRAGMAs and pooling come from shared.infrastructure.config.
 """
 from peewee import SqliteDatabase
+from playhouse.pool import PooledSqliteDatabase
+
+from shared.infrastructure import config
+
+
+def create_database() -> SqliteDatabase:
+    """
+    Build the database handle configured for the edge service.
+
+    Returns a PooledSqliteDatabase when DB_POOLED is set, so threaded servers reuse
+    connections instead of opening one per thread.
+    """
+    if config.DB_POOLED:
+        return PooledSqliteDatabase(
+            config.DB_PATH,
+            pragmas=config.sqlite_pragmas(),
+            max_connections=config.DB_MAX_CONNECTIONS,
+            stale_timeout=config.DB_STALE_TIMEOUT,
+            timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+        )
+    return SqliteDatabase(
+        config.DB_PATH,
+        pragmas=config.sqlite_pragmas(),
+        timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+    )
+
 
 # Initialize SQLite database
-db = SqliteDatabase('collar-location.db')
+db = create_database()
 
 def init_db() -> None:
     """
     Initialize the database and create tables for Device and HealthRecord models.
     """
-    db.connect()
-    from iam.infrastructure.models import Device
-    from location.infrastructure.models.location_record import LocationRecord
-    db.create_tables([Device, LocationRecord], safe=True)
-    db.close()
+    opened = db.connect(reuse_if_open=True)
+    from iam.infrastructure.models import CredentialRevision, Device
+    from location.infrastructure.models.location_record import LocationRecord, install_autoincrement
+    from location.infrastructure.models.device_latest_location import DeviceLatestLocation, install_latest_location
+    from location.infrastructure.models.location_spatial_index import install_spatial_index
+    from location.infrastructure.models.geofence import (Geofence, GeofenceCheckpoint, GeofenceEvent,
+                                                         GeofenceRevision, GeofenceState)
+    from location.infrastructure.models.received_frame import ReceivedFrame
+    db.create_tables([Device, CredentialRevision, LocationRecord, DeviceLatestLocation, Geofence, GeofenceState,
+                      GeofenceCheckpoint, GeofenceRevision, GeofenceEvent, ReceivedFrame], safe=True)
+    # The backfills below copy created_at, so they must see normalised values
+    normalize_timestamps(db)
+    install_autoincrement(db, _highest_archived_id)
+    install_latest_location(db)
+    install_spatial_index(db)
+    if opened:
+        db.close()
+
+# (table, column) pairs holding DateTimeField values
+TIMESTAMP_COLUMNS = (
+    ("devices", "created_at"),
+    ("location_records", "created_at"),
+    ("device_latest_location", "created_at"),
+    ("geofences", "created_at"),
+    ("geofence_states", "updated_at"),
+    ("geofence_checkpoints", "last_fix_at"),
+    ("geofence_events", "created_at"),
+)
+
+# PRAGMA user_version once every stored timestamp is naive UTC
+TIMESTAMPS_NORMALIZED_VERSION = 1
+
+def normalize_timestamps(database) -> None:
+    """
+    Rewrite timestamps stored as ISO 8601 text with "T", "Z" or an offset to naive UTC.
+
+    Databases written before inputs were normalised hold values such as
+    '2025-07-08 03:25:20+00:00', which peewee cannot parse and returns as str.
+    Runs once per database: PRAGMA user_version records that it is done.
+    """
+    from location.domain.services.timestamps import parse_timestamp
+    with database.atomic("IMMEDIATE"):
+        if database.execute_sql("PRAGMA user_version").fetchone()[0] >= TIMESTAMPS_NORMALIZED_VERSION:
+            return
+        for table, column in TIMESTAMP_COLUMNS:
+            legacy = [value for (value,) in database.execute_sql(f"""
+                SELECT DISTINCT "{column}" FROM "{table}"
+                 WHERE typeof("{column}") = 'text'
+                   AND ("{column}" GLOB '*[TZ+]*' OR substr("{column}", 11) GLOB '*-*')
+            """)]
+            for value in legacy:
+                database.execute_sql(f'UPDATE "{table}" SET "{column}" = ? WHERE "{column}" = ?',
+                                     (str(parse_timestamp(value)), value))
+        database.execute_sql(f"PRAGMA user_version = {TIMESTAMPS_NORMALIZED_VERSION}")
+
+def _highest_archived_id() -> int:
+    from location.infrastructure.repositories.archive_repository import ArchiveRepository
+    return ArchiveRepository(config.ARCHIVE_DIR).max_id()
+
+def register_connection_hooks(app) -> None:
+    """
+    Open a connection at the start of each Flask request and release it at the end.
+
+    With a pooled database, closing returns the connection to the pool.
+    """
+    @app.before_request
+    def _db_connect():
+        db.connect(reuse_if_open=True)
 
+    @app.teardown_request
+    def _db_close(exc):
+        if not db.is_closed():
+            db.close()
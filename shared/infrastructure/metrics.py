@@ -0,0 +1,185 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms keep plain Python numbers behind a lock per
+metric. Observing a value costs a bisect and a dict lookup, so hot paths are
+instrumented unconditionally; METRICS_ENABLED=0 turns every update into an
+early return. Metrics are per process: with several server workers, each
+worker serves its own numbers.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from shared.infrastructure import config
+
+# Seconds; from sub-millisecond cache hits up to stalled commits
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OTHER = "_other"
+
+_LABEL_ESCAPE = re.compile(r'[\\"\n]')
+
+
+def _escape(value) -> str:
+    return _LABEL_ESCAPE.sub(lambda match: {"\\": "\\\\", '"': '\\"', "\n": "\\n"}[match.group()], str(value))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a family of series keyed by label values.
+
+    `max_series` bounds the number of label sets; beyond it the first label
+    (by convention the high-cardinality one, such as device_id) is folded
+    into "_other". `callback` makes the metric read its values at scrape
+    time instead, returning a number or a {label tuple: number} dict.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 max_series: Optional[int] = None, callback: Callable = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series
+        self.callback = callback
+        self.enabled = config.METRICS_ENABLED
+        self._series: dict = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        if self.max_series is not None and labels not in self._series and len(self._series) >= self.max_series:
+            return (OTHER,) + labels[1:]
+        return labels
+
+    def _labels(self, labels: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> dict:
+        if self.callback is None:
+            with self._lock:
+                return dict(self._series)
+        values = self.callback()
+        return values if isinstance(values, dict) else {(): values}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self._samples().items()):
+            lines.append(f"{self.name}{self._labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; buckets are upper bounds in seconds."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS, max_series: Optional[int] = None):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        if not self.enabled:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observe the wall time of the block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = {labels: ([*counts], total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{self._labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics of this process, rendered together for /metrics."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; registering a name twice returns the first one."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: tuple = (), **kwargs) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames, **kwargs))
+
+
+def gauge(name: str, documentation: str, labelnames: tuple = (), **kwargs) -> Gauge:
+    return registry.register(Gauge(name, documentation, labelnames, **kwargs))
+
+
+def histogram(name: str, documentation: str, labelnames: tuple = (), **kwargs) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, **kwargs))
@@ -0,0 +1,110 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+While enabled, a background thread snapshots the stack of every thread that is
+serving a request each `interval` seconds. When a request finishes slower than
+`slow_threshold`, its samples are folded into an aggregate in the collapsed
+stack format ("root;caller;callee count" per line), which flamegraph.pl,
+speedscope and inferno read directly. Fast requests are discarded, so
+leaving it on costs one sampler thread and two dict operations per request.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from shared.infrastructure import config
+
+MAX_DEPTH = 64
+
+
+def fold_stack(frame) -> str:
+    """Collapse a frame chain into "file:function;..." from the outermost call."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float, slow_threshold: float, max_slow_requests: int = 100):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.slow_requests: deque = deque(maxlen=max_slow_requests)
+        self._stacks: Counter = Counter()
+        self._active: dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._active.clear()
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def begin(self) -> None:
+        """Start sampling the calling thread; call when a request starts."""
+        if self._thread is not None:
+            with self._lock:
+                self._active[threading.get_ident()] = Counter()
+
+    def end(self, label: str, duration: float) -> None:
+        """Stop sampling the calling thread and keep its samples if it was slow."""
+        if not self._active:
+            return
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+            if samples is None or duration < self.slow_threshold:
+                return
+            for stack, count in samples.items():
+                self._stacks[f"{label};{stack}"] += count
+            self.slow_requests.append({
+                "request": label,
+                "duration_ms": round(duration * 1000, 1),
+                "samples": sum(samples.values()),
+                "finished_at": time.time(),
+            })
+
+    def collapsed(self) -> str:
+        """Aggregated samples of slow requests, one "stack count" line each."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.slow_requests.clear()
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != me:
+                        samples[fold_stack(frame)] += 1
+
+
+profiler = SamplingProfiler(config.PROFILER_INTERVAL_MS / 1000, config.PROFILER_SLOW_MS / 1000)
+if config.PROFILER_ENABLED:
+    profiler.start()
@@ -0,0 +1,154 @@
+"""Interface services shared by every bounded context: metrics and profiling."""
+import hmac
+from time import perf_counter
+
+from flask import Blueprint, Response, g, jsonify, request
+
+from iam.interfaces.services import authenticate_admin
+from shared.infrastructure import config
+from shared.infrastructure.metrics import histogram, registry
+from shared.infrastructure.profiler import profiler
+
+metrics_api = Blueprint("metrics_api", __name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_DURATION = histogram(
+    "edge_http_request_duration_seconds",
+    "Time to build the response of an HTTP request (streamed bodies excluded).",
+    ("method", "route", "status"),
+)
+
+def key_matches(expected: str) -> bool:
+    """Check the X-API-Key header, or an Authorization bearer token, against a key.
+
+    Args:
+        expected (str): Configured key.
+
+    Returns:
+        bool: True if the request carries the key.
+    """
+    supplied = request.headers.get("X-API-Key") or ""
+    authorization = request.headers.get("Authorization", "")
+    if not supplied and authorization.startswith("Bearer "):
+        supplied = authorization[len("Bearer "):]
+    return hmac.compare_digest(supplied.encode(), expected.encode())
+
+@metrics_api.route("/metrics", methods=["GET"])
+def metrics():
+    """Expose the metrics of this process in the Prometheus text format.
+
+    Requires METRICS_API_KEY (as X-API-Key or a bearer token) when it is set.
+
+    Returns:
+        Response: text/plain exposition, or (JSON error, status code).
+    """
+    if config.METRICS_API_KEY and not key_matches(config.METRICS_API_KEY):
+        return jsonify({"error": "Invalid API key"}), 401
+    return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def profiler_status() -> dict:
+    """Settings of the sampling profiler and the slow requests it kept."""
+    return {
+        "enabled": profiler.enabled,
+        "slow_ms": profiler.slow_threshold * 1000,
+        "interval_ms": profiler.interval * 1000,
+        "slow_requests": list(profiler.slow_requests),
+    }
+
+@metrics_api.route("/debug/profile", methods=["GET"])
+def get_profile():
+    """Dump the stacks sampled during slow requests.
+
+    The default output is the collapsed stack format, one "frame;frame;... count"
+    line per stack, ready for flamegraph.pl or speedscope. With ?format=json the
+    profiler settings and the latest slow requests are returned instead.
+    Requires the admin X-API-Key.
+
+    Returns:
+        Response: text/plain collapsed stacks, or (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    if request.args.get("format") == "json":
+        return jsonify(profiler_status()), 200
+    return Response(profiler.collapsed(), mimetype="text/plain")
+
+@metrics_api.route("/debug/profile", methods=["POST"])
+def configure_profile():
+    """Turn the sampling profiler on or off.
+
+    Expects JSON with enabled (bool) and optional slow_ms (requests at least
+    this slow are kept) and interval_ms (sampling period). Requires the admin
+    X-API-Key.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    elif not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    enabled = data.get("enabled", True)
+    if not isinstance(enabled, bool):
+        return jsonify({"error": "enabled must be true or false"}), 400
+    try:
+        if "slow_ms" in data:
+            profiler.slow_threshold = float(data["slow_ms"]) / 1000
+        if "interval_ms" in data:
+            interval = float(data["interval_ms"])
+            if interval <= 0:
+                raise ValueError("interval_ms must be positive")
+            profiler.interval = interval / 1000
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if enabled:
+        profiler.start()
+    else:
+        profiler.stop()
+    return jsonify(profiler_status()), 200
+
+@metrics_api.route("/debug/profile", methods=["DELETE"])
+def reset_profile():
+    """Discard the collected stacks and slow requests.
+
+    Returns:
+        tuple: (JSON response, status code).
+    """
+    auth_result = authenticate_admin()
+    if auth_result:
+        return auth_result
+    profiler.reset()
+    return jsonify(profiler_status()), 200
+
+def register_request_metrics(app) -> None:
+    """Time every request by route and status, and let the profiler sample it."""
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = perf_counter()
+        profiler.begin()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.get("request_started")
+        if started is not None:
+            HTTP_REQUEST_DURATION.observe(perf_counter() - started, request.method, request_route(),
+                                          str(response.status_code))
+        return response
+
+    # after_request is skipped when a view raises; teardown always runs, so the
+    # thread's samples never stay open
+    @app.teardown_request
+    def _end_profiling(exc):
+        started = g.pop("request_started", None)
+        if started is not None:
+            profiler.end(f"{request.method} {request_route()}", perf_counter() - started)
+
+def request_route() -> str:
+    """URL rule of the current request, "unmatched" when no route matched."""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
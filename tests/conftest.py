@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import time, so point the app at a throwaway database
+# and archive before anything from the tree is imported
+_TMP_DIR = tempfile.mkdtemp(prefix="nodo-edge-tests-")
+os.environ.setdefault("DB_PATH", os.path.join(_TMP_DIR, "collar-location.db"))
+os.environ.setdefault("ARCHIVE_DIR", os.path.join(_TMP_DIR, "archive"))
+os.environ.setdefault("NOTIFY_SOCKET", "")
+os.environ.setdefault("LOCATION_SPILL_PATH", "")
+
+DEVICE_ID = "gps-collar-001"
+API_KEY = "test-api-key-123"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def seed_legacy_rows(created_ats: list[str], latitude: float = -12.05, longitude: float = -77.05) -> list[int]:
+    """Insert location rows with created_at stored as raw text, the way old
+    databases hold them, then run init_db's one-time migration over them."""
+    from shared.infrastructure.database import TIMESTAMPS_NORMALIZED_VERSION, db, init_db
+    with db.connection_context():
+        ids = [
+            db.execute_sql(
+                "INSERT INTO location_records (device_id, latitude, longitude, created_at) VALUES (?, ?, ?, ?)",
+                (DEVICE_ID, latitude, longitude, created_at),
+            ).lastrowid
+            for created_at in created_ats
+        ]
+        db.execute_sql(f"PRAGMA user_version = {TIMESTAMPS_NORMALIZED_VERSION - 1}")
+        init_db()
+    return ids
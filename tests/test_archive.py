@@ -0,0 +1,53 @@
+import json
+from datetime import date, datetime
+
+import numpy as np
+
+from conftest import API_KEY, DEVICE_ID, seed_legacy_rows
+from location.application.services.archive_service import ArchiveApplicationService
+from location.infrastructure.repositories.archive_repository import ArchiveRepository, from_epoch_us, to_epoch_us
+from shared.infrastructure.database import db
+
+ADMIN_KEY = "test-admin-key"
+
+
+def test_offset_bearing_rows_are_normalised_and_archived(app, tmp_path):
+    ids = seed_legacy_rows(["2020-01-01 10:00:00+00:00", "2020-01-01T06:00:00-05:00", "2020-01-01T12:00:00Z"])
+    with db.connection_context():
+        stored = [value for (value,) in db.execute_sql(
+            f"SELECT created_at FROM location_records WHERE id IN ({','.join('?' * len(ids))}) ORDER BY id", ids)]
+        assert stored == ["2020-01-01 10:00:00", "2020-01-01 11:00:00", "2020-01-01 12:00:00"]
+
+        service = ArchiveApplicationService(ArchiveRepository(str(tmp_path)))
+        assert service.archive_before(date(2020, 1, 2)) == {"devices": 1, "days": 1, "records": 3}
+    archive = service.archive_repo.read(DEVICE_ID, date(2020, 1, 1))
+    assert archive.id.tolist() == ids
+    assert [from_epoch_us(ts) for ts in archive.ts.tolist()] == [
+        datetime(2020, 1, 1, 10), datetime(2020, 1, 1, 11), datetime(2020, 1, 1, 12)
+    ]
+
+
+def test_history_skips_rows_that_are_archived_but_not_yet_deleted(client):
+    from location.interfaces.services import archive_service
+    ids = seed_legacy_rows(["2020-02-01 08:00:00", "2020-02-01 09:00:00"])
+    with db.connection_context():
+        rows = list(archive_service.repo.iter_history(DEVICE_ID, datetime(2020, 2, 1), datetime(2020, 2, 2)))
+    # The state between write_day and delete_ids of an archive run
+    archive_service.archive_repo.append(
+        DEVICE_ID, date(2020, 2, 1),
+        np.array([row.id for row in rows], dtype=np.int64),
+        np.array([to_epoch_us(row.created_at) for row in rows], dtype=np.int64),
+        np.array([row.latitude for row in rows]),
+        np.array([row.longitude for row in rows]),
+    )
+    response = client.get(f"/api/v1/location/{DEVICE_ID}/history?from=2020-02-01T00:00:00Z&to=2020-02-02T00:00:00Z",
+                          headers={"X-API-Key": API_KEY})
+    assert response.status_code == 200
+    assert [json.loads(line)["id"] for line in response.get_data(as_text=True).splitlines()] == ids
+
+
+def test_archive_rejects_a_body_that_is_not_an_object(client, monkeypatch):
+    from shared.infrastructure import config
+    monkeypatch.setattr(config, "ADMIN_API_KEY", ADMIN_KEY)
+    response = client.post("/api/v1/location/archive", json=["2020-01-01"], headers={"X-API-Key": ADMIN_KEY})
+    assert response.status_code == 400
@@ -0,0 +1,37 @@
+import pytest
+
+from location.interfaces.binary_protocol import MAX_TIMESTAMP_MS, SMALL_FRAME, FrameError, decode_frames, encode_frame
+
+DEVICE_ID = "gps-collar-001"
+API_KEY = "test-api-key-123"
+
+
+def api_key_for(device_id):
+    return API_KEY if device_id == DEVICE_ID else None
+
+
+def track(first_ts: int, size: int, step_ms: int = 10_000) -> list[tuple[int, float, float]]:
+    return [(first_ts + i * step_ms, -12.05 + i * 1e-5, -77.05) for i in range(size)]
+
+
+@pytest.mark.parametrize("size", [1, SMALL_FRAME + 2])
+def test_decodes_in_range_timestamps(size):
+    frame, = decode_frames(encode_frame(DEVICE_ID, API_KEY, 1_735_689_600_000, track(1_735_689_600_000, size)),
+                           api_key_for)
+    assert frame.timestamps[0].isoformat() == "2025-01-01T00:00:00"
+    assert len(frame.timestamps) == size
+
+
+@pytest.mark.parametrize("size", [1, SMALL_FRAME + 2])
+@pytest.mark.parametrize("first_ts", [10 ** 17, -1])
+def test_out_of_range_timestamp_is_a_frame_error(size, first_ts):
+    data = encode_frame(DEVICE_ID, API_KEY, 0, track(first_ts, size))
+    with pytest.raises(FrameError, match="out of range"):
+        decode_frames(data, api_key_for)
+
+
+@pytest.mark.parametrize("size", [2, SMALL_FRAME + 2])
+def test_deltas_past_the_last_valid_timestamp_are_a_frame_error(size):
+    data = encode_frame(DEVICE_ID, API_KEY, 0, track(MAX_TIMESTAMP_MS - 100, size, step_ms=1000))
+    with pytest.raises(FrameError, match="out of range"):
+        decode_frames(data, api_key_for)
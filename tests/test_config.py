@@ -0,0 +1,19 @@
+import os
+
+from shared.infrastructure import config
+
+
+def test_relative_paths_resolve_against_the_repository_root():
+    assert config.resolve_path("collar-location.db") == os.path.join(config.BASE_DIR, "collar-location.db")
+    assert config.resolve_path("data/archive") == os.path.join(config.BASE_DIR, "data", "archive")
+
+
+def test_absolute_disabled_and_memory_paths_pass_through():
+    assert config.resolve_path("/var/lib/nodo/edge.db") == "/var/lib/nodo/edge.db"
+    assert config.resolve_path("") == ""
+    assert config.resolve_path(":memory:") == ":memory:"
+
+
+def test_configured_paths_are_absolute():
+    for path in (config.DB_PATH, config.ARCHIVE_DIR):
+        assert os.path.isabs(path)
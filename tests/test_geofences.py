@@ -0,0 +1,40 @@
+import pytest
+
+from conftest import API_KEY, DEVICE_ID
+
+ADMIN_KEY = "test-admin-key"
+ADMIN = {"X-API-Key": ADMIN_KEY}
+SQUARE = [[50.0, 20.0], [50.0, 20.1], [50.1, 20.1], [50.1, 20.0]]
+OTHER_SQUARE = [[51.0, 21.0], [51.0, 21.1], [51.1, 21.1], [51.1, 21.0]]
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    from shared.infrastructure import config
+    monkeypatch.setattr(config, "ADMIN_API_KEY", ADMIN_KEY)
+
+
+def test_fence_that_reuses_a_deleted_id_fires_events(client):
+    first = client.post("/api/v1/geofences", json={"name": "a", "vertices": SQUARE}, headers=ADMIN).get_json()
+    # Evaluate once so the index of the fence set with "a" is cached
+    client.post("/api/v1/location", json={"device_id": DEVICE_ID, "latitude": 0.0, "longitude": 0.0},
+                headers={"X-API-Key": API_KEY})
+    assert client.delete(f"/api/v1/geofences/{first['id']}", headers=ADMIN).status_code == 204
+    second = client.post("/api/v1/geofences", json={"name": "b", "vertices": OTHER_SQUARE}, headers=ADMIN).get_json()
+    assert second["id"] == first["id"]
+
+    response = client.post("/api/v1/location", json={"device_id": DEVICE_ID, "latitude": 51.05, "longitude": 21.05},
+                           headers={"X-API-Key": API_KEY})
+    assert response.status_code == 201
+    events = client.get(f"/api/v1/geofences/events?device_id={DEVICE_ID}", headers=ADMIN).get_json()
+    assert (events[0]["geofence_id"], events[0]["event"], events[0]["record_id"]) == \
+        (second["id"], "enter", response.get_json()["id"])
+    client.delete(f"/api/v1/geofences/{second['id']}", headers=ADMIN)
+
+
+@pytest.mark.parametrize("body", [
+    {"name": "c", "vertices": SQUARE, "device_id": 5},
+    [{"name": "c", "vertices": SQUARE}],
+])
+def test_create_geofence_rejects_malformed_bodies(client, body):
+    assert client.post("/api/v1/geofences", json=body, headers=ADMIN).status_code == 400
@@ -0,0 +1,24 @@
+import pytest
+
+from conftest import DEVICE_ID
+
+ADMIN_KEY = "test-admin-key"
+ADMIN = {"X-API-Key": ADMIN_KEY}
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    from shared.infrastructure import config
+    monkeypatch.setattr(config, "ADMIN_API_KEY", ADMIN_KEY)
+
+
+@pytest.mark.parametrize("body", [["new-key"], "new-key", 5])
+def test_rotate_api_key_rejects_a_body_that_is_not_an_object(client, body):
+    response = client.post(f"/api/v1/iam/devices/{DEVICE_ID}/api-key", json=body, headers=ADMIN)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Expected a JSON object"}
+
+
+def test_credential_cache_stats_require_the_admin_key(client):
+    assert client.get("/api/v1/iam/credential-cache").status_code == 401
+    assert client.get("/api/v1/iam/credential-cache", headers=ADMIN).status_code == 200
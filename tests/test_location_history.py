@@ -0,0 +1,30 @@
+import json
+
+from conftest import API_KEY, DEVICE_ID, seed_legacy_rows
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+def read_history(client, query: str) -> list[dict]:
+    response = client.get(f"/api/v1/location/{DEVICE_ID}/history?{query}", headers=HEADERS)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_history_streams_legacy_rows_as_utc(client):
+    ids = seed_legacy_rows(["2020-03-01T05:00:00-05:00", "2020-03-01 11:00:00+00:00"])
+    client.post("/api/v1/location", json={"device_id": DEVICE_ID, "latitude": -12.05, "longitude": -77.05,
+                                          "created_at": "2020-03-01T12:00:00Z"}, headers=HEADERS)
+    lines = read_history(client, "from=2020-03-01T00:00:00Z&to=2020-03-02T00:00:00Z")
+    assert [line["created_at"] for line in lines] == [
+        "2020-03-01T10:00:00Z", "2020-03-01T11:00:00Z", "2020-03-01T12:00:00Z"
+    ]
+    assert [line["id"] for line in lines[:2]] == ids
+
+
+def test_history_pages_through_legacy_rows_with_the_cursor(client):
+    ids = seed_legacy_rows(["2020-03-02T08:00:00Z", "2020-03-02T09:00:00+00:00", "2020-03-02T10:00:00Z"])
+    window = "from=2020-03-02T00:00:00Z&to=2020-03-03T00:00:00Z"
+    first = read_history(client, f"{window}&limit=2")
+    rest = read_history(client, f"{window}&after={first[-1]['cursor']}")
+    assert [line["id"] for line in first + rest] == ids
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import API_KEY, DEVICE_ID
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+def fix(**fields):
+    return {"device_id": DEVICE_ID, "latitude": -12.05, "longitude": -77.05, **fields}
+
+
+def test_single_fix_without_created_at_defaults_to_now(client):
+    before = datetime.utcnow()
+    response = client.post("/api/v1/location", json=fix(), headers=HEADERS)
+    assert response.status_code == 201
+    created_at = datetime.fromisoformat(response.get_json()["created_at"].removesuffix("Z"))
+    assert before <= created_at <= datetime.utcnow()
+
+
+def test_batch_fix_without_created_at_defaults_to_now(client):
+    response = client.post("/api/v1/location/batch", json=[fix()], headers=HEADERS)
+    assert response.status_code == 201
+    assert response.get_json()["results"][0]["status"] == 201
+
+
+@pytest.mark.parametrize("fields", [{"latitude": 100}, {"latitude": -90.5}, {"longitude": 180.5}])
+def test_single_fix_out_of_range_is_rejected(client, fields):
+    response = client.post("/api/v1/location", json=fix(**fields), headers=HEADERS)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Coordinates out of range"}
+
+
+@pytest.mark.parametrize("fields", [{"latitude": 100}, {"latitude": -90.5}, {"longitude": 180.5}])
+def test_batch_fix_out_of_range_is_rejected(client, fields):
+    response = client.post("/api/v1/location/batch", json=[fix(**fields)], headers=HEADERS)
+    assert response.status_code == 207
+    assert response.get_json()["results"][0] == {"index": 0, "status": 400, "error": "Coordinates out of range"}
+
+
+def test_invalid_created_at_is_rejected_the_same_way(client):
+    single = client.post("/api/v1/location", json=fix(created_at="yesterday"), headers=HEADERS)
+    batch = client.post("/api/v1/location/batch", json=[fix(created_at="yesterday")], headers=HEADERS)
+    assert single.status_code == 400
+    assert single.get_json()["error"] == batch.get_json()["results"][0]["error"] == "Invalid created_at"
+
+
+@pytest.mark.parametrize("fields", [{"latitude": None}, {"longitude": [1, 2]}, {"latitude": "north"}])
+def test_single_fix_with_invalid_coordinates_is_rejected(client, fields):
+    response = client.post("/api/v1/location", json=fix(**fields), headers=HEADERS)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid latitude or longitude"}
+
+
+@pytest.mark.parametrize("body", [[fix()], "fix", 5])
+def test_single_fix_body_must_be_an_object(client, body):
+    response = client.post("/api/v1/location", json=body, headers=HEADERS)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Expected a JSON object"}
@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import API_KEY, DEVICE_ID
+
+ADMIN_KEY = "test-admin-key"
+ADMIN = {"X-API-Key": ADMIN_KEY}
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    from shared.infrastructure import config
+    monkeypatch.setattr(config, "ADMIN_API_KEY", ADMIN_KEY)
+
+
+@pytest.mark.parametrize("body", [{"enabled": "false"}, {"enabled": "0"}, {"enabled": 1}, [{"enabled": False}]])
+def test_configure_profile_rejects_malformed_bodies(client, body):
+    from shared.infrastructure.profiler import profiler
+    response = client.post("/debug/profile", json=body, headers=ADMIN)
+    assert response.status_code == 400
+    assert not profiler.enabled
+
+
+def test_configure_profile_toggles_with_a_bool(client):
+    assert client.post("/debug/profile", json={"enabled": True}, headers=ADMIN).get_json()["enabled"] is True
+    assert client.post("/debug/profile", json={"enabled": False}, headers=ADMIN).get_json()["enabled"] is False
+
+
+def rejected_points(client, device_label: str) -> float:
+    prefix = f'edge_location_points_total{{device_id="{device_label}",result="rejected"}} '
+    lines = [line for line in client.get("/metrics").get_data(as_text=True).splitlines() if line.startswith(prefix)]
+    return float(lines[0][len(prefix):]) if lines else 0
+
+
+def test_points_with_bad_credentials_are_counted_as_unknown(client):
+    fix = {"device_id": "made-up-collar", "latitude": -12.05, "longitude": -77.05, "api_key": "wrong"}
+    before = rejected_points(client, "_unknown")
+    client.post("/api/v1/location/batch", json=[fix, {**fix, "device_id": DEVICE_ID}], headers={"X-API-Key": API_KEY})
+    assert rejected_points(client, "_unknown") == before + 2
+    assert rejected_points(client, "made-up-collar") == 0
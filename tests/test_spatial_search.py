@@ -0,0 +1,16 @@
+from conftest import DEVICE_ID, seed_legacy_rows
+
+ADMIN_KEY = "test-admin-key"
+
+
+def test_bbox_returns_legacy_rows_newest_first(client, monkeypatch):
+    from shared.infrastructure import config
+    monkeypatch.setattr(config, "ADMIN_API_KEY", ADMIN_KEY)
+    ids = seed_legacy_rows(["2020-04-01T09:00:00+02:00", "2020-04-01T08:00:00Z"], latitude=45.5, longitude=10.5)
+    response = client.get("/api/v1/location/search/bbox?min_lat=45.4&min_lon=10.4&max_lat=45.6&max_lon=10.6"
+                          "&from=2020-04-01T00:00:00Z&to=2020-04-02T00:00:00Z", headers={"X-API-Key": ADMIN_KEY})
+    assert response.status_code == 200
+    assert [(record["id"], record["device_id"], record["created_at"]) for record in response.get_json()] == [
+        (ids[1], DEVICE_ID, "2020-04-01T08:00:00Z"),
+        (ids[0], DEVICE_ID, "2020-04-01T07:00:00Z"),
+    ]
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from location.domain.entities.location_record import LocationRecord
+from location.infrastructure.repositories.write_behind import WriteBehindBuffer
+
+
+def failing_flush(records, on_insert):
+    raise RuntimeError("disk I/O error")
+
+
+def records():
+    return [LocationRecord("gps-collar-001", -12.05, -77.05, datetime(2025, 1, 1, 10))]
+
+
+def test_spilled_group_commit_resolves_as_accepted(tmp_path):
+    spill_path = tmp_path / "spill.ndjson"
+    buffer = WriteBehindBuffer(failing_flush, 100, 10, 0.001, max_retries=0, spill_path=str(spill_path))
+    try:
+        saved = buffer.submit(records()).result(timeout=5)
+    finally:
+        buffer.close()
+    assert [(record.id, record.created_at) for record in saved] == [(None, datetime(2025, 1, 1, 10))]
+    assert [json.loads(line)["created_at"] for line in spill_path.read_text().splitlines()] == ["2025-01-01T10:00:00"]
+
+
+def test_group_commit_that_cannot_be_spilled_fails(tmp_path):
+    buffer = WriteBehindBuffer(failing_flush, 100, 10, 0.001, max_retries=0, spill_path=None)
+    try:
+        with pytest.raises(RuntimeError, match="disk I/O error"):
+            buffer.submit(records()).result(timeout=5)
+    finally:
+        buffer.close()
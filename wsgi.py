@@ -0,0 +1,8 @@
+"""WSGI entry point for external servers, e.g. ``gunicorn -w 4 --threads 8 wsgi:app``.
+
+Do not preload it in a pre-forking master (gunicorn --preload): the app opens
+database connections and may start the write-behind thread.
+"""
+from app import create_app
+
+app = create_app()